@@ -0,0 +1,182 @@
+import io
+
+import pandas as pd
+
+# ---------------- CONFIG ----------------
+KEY_COLS = [
+    "Operating Unit ID",
+    "Vendor ID",
+    "Supplier Site Code"
+]
+CHUNK_ROWS = 100_000
+KEY_SEP = "\x1f"  # unit separator, never appears in vendor data
+# ----------------------------------------
+
+
+def _read_chunks(path, chunksize=CHUNK_ROWS, **kwargs):
+    """Read a CSV/.dat file lazily, keeping every value as text"""
+    return pd.read_csv(
+        path,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunksize,
+        **kwargs
+    )
+
+
+def combo_keys(df, key_cols=KEY_COLS):
+    """Collapse the key columns of a chunk into one string per row"""
+    keys = df[key_cols[0]].str.strip()
+    for col in key_cols[1:]:
+        keys = keys + KEY_SEP + df[col].str.strip()
+    return keys
+
+
+def build_key_set(filter_path, key_cols=KEY_COLS, chunksize=CHUNK_ROWS):
+    """Build the set of approved combos from the filter file.
+
+    Only the key columns are read, so memory is bounded by the number of
+    distinct combos, not by the size of the filter file.
+    """
+    combos = set()
+    for chunk in _read_chunks(filter_path, chunksize, usecols=key_cols):
+        combos.update(combo_keys(chunk, key_cols).unique())
+    return frozenset(combos)
+
+
+def detect_sep(header_line):
+    """Vendor extracts are either comma CSV or pipe-delimited .dat"""
+    text = header_line.decode("utf-8", "replace")
+    return "|" if text.count("|") > text.count(",") else ","
+
+
+def _ends_quoted(line, sep, quoted):
+    """Whether a record is still inside a quoted field after line.
+
+    quoted says whether it was inside one when line started. Follows the
+    csv/pandas rule: a '"' opens a quoted field only as a field's first
+    character, and inside one '""' is a literal quote. Anywhere else a
+    '"' is plain text, so it cannot swallow the lines after it.
+    """
+    i, field_start = 0, not quoted
+    while True:
+        if quoted:
+            i = line.find(b'"', i)
+            if i < 0:
+                return True
+            if line[i + 1:i + 2] == b'"':
+                i += 2
+            else:
+                quoted, field_start, i = False, False, i + 1
+        elif field_start and line[i:i + 1] == b'"':
+            quoted, i = True, i + 1
+        else:
+            i = line.find(sep, i)
+            if i < 0:
+                return False
+            field_start, i = True, i + 1
+
+
+def _iter_records(lines, sep):
+    """Group raw lines into records, keeping quoted line breaks together,
+    exactly where a CSV parser with delimiter sep would end each row"""
+    sep = sep.encode("utf-8")
+    record = []
+    quoted = False
+    for line in lines:
+        record.append(line)
+        if quoted or b'"' in line:
+            quoted = _ends_quoted(line, sep, quoted)
+        if not quoted:
+            yield b"".join(record)
+            record = []
+    if record:
+        yield b"".join(record)
+
+
+class FilterScan:
+    """One streaming pass of a compiled filter over an input file.
+
+    predicate is a filter_spec.Predicate: it names the columns it needs
+    and turns a parsed chunk into a boolean mask. Iterating yields
+    (records, frame) per chunk: the matching records as their original
+    bytes, and the same rows parsed as text columns. Only one chunk of
+    the input is held in memory at a time.
+    """
+
+    def __init__(self, input_path, predicate, chunksize=CHUNK_ROWS):
+        self.predicate = predicate
+        self.chunksize = chunksize
+        self.rows_scanned = 0
+        self.rows_matched = 0
+
+        self._file = open(input_path, "rb")
+        self.header = self._file.readline()
+        self.sep = detect_sep(self.header)
+        self.columns = list(self._parse([]).columns)
+
+        missing = [c for c in predicate.columns if c not in self.columns]
+        if missing:
+            self.close()
+            raise ValueError(f"Input file is missing columns: {', '.join(missing)}")
+
+    def _parse(self, records):
+        return pd.read_csv(
+            io.BytesIO(self.header + b"".join(records)),
+            sep=self.sep,
+            dtype=str,
+            keep_default_na=False,
+            index_col=False,
+            encoding_errors="replace"
+        )
+
+    def _match(self, records):
+        frame = self._parse(records)
+        if len(frame) != len(records):
+            # Matches are written as the original records, so they must
+            # pair up with the parsed rows one to one
+            raise ValueError(f"Could not split the input into records: {len(records)} "
+                             f"records parsed as {len(frame)} rows")
+        mask = self.predicate(frame)
+        self.rows_scanned += len(records)
+        self.rows_matched += int(mask.sum())
+        return [r for r, keep in zip(records, mask) if keep], frame[mask]
+
+    def __iter__(self):
+        try:
+            batch = []
+            for record in _iter_records(self._file, self.sep):
+                if not record.strip():
+                    continue  # blank lines never match
+                batch.append(record)
+                if len(batch) >= self.chunksize:
+                    yield self._match(batch)
+                    batch = []
+            if batch:
+                yield self._match(batch)
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+
+def stream_filter(input_path, predicate, output_path, chunksize=CHUNK_ROWS,
+                  progress=None):
+    """Run a compiled filter over the input file, one chunk at a time.
+
+    Matching records are appended to output_path as soon as each chunk is
+    scanned, byte-for-byte as they appear in the input (header included).
+    progress, if given, is called with (rows_scanned, rows_matched)
+    after every chunk.
+    """
+    scan = FilterScan(input_path, predicate, chunksize)
+
+    with open(output_path, "wb") as out:
+        out.write(scan.header)
+        for records, _ in scan:
+            out.writelines(records)
+            if progress:
+                progress(scan.rows_scanned, scan.rows_matched)
+
+    return {"rows_scanned": scan.rows_scanned, "rows_matched": scan.rows_matched}
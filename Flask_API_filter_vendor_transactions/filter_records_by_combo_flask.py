@@ -1,60 +1,220 @@
-from flask import Flask, request, send_file, jsonify
-import pandas as pd
+from flask import Flask, Response, request, send_file, jsonify
 import os
 
+from filter_engine import KEY_COLS, FilterScan, build_key_set
+from filter_sets import FilterSetCache
+from filter_spec import SpecError, compile_spec, parse_spec
+import jobs
+import metrics
+import output_formats
+import uploads
+
 app = Flask(__name__)
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+uploads.init_app(app)
+metrics.init_app(app)
+os.makedirs(jobs.JOBS_DIR, exist_ok=True)
+
+job_queue = jobs.JobQueue()
+filter_sets = FilterSetCache()
+
+
+class FilterSetNotFound(Exception):
+    pass
+
+
+def _read_spec():
+    """Parse the spec form field and resolve filter_id, if one is sent.
+
+    Returns (spec, key_set); key_set is None unless filter_id is used.
+    """
+    spec = parse_spec(request.form.get("spec"))
+    filter_id = request.form.get("filter_id")
+    if not filter_id:
+        return spec, None
+
+    entry = filter_sets.get(filter_id)
+    if entry is None:
+        raise FilterSetNotFound(filter_id)
+    key_cols, key_set = entry
+    if spec.get("keys", key_cols) != key_cols:
+        raise SpecError("spec.keys differs from the keys filter_id was registered with")
+    spec["keys"] = key_cols
+    return spec, key_set
+
+
+def _missing_inputs(input_file, filter_file, spec, key_set):
+    if not input_file:
+        return "input_file is required"
+    if not (filter_file or key_set is not None or spec.get("rules")):
+        return "Send filter_file, filter_id or spec.rules to filter on"
+    return None
+
+
+@app.route("/filters", methods=["POST"])
+def register_filter_set():
+    # 1️⃣ Upload an approved-combination file once (spec.keys optional)...
+    filter_file = request.files.get("filter_file")
+    if not filter_file:
+        return jsonify({"error": "filter_file is required"}), 400
+    try:
+        key_cols = parse_spec(request.form.get("spec")).get("keys", KEY_COLS)
+    except SpecError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 2️⃣ ...compile it, and reuse it by id in /filter and /jobs
+    filter_path = os.path.join(uploads.request_workdir(), jobs.FILTER_NAME)
+    info = uploads.persist(filter_file, filter_path)
+    try:
+        filter_id, (key_cols, key_set) = filter_sets.register(
+            filter_path, info["sha256"], key_cols)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"filter_id": filter_id, "keys": key_cols, "combos": len(key_set)}), 201
+
+
+@app.route("/filters/<filter_id>", methods=["GET"])
+def get_filter_set(filter_id):
+    entry = filter_sets.get(filter_id)
+    if entry is None:
+        return jsonify({"error": "Unknown filter_id"}), 404
+    key_cols, key_set = entry
+    return jsonify({"filter_id": filter_id, "keys": key_cols, "combos": len(key_set)})
 
 
 @app.route("/filter", methods=["POST"])
 def filter_dat_file():
-    try:
-        # 1️⃣ Get files from Postman
-        input_file = request.files.get("input_file")
-        filter_file = request.files.get("filter_file")
-
-        if not input_file or not filter_file:
-            return jsonify({"error": "Both input_file and filter_file are required"}), 400
-
-        # 2️⃣ Save both files
-        input_path = os.path.join(UPLOAD_DIR, input_file.filename)
-        filter_path = os.path.join(UPLOAD_DIR, filter_file.filename)
-
-        input_file.save(input_path)
-        filter_file.save(filter_path)
-
-        # 3️⃣ Read files
-        df_input = pd.read_csv(input_path)
-        df_filter = pd.read_csv(filter_path)
-
-        key_cols = [
-            "Operating Unit ID",
-            "Vendor ID",
-            "Supplier Site Code"
-        ]
-
-        # 4️⃣ Filter logic
-        filtered_df = df_input.merge(
-            df_filter[key_cols].drop_duplicates(),
-            on=key_cols,
-            how="inner"
-        )
+    # 1️⃣ Get files from Postman (streamed to this request's own folder)
+    input_file = request.files.get("input_file")
+    filter_file = request.files.get("filter_file")
 
-        # 5️⃣ Output file in SAME FOLDER as input
-        input_dir = os.path.dirname(input_path)
-        output_filename = "filtered_output.dat"
-        output_path = os.path.join(input_dir, output_filename)
+    try:
+        spec, key_set = _read_spec()
+    except FilterSetNotFound:
+        return jsonify({"error": "Unknown filter_id"}), 404
+    except SpecError as e:
+        return jsonify({"error": str(e)}), 400
 
-        filtered_df.to_csv(output_path, index=False)
+    missing = _missing_inputs(input_file, filter_file, spec, key_set)
+    if missing:
+        return jsonify({"error": missing}), 400
 
-        # 6️⃣ Return file for download
-        return send_file(output_path, as_attachment=True)
+    try:
+        uploads.maybe_sweep(uploads.UPLOAD_DIR, jobs.JOBS_DIR)
+
+        # 2️⃣ Keep the files in the per-request working folder
+        workdir = uploads.request_workdir()
+        input_path = os.path.join(workdir, jobs.INPUT_NAME)
+        uploads.persist(input_file, input_path)
+
+        # 3️⃣ Build the approved combo set (small) unless it is registered,
+        #    and compile the spec once for the whole scan
+        if key_set is None and filter_file:
+            filter_path = os.path.join(workdir, jobs.FILTER_NAME)
+            uploads.persist(filter_file, filter_path)
+            key_set = build_key_set(filter_path, spec.get("keys", KEY_COLS))
+        predicate = compile_spec(spec, key_set)
+
+        # 4️⃣ Scan the input in chunks...
+        scan = FilterScan(input_path, predicate)
+        try:
+            chunks, filename, mimetype = output_formats.encode(
+                scan,
+                request.values.get("format", "dat"),
+                request.values.get("compression")
+            )
+        except output_formats.OutputFormatError:
+            scan.close()
+            raise
+
+        # 5️⃣ ...and stream matches back as each chunk is scanned
+        # (the per-request folder is removed once the stream is closed)
+        return Response(
+            metrics.count_stream(chunks, scan),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/jobs", methods=["POST"])
+def submit_filter_job():
+    # 1️⃣ Same inputs as /filter, but the work runs in the background
+    input_file = request.files.get("input_file")
+    filter_file = request.files.get("filter_file")
+
+    try:
+        spec, key_set = _read_spec()
+    except FilterSetNotFound:
+        return jsonify({"error": "Unknown filter_id"}), 404
+    except SpecError as e:
+        return jsonify({"error": str(e)}), 400
+
+    missing = _missing_inputs(input_file, filter_file, spec, key_set)
+    if missing:
+        return jsonify({"error": missing}), 400
+
+    # Catch spec mistakes now rather than in the worker
+    try:
+        compile_spec(spec, frozenset() if filter_file or key_set is not None else None)
+    except SpecError as e:
+        return jsonify({"error": str(e)}), 400
+
+    uploads.maybe_sweep(uploads.UPLOAD_DIR, jobs.JOBS_DIR)
+
+    # 2️⃣ Move the files into the job's own folder
+    job_id, job_path = job_queue.create()
+    info = {"input": uploads.persist(
+        input_file, os.path.join(job_path, jobs.INPUT_NAME))}
+    if key_set is not None:
+        info["filter_id"] = request.form["filter_id"]
+    elif filter_file:
+        info["filter"] = uploads.persist(
+            filter_file, os.path.join(job_path, jobs.FILTER_NAME))
+
+    # 3️⃣ Hand off to the worker pool, pushing back when it is full
+    try:
+        job_queue.submit(job_id, spec, key_set=key_set, **info)
+    except jobs.QueueFull:
+        response = jsonify({"error": "Too many jobs in progress, retry later"})
+        response.headers["Retry-After"] = "30"
+        return response, 429
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
+    }), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_filter_job(job_id):
+    status = jobs.read_status(job_id) if jobs.is_job_id(job_id) else None
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def get_filter_job_result(job_id):
+    status = jobs.read_status(job_id) if jobs.is_job_id(job_id) else None
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status["state"] != "done":
+        return jsonify({"error": f"Job is {status['state']}"}), 409
+
+    # send_file streams the result from disk in blocks
+    return send_file(
+        os.path.join(jobs.job_dir(job_id), jobs.RESULT_NAME),
+        as_attachment=True,
+        download_name=jobs.RESULT_NAME
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True)
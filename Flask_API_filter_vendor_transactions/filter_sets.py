@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from filter_engine import KEY_COLS, build_key_set
+
+# ---------------- CONFIG ----------------
+# Set FILTER_SETS_DIR to an empty string to keep filter sets in memory only
+FILTER_SETS_DIR = os.environ.get("FILTER_SETS_DIR", "filter_sets")
+MAX_CACHED_SETS = int(os.environ.get("FILTER_SETS_MAX_CACHED", "32"))
+# ----------------------------------------
+
+_FILTER_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_filter_id(value):
+    return bool(_FILTER_ID.match(value or ""))
+
+
+def filter_id_for(sha256, key_cols=KEY_COLS):
+    """The file hash itself for the default keys, else hash + key columns"""
+    if list(key_cols) == KEY_COLS:
+        return sha256
+    return hashlib.sha256(f"{sha256}:{json.dumps(key_cols)}".encode("utf-8")).hexdigest()
+
+
+class FilterSetCache:
+    """Compiled approved-combo sets, keyed by the SHA-256 of the filter file
+    (plus the key columns, when they are not the default three).
+
+    Entries are (key_cols, key_set) pairs. The most recently used ones stay
+    in memory (LRU). When persist_dir is set, every set is also written
+    there, so it survives restarts and is shared by all API processes.
+    """
+
+    def __init__(self, max_items=MAX_CACHED_SETS, persist_dir=FILTER_SETS_DIR):
+        self.max_items = max_items
+        self.persist_dir = os.path.abspath(persist_dir) if persist_dir else None
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    def _path(self, filter_id):
+        return os.path.join(self.persist_dir, f"{filter_id}.json")
+
+    def _remember(self, filter_id, entry):
+        with self._lock:
+            self._sets[filter_id] = entry
+            self._sets.move_to_end(filter_id)
+            while len(self._sets) > self.max_items:
+                self._sets.popitem(last=False)
+
+    def register(self, filter_path, sha256, key_cols=KEY_COLS):
+        """Compile filter_path once; re-registering the same content is free"""
+        filter_id = filter_id_for(sha256, key_cols)
+        entry = self.get(filter_id)
+        if entry is None:
+            entry = (list(key_cols), build_key_set(filter_path, key_cols))
+            if self.persist_dir:
+                tmp_path = self._path(filter_id) + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"keys": entry[0], "combos": sorted(entry[1])}, f)
+                os.replace(tmp_path, self._path(filter_id))
+            self._remember(filter_id, entry)
+        return filter_id, entry
+
+    def get(self, filter_id):
+        """Return (key_cols, key_set) for filter_id, or None if unknown"""
+        if not is_filter_id(filter_id):
+            return None
+
+        with self._lock:
+            entry = self._sets.get(filter_id)
+            if entry is not None:
+                self._sets.move_to_end(filter_id)
+                return entry
+
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._path(filter_id), encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+        entry = (saved["keys"], frozenset(saved["combos"]))
+        self._remember(filter_id, entry)
+        return entry
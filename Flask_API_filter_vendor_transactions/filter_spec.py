@@ -0,0 +1,164 @@
+"""
+Filter specs for the vendor filter API.
+
+A spec is a JSON object sent in the ``spec`` form field, for example::
+
+    {
+        "keys": ["Operating Unit ID", "Vendor ID", "Supplier Site Code"],
+        "mode": "exclude",
+        "rules": [
+            {"Invoice Amount": {"min": 1000}, "Currency": {"in": ["INR"]}},
+            {"Invoice Date": {"min": "2024-04-01", "max": "2024-06-30"}}
+        ]
+    }
+
+keys/mode apply to the combos from filter_file or filter_id: "include"
+keeps rows whose combo is listed (semi-join), "exclude" drops them
+(anti-join). rules is a list of groups; a row passes if it satisfies
+every condition of at least one group. Both parts are ANDed together.
+"""
+
+import json
+from numbers import Number
+
+import numpy as np
+import pandas as pd
+
+from filter_engine import KEY_COLS, combo_keys
+
+MODES = ("include", "exclude")
+RANGE_TYPES = ("number", "date")
+_OPS = {"min", "max", "type", "format", "in", "not_in", "eq", "ne"}
+
+
+class SpecError(ValueError):
+    """The spec is not valid JSON or does not follow the format above"""
+
+
+def parse_spec(text):
+    """Parse the spec form field; an absent spec means the default filter"""
+    if not text:
+        return {}
+    try:
+        spec = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise SpecError(f"spec is not valid JSON: {e}")
+    if not isinstance(spec, dict):
+        raise SpecError("spec must be a JSON object")
+
+    keys = spec.get("keys", KEY_COLS)
+    if not keys or not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+        raise SpecError("spec.keys must be a non-empty list of column names")
+    if spec.get("mode", "include") not in MODES:
+        raise SpecError(f"spec.mode must be one of: {', '.join(MODES)}")
+    rules = spec.get("rules", [])
+    if not isinstance(rules, list) or not all(isinstance(g, dict) for g in rules):
+        raise SpecError("spec.rules must be a list of {column: condition} groups")
+    return spec
+
+
+def _range_parser(column, rule):
+    """Return (series -> values, bound -> value) for a min/max condition"""
+    bounds = [rule[op] for op in ("min", "max") if op in rule]
+    kind = rule.get("type")
+    if kind is None:
+        kind = "number" if all(isinstance(b, Number) for b in bounds) else "date"
+    if kind not in RANGE_TYPES:
+        raise SpecError(f"{column}: type must be one of: {', '.join(RANGE_TYPES)}")
+
+    if kind == "number":
+        return (
+            lambda s: pd.to_numeric(s.str.strip(), errors="coerce").to_numpy(),
+            float
+        )
+    fmt = rule.get("format")
+    return (
+        lambda s: pd.to_datetime(s.str.strip(), errors="coerce", format=fmt).to_numpy(),
+        lambda b: np.datetime64(pd.Timestamp(b))
+    )
+
+
+def _condition(column, rule):
+    """Compile one {column: condition} entry into frame -> bool array"""
+    if not isinstance(rule, dict) or not rule or set(rule) - _OPS:
+        raise SpecError(f"{column}: condition must use only {', '.join(sorted(_OPS))}")
+
+    tests = []
+    for op, negate in (("in", False), ("not_in", True), ("eq", False), ("ne", True)):
+        if op in rule:
+            values = rule[op] if op in ("in", "not_in") else [rule[op]]
+            if not isinstance(values, (list, tuple)) or \
+                    not all(isinstance(v, (str, Number)) for v in values):
+                raise SpecError(f"{column}: {op} must be a list of strings or numbers")
+            values = [str(v).strip() for v in values]
+            tests.append(lambda s, values=values, negate=negate:
+                         s.str.strip().isin(values).to_numpy() != negate)
+
+    if "min" in rule or "max" in rule:
+        parse, bound = _range_parser(column, rule)
+        try:
+            lo = bound(rule["min"]) if "min" in rule else None
+            hi = bound(rule["max"]) if "max" in rule else None
+        except (TypeError, ValueError) as e:
+            raise SpecError(f"{column}: bad range bound ({e})")
+
+        def in_range(s):
+            values = parse(s)
+            mask = np.ones(len(values), dtype=bool)
+            if lo is not None:
+                mask &= values >= lo
+            if hi is not None:
+                mask &= values <= hi
+            return mask  # unparseable values compare False
+        tests.append(in_range)
+
+    def test(frame):
+        series = frame[column]
+        mask = tests[0](series)
+        for extra in tests[1:]:
+            mask &= extra(series)
+        return mask
+    return test
+
+
+class Predicate:
+    """A spec compiled once into vectorised tests over a parsed chunk"""
+
+    def __init__(self, spec, key_set=None):
+        self.key_cols = spec.get("keys", KEY_COLS)
+        self.mode = spec.get("mode", "include")
+        # An Index builds its hash table once, on first lookup, and every
+        # chunk reuses it (Series.isin would rebuild one per chunk)
+        self.key_index = pd.Index(list(key_set), dtype=object) if key_set is not None else None
+
+        self.groups = []
+        columns = list(self.key_cols) if key_set is not None else []
+        for group in spec.get("rules", []):
+            self.groups.append([_condition(col, rule) for col, rule in group.items()])
+            columns += [col for col in group if col not in columns]
+        self.columns = columns
+
+        if self.key_index is None and not self.groups:
+            raise SpecError("Nothing to filter on: send filter_file/filter_id or spec.rules")
+
+    def __call__(self, frame):
+        mask = np.ones(len(frame), dtype=bool)
+
+        if self.key_index is not None:
+            listed = self.key_index.get_indexer(combo_keys(frame, self.key_cols)) >= 0
+            mask &= listed if self.mode == "include" else ~listed
+
+        if self.groups:
+            any_group = np.zeros(len(frame), dtype=bool)
+            for group in self.groups:
+                group_mask = np.ones(len(frame), dtype=bool)
+                for test in group:
+                    group_mask &= test(frame)
+                any_group |= group_mask
+            mask &= any_group
+
+        return mask
+
+
+def compile_spec(spec, key_set=None):
+    return Predicate(spec, key_set)
@@ -0,0 +1,58 @@
+# Production serving profile for the vendor filter API.
+#
+#   gunicorn -c gunicorn.conf.py filter_records_by_combo_flask:app
+#
+# Every setting can be overridden with the environment variables below.
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+# ---------------- CONFIG ----------------
+bind = os.environ.get("FILTER_BIND", "0.0.0.0:8000")
+
+# Each worker also owns a job pool of FILTER_MAX_WORKERS processes, so
+# total job concurrency is workers x FILTER_MAX_WORKERS.
+workers = int(os.environ.get("FILTER_WEB_WORKERS", str(multiprocessing.cpu_count())))
+
+# Threads keep long streaming responses from blocking the worker's
+# heartbeat, so "timeout" only kills workers that are truly stuck.
+worker_class = "gthread"
+threads = int(os.environ.get("FILTER_WEB_THREADS", "4"))
+timeout = int(os.environ.get("FILTER_WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("FILTER_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers now and then to return pandas/arrow memory to the OS
+max_requests = int(os.environ.get("FILTER_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+# ----------------------------------------
+
+# Shared folder for per-process metric files, read back by /metrics.
+# Must be set before the app (and prometheus_client) is imported.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "filter_api_metrics")
+)
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def worker_exit(server, worker):
+    # Graceful shutdown: let running filter jobs finish (up to graceful_timeout)
+    app_module = sys.modules.get("filter_records_by_combo_flask")
+    if app_module is not None:
+        app_module.job_queue.shutdown(wait=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
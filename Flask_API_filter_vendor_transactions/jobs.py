@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from filter_engine import KEY_COLS, build_key_set, stream_filter
+from filter_spec import compile_spec
+import metrics
+
+# ---------------- CONFIG ----------------
+JOBS_DIR = os.path.abspath(os.environ.get("FILTER_JOBS_DIR", "jobs"))
+MAX_WORKERS = int(os.environ.get("FILTER_MAX_WORKERS", "2"))
+MAX_PENDING = int(os.environ.get("FILTER_MAX_PENDING", "8"))
+
+INPUT_NAME = "input.dat"
+FILTER_NAME = "filter.csv"
+RESULT_NAME = "filtered_output.dat"
+STATUS_NAME = "status.json"
+# ----------------------------------------
+
+
+class QueueFull(Exception):
+    """Raised when MAX_PENDING jobs are already queued or running"""
+
+
+def job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def is_job_id(value):
+    """Job ids are uuid4 hex strings; anything else never touches the disk"""
+    try:
+        return uuid.UUID(value).hex == value
+    except ValueError:
+        return False
+
+
+def read_status(job_id):
+    """Return the status dict for a job, or None if it does not exist"""
+    try:
+        with open(os.path.join(job_dir(job_id), STATUS_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_status(path, **fields):
+    """Merge fields into status.json, replacing the file atomically.
+
+    Status lives on disk so any API process (not just the one that
+    accepted the job) can answer GET /jobs/<id>.
+    """
+    status_path = os.path.join(path, STATUS_NAME)
+    try:
+        with open(status_path, encoding="utf-8") as f:
+            status = json.load(f)
+    except FileNotFoundError:
+        status = {}
+
+    status.update(fields, updated_at=time.time())
+    tmp_path = status_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, status_path)
+
+
+def _run_job(path, spec, key_set=None):
+    """Worker-process entry point: run the filter for one job directory.
+
+    key_set is passed in when the job uses a registered filter set;
+    otherwise it is built from the job's own filter file, if it has one.
+    The spec is compiled here because compiled predicates hold closures
+    that cannot be sent to another process.
+    """
+    _write_status(path, state="running")
+    try:
+        filter_path = os.path.join(path, FILTER_NAME)
+        if key_set is None and os.path.exists(filter_path):
+            key_set = build_key_set(filter_path, spec.get("keys", KEY_COLS))
+        result = stream_filter(
+            os.path.join(path, INPUT_NAME),
+            compile_spec(spec, key_set),
+            os.path.join(path, RESULT_NAME),
+            progress=lambda scanned, matched: _write_status(
+                path, rows_scanned=scanned, rows_matched=matched)
+        )
+        metrics.count_rows("job", result["rows_scanned"], result["rows_matched"])
+        _write_status(path, state="done", **result)
+    except Exception as e:
+        _write_status(path, state="failed", error=str(e))
+
+
+class JobQueue:
+    """Bounded process pool for filter jobs.
+
+    At most max_workers jobs run at once; at most max_pending are accepted
+    (running + waiting) before submit() pushes back with QueueFull.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def create(self):
+        """Reserve a new job id and its working directory"""
+        job_id = uuid.uuid4().hex
+        path = job_dir(job_id)
+        os.makedirs(path)
+        _write_status(path, job_id=job_id, state="queued",
+                      rows_scanned=0, rows_matched=0, created_at=time.time())
+        return job_id, path
+
+    def submit(self, job_id, spec, key_set=None, **info):
+        """Queue a created job; spec and info are recorded in its status"""
+        if not self._slots.acquire(blocking=False):
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+            raise QueueFull()
+        path = job_dir(job_id)
+        _write_status(path, spec=spec, **info)
+        pool = self._pool()
+        try:
+            future = pool.submit(_run_job, path, spec, key_set)
+        except Exception as e:
+            self._slots.release()
+            self._failed(path, pool, e)
+            return
+        future.add_done_callback(lambda f: self._done(path, pool, f))
+
+    def _done(self, path, pool, future):
+        self._slots.release()
+        if future.exception() is not None:
+            # _run_job reports its own errors; this is the worker dying
+            self._failed(path, pool, future.exception())
+
+    def _failed(self, path, pool, error):
+        """Mark a job failed that never ran to completion; a broken pool (a
+        worker died) is dropped so the next submit starts a new one"""
+        _write_status(path, state="failed", error=str(error) or type(error).__name__)
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                if self._executor is pool:
+                    self._executor = None
+            pool.shutdown(wait=False)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
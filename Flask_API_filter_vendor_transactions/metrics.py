@@ -0,0 +1,109 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from uploads import call_on_close
+
+# Under gunicorn, gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR so every
+# worker (and job process) writes its samples there and /metrics sums them.
+
+REQUEST_SECONDS = Histogram(
+    "filter_api_request_seconds",
+    "Time from request start until the response body is fully sent",
+    ["endpoint", "method", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+IN_FLIGHT = Gauge(
+    "filter_api_requests_in_flight",
+    "Requests currently being served",
+    multiprocess_mode="livesum"
+)
+ROWS_SCANNED = Counter(
+    "filter_api_rows_scanned_total",
+    "Input rows scanned by /filter and background jobs",
+    ["source"]
+)
+ROWS_MATCHED = Counter(
+    "filter_api_rows_matched_total",
+    "Input rows that passed the filter",
+    ["source"]
+)
+BYTES_STREAMED = Counter(
+    "filter_api_bytes_streamed_total",
+    "Response body bytes streamed back by /filter"
+)
+
+
+def count_rows(source, scanned, matched):
+    ROWS_SCANNED.labels(source).inc(scanned)
+    ROWS_MATCHED.labels(source).inc(matched)
+
+
+def count_stream(chunks, scan):
+    """Pass chunks through, counting bytes sent and rows once finished"""
+    try:
+        for chunk in chunks:
+            BYTES_STREAMED.inc(len(chunk))
+            yield chunk
+    finally:
+        count_rows("filter", scan.rows_scanned, scan.rows_matched)
+
+
+def _start():
+    g.metrics_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _finish(status):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    method = request.method
+
+    def observe():
+        IN_FLIGHT.dec()
+        REQUEST_SECONDS.labels(endpoint, method, status).observe(
+            time.perf_counter() - start)
+    return observe
+
+
+def _after(response):
+    observe = _finish(str(response.status_code))
+    if observe:
+        call_on_close(response, observe)
+    return response
+
+
+def _teardown(exc):
+    if exc is not None:
+        observe = _finish("500")
+        if observe:
+            observe()
+
+
+def metrics_view():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
@@ -0,0 +1,144 @@
+import zlib
+
+import pandas as pd
+
+# ---------------- CONFIG ----------------
+FORMATS = {
+    # name: (file extension, mimetype)
+    "dat": ("dat", "text/plain"),
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrows", "application/vnd.apache.arrow.stream"),
+}
+COMPRESSIONS = {
+    # name: (file extension, mimetype)
+    "gzip": ("gz", "application/gzip"),
+    "zstd": ("zst", "application/zstd"),
+}
+# ----------------------------------------
+
+
+class OutputFormatError(ValueError):
+    """Unknown format/compression, or its optional package is missing"""
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written so far.
+
+    Lets pyarrow writers produce output incrementally instead of into one
+    big in-memory buffer.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _dat(scan):
+    # Original bytes: same delimiter, quoting and line endings as the input
+    yield scan.header
+    for records, _ in scan:
+        if records:
+            yield b"".join(records)
+
+
+def _csv(scan):
+    if scan.sep == ",":
+        yield from _dat(scan)
+        return
+    yield pd.DataFrame(columns=scan.columns).to_csv(index=False).encode("utf-8")
+    for _, frame in scan:
+        if len(frame):
+            yield frame.to_csv(index=False, header=False).encode("utf-8")
+
+
+def _arrow_writer(fmt):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise OutputFormatError(f"Install pyarrow to use format={fmt}")
+
+    if fmt == "parquet":
+        return pa, lambda sink, schema: pq.ParquetWriter(sink, schema)
+    return pa, lambda sink, schema: pa.ipc.new_stream(sink, schema)
+
+
+def _columnar(scan, fmt, pa, new_writer):
+    schema = pa.schema([(name, pa.string()) for name in scan.columns])
+    sink = _ChunkSink()
+    writer = new_writer(sink, schema)
+    for _, frame in scan:
+        if len(frame):
+            writer.write_table(pa.Table.from_pandas(
+                frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _compressor(compression):
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)  # 31 = gzip container
+    try:
+        import zstandard
+    except ImportError:
+        raise OutputFormatError("Install zstandard to use compression=zstd")
+    return zstandard.ZstdCompressor().compressobj()
+
+
+def _compressed(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode(scan, fmt="dat", compression=None):
+    """Return (byte chunk iterator, download name, mimetype) for a scan.
+
+    Fails fast on bad options, before any bytes are produced, so the
+    caller can still answer with a proper error status.
+    """
+    if fmt not in FORMATS:
+        raise OutputFormatError(f"format must be one of: {', '.join(FORMATS)}")
+    if compression and compression not in COMPRESSIONS:
+        raise OutputFormatError(f"compression must be one of: {', '.join(COMPRESSIONS)}")
+
+    extension, mimetype = FORMATS[fmt]
+    if fmt == "dat":
+        chunks = _dat(scan)
+    elif fmt == "csv":
+        chunks = _csv(scan)
+    else:
+        chunks = _columnar(scan, fmt, *_arrow_writer(fmt))
+
+    filename = f"filtered_output.{extension}"
+    if compression:
+        chunks = _compressed(chunks, _compressor(compression))
+        extension, mimetype = COMPRESSIONS[compression]
+        filename = f"{filename}.{extension}"
+
+    return chunks, filename, mimetype
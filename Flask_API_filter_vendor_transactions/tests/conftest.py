@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The API's modules sit next to each other at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing the app creates its upload, job and filter-set folders; keep
+# them out of the working tree
+_work = tempfile.mkdtemp()
+for _name in ("FILTER_UPLOAD_DIR", "FILTER_JOBS_DIR", "FILTER_SETS_DIR"):
+    os.environ.setdefault(_name, os.path.join(_work, _name.lower()))
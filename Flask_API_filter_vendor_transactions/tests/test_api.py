@@ -0,0 +1,60 @@
+import gzip
+import io
+
+import pytest
+
+import filter_records_by_combo_flask as api
+
+INPUT = (b"Operating Unit ID|Vendor ID|Supplier Site Code|Amount\n"
+         b"1|A|S1|10\n2|B|S2|20\n1|A|S1|30\n3|C|S3|40\n")
+FILTER = b"Operating Unit ID,Vendor ID,Supplier Site Code\n1,A,S1\n3,C,S3\n"
+
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+
+def files(**extra):
+    data = {"input_file": (io.BytesIO(INPUT), "input.dat"),
+            "filter_file": (io.BytesIO(FILTER), "filter.csv")}
+    data.update(extra)
+    return data
+
+
+def test_filter_streams_matching_records(client):
+    response = client.post("/filter", data=files(), content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert response.data == (b"Operating Unit ID|Vendor ID|Supplier Site Code|Amount\n"
+                             b"1|A|S1|10\n1|A|S1|30\n3|C|S3|40\n")
+
+
+def test_filter_as_gzipped_csv(client):
+    response = client.post("/filter?format=csv&compression=gzip", data=files(),
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert "filtered_output.csv.gz" in response.headers["Content-Disposition"]
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert lines[0] == "Operating Unit ID,Vendor ID,Supplier Site Code,Amount"
+    assert lines[1:] == ["1,A,S1,10", "1,A,S1,30", "3,C,S3,40"]
+
+
+def test_filter_rejects_bad_requests(client):
+    assert client.post("/filter?format=xml", data=files(),
+                       content_type="multipart/form-data").status_code == 400
+    response = client.post("/filter", data={"input_file": (io.BytesIO(INPUT), "input.dat")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+def test_registered_filter_set_is_reused(client):
+    created = client.post("/filters", data={"filter_file": (io.BytesIO(FILTER), "filter.csv")},
+                          content_type="multipart/form-data").get_json()
+    assert created["combos"] == 2
+    response = client.post("/filter", data={"input_file": (io.BytesIO(INPUT), "input.dat"),
+                                            "filter_id": created["filter_id"]},
+                           content_type="multipart/form-data")
+    assert response.data.count(b"\n") == 4
+    assert client.post("/filter", data={"input_file": (io.BytesIO(INPUT), "input.dat"),
+                                        "filter_id": "0" * 64},
+                       content_type="multipart/form-data").status_code == 404
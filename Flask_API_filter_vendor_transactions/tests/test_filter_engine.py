@@ -0,0 +1,53 @@
+import pytest
+
+from filter_engine import FilterScan, _iter_records, build_key_set, stream_filter
+from filter_spec import compile_spec
+
+HEADER = b"Operating Unit ID|Vendor ID|Supplier Site Code|Note\n"
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def run(tmp_path, body, keys):
+    input_path = write(tmp_path, "input.dat", HEADER + body)
+    filter_path = write(tmp_path, "filter.csv", b"Operating Unit ID,Vendor ID,Supplier Site Code\n"
+                        + b"".join(k.encode() + b"\n" for k in keys))
+    output_path = str(tmp_path / "output.dat")
+    counts = stream_filter(input_path, compile_spec({}, build_key_set(filter_path)), output_path,
+                           chunksize=2)
+    with open(output_path, "rb") as f:
+        return counts, f.read()
+
+
+def test_quote_inside_unquoted_field_is_plain_text(tmp_path):
+    body = b'1|A|S1|12" pipe\n2|B|S2|other\n3|C|S3|x\n'
+    counts, output = run(tmp_path, body, ["1,A,S1"])
+    assert counts == {"rows_scanned": 3, "rows_matched": 1}
+    assert output == HEADER + b'1|A|S1|12" pipe\n'
+
+
+def test_quoted_field_keeps_line_breaks_and_escaped_quotes(tmp_path):
+    body = b'1|A|S1|"two\nlines ""quoted"""\n2|B|S2|x\n3|C|S3|"a|b"\n'
+    counts, output = run(tmp_path, body, ["1,A,S1", "3,C,S3"])
+    assert counts == {"rows_scanned": 3, "rows_matched": 2}
+    assert output == HEADER + b'1|A|S1|"two\nlines ""quoted"""\n3|C|S3|"a|b"\n'
+
+
+def test_records_split_like_the_csv_parser():
+    lines = [b'1|"a\n', b'b"|c\n', b'2|x"y|"z"\n', b'3|"q""\n', b'"|r\n']
+    assert list(_iter_records(lines, "|")) == [
+        b'1|"a\nb"|c\n', b'2|x"y|"z"\n', b'3|"q""\n"|r\n']
+
+
+def test_records_that_do_not_pair_with_parsed_rows_are_an_error(tmp_path):
+    input_path = write(tmp_path, "input.dat", HEADER + b"1|A|S1|x\n")
+    scan = FilterScan(input_path, compile_spec({}, frozenset()))
+    try:
+        with pytest.raises(ValueError, match="Could not split"):
+            scan._match([b"1|A|S1|x\n2|B|S2|y\n"])
+    finally:
+        scan.close()
@@ -0,0 +1,31 @@
+import json
+
+from filter_engine import KEY_COLS
+from filter_sets import FilterSetCache, filter_id_for
+
+SHA = "ab" * 32
+
+
+def write_filter(tmp_path):
+    path = tmp_path / "filter.csv"
+    path.write_text("Operating Unit ID,Vendor ID,Supplier Site Code\n1,A,S1\n2,B,S2\n1,A,S1\n")
+    return str(path)
+
+
+def test_registered_sets_persist_and_reload(tmp_path):
+    cache = FilterSetCache(persist_dir=str(tmp_path / "sets"))
+    filter_id, (keys, combos) = cache.register(write_filter(tmp_path), SHA)
+    assert filter_id == SHA and keys == KEY_COLS and len(combos) == 2
+
+    with open(tmp_path / "sets" / f"{filter_id}.json") as f:
+        assert json.load(f) == {"keys": KEY_COLS, "combos": sorted(combos)}
+    # A fresh cache (another process) reads the set back from disk
+    assert FilterSetCache(persist_dir=str(tmp_path / "sets")).get(filter_id) == (KEY_COLS, combos)
+
+
+def test_key_columns_are_part_of_the_id(tmp_path):
+    cache = FilterSetCache(persist_dir="")
+    filter_id, (keys, combos) = cache.register(write_filter(tmp_path), SHA, ["Vendor ID"])
+    assert filter_id == filter_id_for(SHA, ["Vendor ID"]) != SHA
+    assert combos == frozenset({"A", "B"})
+    assert cache.get(SHA) is None and cache.get("not-an-id") is None
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from filter_spec import SpecError, compile_spec, parse_spec
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["Operating Unit ID", "Vendor ID", "Supplier Site Code",
+                                       "Invoice Amount"])
+
+
+ROWS = [["1", "A", "S1", "500"], ["2", "B", "S2", "1500"], [" 3", "C ", "S3", "x"]]
+KEYS = frozenset({"1\x1fA\x1fS1", "3\x1fC\x1fS3"})
+
+
+@pytest.mark.parametrize("mode, expected", [("include", [True, False, True]),
+                                            ("exclude", [False, True, False])])
+def test_key_combos_are_matched_on_every_chunk(mode, expected):
+    predicate = compile_spec({"mode": mode}, KEYS)
+    for _ in range(2):  # the key lookup is built once and reused
+        assert predicate(frame(ROWS)).tolist() == expected
+
+
+def test_rules_and_keys_are_combined():
+    spec = parse_spec('{"rules": [{"Invoice Amount": {"min": 1000}}]}')
+    assert compile_spec(spec)(frame(ROWS)).tolist() == [False, True, False]
+    assert compile_spec(spec, KEYS)(frame(ROWS)).tolist() == [False, False, False]
+
+
+def test_nothing_to_filter_on_is_rejected():
+    with pytest.raises(SpecError):
+        compile_spec({})
+
+
+@pytest.mark.parametrize("values", ["1", 5, [["1"]]])
+def test_in_needs_a_list_of_values(values):
+    with pytest.raises(SpecError):
+        compile_spec({"rules": [{"Vendor ID": {"in": values}}]})
+    with pytest.raises(SpecError):
+        compile_spec({"rules": [{"Vendor ID": {"not_in": values}}]})
+
+
+def test_in_matches_listed_values():
+    spec = {"rules": [{"Operating Unit ID": {"in": ["1", 3]}}]}
+    assert compile_spec(spec)(frame(ROWS)).tolist() == [True, False, True]
@@ -0,0 +1,82 @@
+import io
+import os
+import time
+
+import pytest
+
+import filter_records_by_combo_flask as api
+import jobs
+
+INPUT = (b"Operating Unit ID|Vendor ID|Supplier Site Code|Amount\n"
+         b"1|A|S1|10\n2|B|S2|20\n3|C|S3|40\n")
+FILTER = b"Operating Unit ID,Vendor ID,Supplier Site Code\n1,A,S1\n"
+
+
+@pytest.fixture
+def client():
+    yield api.app.test_client()
+    api.job_queue.shutdown()
+
+
+def submit(client, **data):
+    data.setdefault("input_file", (io.BytesIO(INPUT), "input.dat"))
+    return client.post("/jobs", data=data, content_type="multipart/form-data")
+
+
+def wait(client, status_url):
+    deadline = time.time() + 30
+    while True:
+        status = client.get(status_url).get_json()
+        if status["state"] not in ("queued", "running") or time.time() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+def test_job_runs_in_the_background(client):
+    response = submit(client, filter_file=(io.BytesIO(FILTER), "filter.csv"))
+    assert response.status_code == 202
+    job = response.get_json()
+
+    status = wait(client, job["status_url"])
+    assert status["state"] == "done"
+    assert (status["rows_scanned"], status["rows_matched"]) == (3, 1)
+    result = client.get(job["result_url"])
+    assert result.data == b"Operating Unit ID|Vendor ID|Supplier Site Code|Amount\n1|A|S1|10\n"
+
+
+def test_failed_job_reports_its_error(client):
+    job = submit(client, input_file=(io.BytesIO(b"no|such|columns\n1|2|3\n"), "input.dat"),
+                 filter_file=(io.BytesIO(FILTER), "filter.csv")).get_json()
+    status = wait(client, job["status_url"])
+    assert status["state"] == "failed" and status["error"]
+    assert client.get(job["result_url"]).status_code == 409
+
+
+def test_unknown_jobs(client):
+    assert client.get("/jobs/not-a-job").status_code == 404
+    assert client.get("/jobs/" + "0" * 32 + "/result").status_code == 404
+
+
+def test_full_queue_pushes_back(client, monkeypatch):
+    queue = jobs.JobQueue(max_workers=1, max_pending=0)
+    monkeypatch.setattr(api, "job_queue", queue)
+    response = submit(client, filter_file=(io.BytesIO(FILTER), "filter.csv"))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+
+
+def test_broken_pool_fails_the_job_and_is_replaced(client, monkeypatch):
+    queue = jobs.JobQueue(max_workers=1, max_pending=1)
+    monkeypatch.setattr(api, "job_queue", queue)
+    broken = queue._pool()
+    broken.submit(os._exit, 1).exception()
+
+    job = submit(client, filter_file=(io.BytesIO(FILTER), "filter.csv")).get_json()
+    status = wait(client, job["status_url"])
+    assert status["state"] == "failed" and status["error"]
+    assert queue._executor is not broken
+
+    # The slot was given back and a new pool runs the next job
+    job = submit(client, filter_file=(io.BytesIO(FILTER), "filter.csv")).get_json()
+    assert wait(client, job["status_url"])["state"] == "done"
+    queue.shutdown()
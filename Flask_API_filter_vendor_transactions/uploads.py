@@ -0,0 +1,130 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from functools import partial
+
+from flask import Request, g
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import ClosingIterator
+
+# ---------------- CONFIG ----------------
+UPLOAD_DIR = os.path.abspath(os.environ.get("FILTER_UPLOAD_DIR", "uploads"))
+MAX_FILE_BYTES = int(os.environ.get("FILTER_MAX_FILE_BYTES", str(25 * 1024 ** 3)))
+MAX_REQUEST_BYTES = int(os.environ.get("FILTER_MAX_REQUEST_BYTES", str(2 * MAX_FILE_BYTES)))
+RETENTION_SECONDS = int(os.environ.get("FILTER_RETENTION_SECONDS", str(24 * 3600)))
+SWEEP_INTERVAL_SECONDS = 300
+# ----------------------------------------
+
+_last_sweep = 0.0
+
+
+class HashedUpload:
+    """Disk file that hashes and size-checks an upload while it is written.
+
+    Werkzeug's multipart parser writes each part straight into this object,
+    so the body is never buffered in memory and never copied after upload.
+    """
+
+    def __init__(self, path, limit=MAX_FILE_BYTES):
+        self.path = path
+        self.size = 0
+        self.limit = limit
+        self._file = open(path, "w+b")
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise RequestEntityTooLarge(
+                f"Each file must be at most {self.limit} bytes")
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request that streams uploaded files into the request's working dir"""
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        fd, path = tempfile.mkstemp(dir=request_workdir(), suffix=".part")
+        os.close(fd)
+        return HashedUpload(path)
+
+
+def request_workdir():
+    """Unique folder for everything one request reads or writes"""
+    if "workdir" not in g:
+        g.workdir = tempfile.mkdtemp(dir=UPLOAD_DIR, prefix="req-")
+    return g.workdir
+
+
+def persist(file_storage, dest_path):
+    """Move an uploaded file to dest_path and return its size and hash"""
+    upload = file_storage.stream
+    upload.close()
+    shutil.move(upload.path, dest_path)
+    return {"size": upload.size, "sha256": upload.sha256}
+
+
+def sweep_expired(root, max_age=RETENTION_SECONDS):
+    """Delete sub-folders of root that have not changed for max_age seconds"""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def maybe_sweep(*roots):
+    """Run sweep_expired at most once per SWEEP_INTERVAL_SECONDS per process"""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    for root in roots:
+        sweep_expired(root)
+
+
+def call_on_close(response, func):
+    """Run func once the response body has been fully sent (or aborted)"""
+    if response.direct_passthrough:
+        # send_file hands its file wrapper straight to the server,
+        # bypassing the response's own close callbacks
+        response.response = ClosingIterator(response.response, func)
+    else:
+        response.call_on_close(func)
+
+
+def _remove_workdir(response):
+    workdir = g.pop("workdir", None)
+    if workdir:
+        call_on_close(response, partial(shutil.rmtree, workdir, ignore_errors=True))
+    return response
+
+
+def _remove_workdir_on_error(exc):
+    if exc is not None:
+        workdir = g.pop("workdir", None)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def init_app(app):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.request_class = UploadRequest
+    if app.config.get("MAX_CONTENT_LENGTH") is None:
+        app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+    app.after_request(_remove_workdir)
+    app.teardown_request(_remove_workdir_on_error)
@@ -0,0 +1,273 @@
+"""
+Vectorised fund analytics for the Indian MF Dashboard
+
+Everything here works on a NAV matrix: a DataFrame indexed by date with
+one column per fund (see NavStore.nav_matrix), NaN where a fund has no NAV
+that day. Each metric is computed for every column at once with NumPy,
+so a category of thousands of funds costs about as much as one fund.
+
+Periods are calendar periods: "1Y" compares the latest NAV with the last
+NAV on or before the same date a year earlier, not with the NAV 365 rows
+back.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.065  # 6.5% for India
+
+PERIODS = {
+    '1W': pd.DateOffset(weeks=1),
+    '1M': pd.DateOffset(months=1),
+    '3M': pd.DateOffset(months=3),
+    '6M': pd.DateOffset(months=6),
+    '1Y': pd.DateOffset(years=1),
+    '3Y': pd.DateOffset(years=3),
+    '5Y': pd.DateOffset(years=5),
+}
+
+# Periods also reported annualised, as '<period>_CAGR'
+CAGR_PERIODS = ('1Y', '3Y', '5Y')
+
+# Funds read and computed at a time by refresh_metrics
+METRICS_BATCH = 500
+
+# Moving averages (in NAVs) kept in a fund's rolling series; NavStore's
+# nav_series table has an ma<window> column for each
+MA_WINDOWS = (50, 200)
+
+# Columns of a rolling series (see extend_series)
+SERIES_COLUMNS = ('ret', *(f'ma{w}' for w in MA_WINDOWS), 'peak',
+                  'n', 's1', 's2', 's3', 's4', 'down2', 'wins')
+
+
+def _bounds(values):
+    """Row of each column's first and last NAV (-1 for an empty column)"""
+    valid = ~np.isnan(values)
+    has = valid.any(axis=0)
+    first = np.where(has, valid.argmax(axis=0), -1)
+    last = np.where(has, len(values) - 1 - valid[::-1].argmax(axis=0), -1)
+    return first, last, has
+
+
+def _prepare(matrix):
+    values = matrix.to_numpy(dtype=float)
+    first, last, has = _bounds(values)
+    # Carry each NAV forward so any date can be looked up "as of"
+    filled = matrix.ffill().to_numpy(dtype=float)
+    return values, filled, first, last, has
+
+
+def returns_table(matrix, periods=PERIODS):
+    """Point-to-point returns (%) per fund, as of each fund's latest NAV.
+
+    Columns: each period, '<period>_CAGR' for CAGR_PERIODS and 'Inception'
+    (CAGR since the first NAV). NaN where a fund's history is too short.
+    """
+    _, filled, first, last, has = _prepare(matrix)
+    cols = np.arange(matrix.shape[1])
+    last = np.where(has, last, 0)
+    end_dates = matrix.index[last]
+    end_nav = filled[last, cols]
+
+    out = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, offset in periods.items():
+            rows = matrix.index.searchsorted(end_dates - offset, side='right') - 1
+            ok = has & (rows >= first)
+            rows = np.clip(rows, 0, None)
+            ratio = np.where(ok, end_nav / filled[rows, cols], np.nan)
+            out[name] = (ratio - 1) * 100
+            if name in CAGR_PERIODS:
+                years = (end_dates - matrix.index[rows]).days.to_numpy() / 365.25
+                out[f'{name}_CAGR'] = (ratio ** (1 / years) - 1) * 100
+
+        first = np.where(has, first, 0)
+        years = (end_dates - matrix.index[first]).days.to_numpy() / 365.25
+        ratio = end_nav / filled[first, cols]
+        out['Inception'] = np.where(has & (years > 0), (ratio ** (1 / years) - 1) * 100, np.nan)
+    return pd.DataFrame(out, index=matrix.columns)
+
+
+def daily_returns(matrix):
+    """Return of each NAV over the fund's previous NAV (NaN where it has none)"""
+    values, filled, first, _, _ = _prepare(matrix)
+    returns = np.full_like(values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = filled[1:] / filled[:-1] - 1
+    returns[np.isnan(values)] = np.nan
+    returns[np.arange(len(values))[:, None] <= first] = np.nan
+    return pd.DataFrame(returns, index=matrix.index, columns=matrix.columns)
+
+
+def drawdowns(matrix):
+    """Fall from the running peak NAV, as a fraction (0 at a new high)"""
+    filled = matrix.ffill().to_numpy(dtype=float)
+    peak = np.fmax.accumulate(filled, axis=0)
+    return pd.DataFrame(filled / peak - 1, index=matrix.index, columns=matrix.columns)
+
+
+def risk_table(matrix, risk_free=RISK_FREE_RATE):
+    """Annualised volatility (%), Sharpe, Sortino, max drawdown (%) and
+    best/worst day (%) per fund"""
+    returns = daily_returns(matrix).to_numpy()
+    counts = (~np.isnan(returns)).sum(axis=0)
+    out = pd.DataFrame(index=matrix.columns)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+        mean = np.nanmean(returns, axis=0)
+        std = np.nanstd(returns, axis=0, ddof=1)
+        excess = mean * TRADING_DAYS - risk_free
+        downside = np.sqrt(np.nanmean(
+            np.minimum(returns - risk_free / TRADING_DAYS, 0) ** 2, axis=0)) * np.sqrt(TRADING_DAYS)
+        annual_std = std * np.sqrt(TRADING_DAYS)
+
+        out['volatility'] = annual_std * 100
+        out['sharpe'] = np.where(annual_std > 0, excess / annual_std, 0)
+        out['sortino'] = np.where(downside > 0, excess / downside, 0)
+        out['max_dd'] = np.nanmin(drawdowns(matrix).to_numpy(), axis=0) * 100
+        out['best_day'] = np.nanmax(returns, axis=0) * 100
+        out['worst_day'] = np.nanmin(returns, axis=0) * 100
+    out.loc[counts == 0] = np.nan
+    return out
+
+
+def rolling_returns(matrix, years=1):
+    """Annualised return over the `years` before each date, per fund.
+
+    The start of each window is the last NAV on or before the same date
+    `years` earlier; NaN until a fund has that much history.
+    """
+    values, filled, first, _, _ = _prepare(matrix)
+    starts = matrix.index.searchsorted(matrix.index - pd.DateOffset(years=years),
+                                       side='right') - 1
+    ok = (starts[:, None] >= first) & (starts[:, None] >= 0) & ~np.isnan(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = filled / filled[np.clip(starts, 0, None)]
+        result = np.where(ok, (ratio ** (1 / years) - 1) * 100, np.nan)
+    return pd.DataFrame(result, index=matrix.index, columns=matrix.columns)
+
+
+def extend_series(navs, tail=(), last=None, risk_free=RISK_FREE_RATE):
+    """Rolling series of one fund for NAVs after those already covered.
+
+    navs: the new NAVs (a Series indexed by date, oldest first); tail: up
+    to max(MA_WINDOWS) - 1 NAVs just before them; last: the series' last
+    row so far (None to start a series). Each row holds the daily return,
+    moving averages, the running peak NAV and running sums of returns
+    (count, powers 1-4, squared shortfall below the risk-free rate and up
+    days), so the cost is O(len(navs)) however long the history is.
+    """
+    values = navs.to_numpy(dtype=float)
+    tail = np.asarray(tail, dtype=float)[len(tail) - max(MA_WINDOWS) + 1:]
+    previous = np.concatenate([tail[-1:] if len(tail) else [np.nan], values[:-1]])
+    out = pd.DataFrame(index=navs.index)
+    out['ret'] = values / previous - 1
+
+    # Moving averages as differences of a cumulative sum over tail + navs
+    joined = np.concatenate([tail, values])
+    cumulative = np.concatenate([[0], np.cumsum(joined)])
+    ends = np.arange(len(tail), len(joined)) + 1
+    for window in MA_WINDOWS:
+        starts = ends - window
+        out[f'ma{window}'] = np.where(
+            starts >= 0, (cumulative[ends] - cumulative[np.clip(starts, 0, None)]) / window, np.nan)
+
+    peak = -np.inf if last is None else last['peak']
+    out['peak'] = np.maximum.accumulate(np.concatenate([[peak], values]))[1:]
+
+    returns = out['ret'].to_numpy()
+    valid = ~np.isnan(returns)
+    r = np.where(valid, returns, 0)
+    terms = {'n': valid, 's1': r, 's2': r ** 2, 's3': r ** 3, 's4': r ** 4,
+             'down2': np.where(valid, np.minimum(r - risk_free / TRADING_DAYS, 0) ** 2, 0),
+             'wins': r > 0}
+    for name, term in terms.items():
+        out[name] = np.cumsum(term, dtype=float) + (0 if last is None else last[name])
+    return out[list(SERIES_COLUMNS)]
+
+
+def series_stats(series):
+    """Return and risk statistics of one slice of a fund's rolling series
+    (NAVs plus extend_series columns), over the daily returns after its
+    first date.
+
+    Moments come from the running sums at the slice's two ends, so they
+    cost the same for a month as for twenty years; only the order
+    statistics (best, worst and median day, drawdown) read the slice.
+    Keys match risk_table's, plus mean/median/std (%), skew, kurtosis
+    (sample-adjusted, as pandas), up_days, days and current_dd (% below
+    the all-time peak).
+    """
+    first, last = series.iloc[0], series.iloc[-1]
+    n = last['n'] - first['n']
+    if n < 2:
+        return {}
+    s1, s2, s3, s4, down2 = ((last[c] - first[c]) / n for c in ('s1', 's2', 's3', 's4', 'down2'))
+    m2 = max(s2 - s1 ** 2, 0)
+    m3 = s3 - 3 * s1 * s2 + 2 * s1 ** 3
+    m4 = s4 - 4 * s1 * s3 + 6 * s1 ** 2 * s2 - 3 * s1 ** 4
+    std = np.sqrt(m2 * n / (n - 1))
+    annual_std = std * np.sqrt(TRADING_DAYS)
+    downside = np.sqrt(down2 * TRADING_DAYS)
+    excess = s1 * TRADING_DAYS - RISK_FREE_RATE
+
+    navs = series['nav'].to_numpy(dtype=float)
+    returns = series['ret'].to_numpy()[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5 if n > 2 else np.nan
+        kurtosis = ((n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2 ** 2)
+                    - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))) if n > 3 else np.nan
+    return {
+        'volatility': annual_std * 100,
+        'sharpe': excess / annual_std if annual_std > 0 else 0,
+        'sortino': excess / downside if downside > 0 else 0,
+        'max_dd': np.min(navs / np.maximum.accumulate(navs) - 1) * 100,
+        'best_day': np.nanmax(returns) * 100,
+        'worst_day': np.nanmin(returns) * 100,
+        'mean': s1 * 100,
+        'median': np.nanmedian(returns) * 100,
+        'std': std * 100,
+        'skew': skew if m2 > 0 else 0,
+        'kurtosis': kurtosis if m2 > 0 else 0,
+        'up_days': int(last['wins'] - first['wins']),
+        'days': int(n),
+        'current_dd': (last['nav'] / last['peak'] - 1) * 100,
+    }
+
+
+def metrics_table(matrix):
+    """returns_table and risk_table side by side, one row per fund"""
+    return returns_table(matrix).join(risk_table(matrix))
+
+
+def latest_table(matrix):
+    """Latest NAV, its date and years of history per fund"""
+    values = matrix.to_numpy(dtype=float)
+    first, last, has = _bounds(values)
+    first, last = np.where(has, first, 0), np.where(has, last, 0)
+    end_dates = matrix.index[last]
+    return pd.DataFrame({
+        'nav': np.where(has, values[last, np.arange(values.shape[1])], np.nan),
+        'as_of': end_dates.strftime('%Y-%m-%d'),
+        'years': np.round((end_dates - matrix.index[first]).days.to_numpy() / 365.25, 2),
+    }, index=matrix.columns)[has]
+
+
+def refresh_metrics(store, batch_size=METRICS_BATCH):
+    """Recompute the screener's metrics table for every fund in store
+    (meant to run nightly, after the NAV update). Returns the fund count."""
+    codes = [fund['schemeCode'] for fund in store.funds()]
+    tables = []
+    for start in range(0, len(codes), batch_size):
+        matrix = store.nav_matrix(codes[start:start + batch_size])
+        if matrix.empty:
+            continue
+        latest = latest_table(matrix)
+        tables.append(latest.join(metrics_table(matrix[latest.index])))
+    metrics = pd.concat(tables) if tables else pd.DataFrame()
+    store.save_metrics(metrics)
+    return len(metrics)
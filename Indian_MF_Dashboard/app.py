@@ -14,6 +14,11 @@ from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import requests
 from typing import Dict, List, Optional
+from nav_store import NavStore, OFFLINE
+from fund_search import FundIndex
+from downsample import downsample, plot_dates
+import analytics
+import backtest
 
 # Page Configuration
 st.set_page_config(
@@ -45,101 +50,130 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# API Functions
+# Funds offered in the fund selector, best-ranked first
+MAX_SEARCH_RESULTS = 200
+
+# Most funds compared side by side, and screener rows shown
+MAX_COMPARE = 5
+MAX_SCREENER_ROWS = 500
+
+# Popular Categories buttons -> text the AMFI category must contain
+POPULAR_CATEGORIES = {
+    'Large Cap': 'Large Cap', 'Mid Cap': 'Mid Cap', 'Small Cap': 'Small Cap',
+    'Flexi Cap': 'Flexi Cap', 'ELSS': 'ELSS', 'Debt': 'Debt Scheme',
+    'Hybrid': 'Hybrid Scheme', 'Index': 'Index Fund',
+}
+
+# Backtest plans, and the rolling SIP lengths (years) offered
+BACKTEST_PLANS = ["SIP", "Lumpsum", "STP", "SWP"]
+ROLLING_SIP_YEARS = [1, 3, 5, 10]
+
+# Screener columns: metric -> label
+SCREENER_METRICS = {
+    '1M': '1M %', '6M': '6M %', '1Y': '1Y %', '3Y_CAGR': '3Y CAGR %',
+    '5Y_CAGR': '5Y CAGR %', 'volatility': 'Volatility %', 'max_dd': 'Max DD %',
+    'sharpe': 'Sharpe', 'sortino': 'Sortino',
+}
+
+# Data Functions
+
+
+@st.cache_resource
+def get_nav_store():
+    """Local NAV database, shared by every session"""
+    return NavStore()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def update_nav_store():
+    """Append NAVs published since the last update - one bulk AMFI download
+    for every scheme. Returns the day the store is updated through."""
+    store = get_nav_store()
+    if OFFLINE:
+        return store.updated_through()
+    try:
+        return store.update()
+    except requests.exceptions.RequestException:
+        return store.updated_through()
 
 
 @st.cache_data(ttl=3600)
 def get_all_funds():
-    try:
-        response = requests.get("https://api.mfapi.in/mf", timeout=15)
-        return response.json() if response.status_code == 200 else []
-    except:
-        return []
+    update_nav_store()
+    return get_nav_store().funds()
 
 
-@st.cache_data(ttl=1800)
-def get_fund_data(code):
-    try:
-        response = requests.get(f"https://api.mfapi.in/mf/{code}", timeout=15)
-        return response.json() if response.status_code == 200 else None
-    except:
-        return None
+@st.cache_resource(ttl=3600)
+def get_fund_index():
+    """Search index over the fund list, rebuilt when the list is refreshed"""
+    return FundIndex(get_all_funds())
 
 
-def parse_nav(data):
-    if not data or 'data' not in data:
-        return None
-    df = pd.DataFrame(data['data'])
-    df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y')
-    df['nav'] = pd.to_numeric(df['nav'], errors='coerce')
-    df = df.dropna().sort_values('date').set_index('date')
-    return df
+def get_fund_data(code):
+    """Scheme details; the fund's full history is fetched once, on first use"""
+    store = get_nav_store()
+    if not OFFLINE and store.needs_history(code):
+        try:
+            store.fetch_history(code)
+        except requests.exceptions.RequestException:
+            pass
+    return store.fund_meta(code)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_rolling_sip(code, years, updated):
+    """XIRR (%) of a `years` SIP started on each of code's NAV dates;
+    `updated` (the store's update day) keys the cache"""
+    matrix = get_nav_store().nav_frame(code).rename(columns={'nav': code})
+    return backtest.rolling_sip(matrix, years)[code].dropna()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_fund_metrics(computed_at):
+    """The precomputed metrics table behind the screener (see nav_store.py metrics);
+    `computed_at` (the store's last metrics run) keys the cache"""
+    return get_nav_store().load_metrics()
 
 # Calculation Functions
 
 
 def calc_returns(nav):
+    """Calendar-period returns of one NAV series (see analytics.returns_table)"""
     if len(nav) < 2:
         return {}
-    curr = nav.iloc[-1]
-    ret = {}
-    periods = {'1W': 7, '1M': 30, '3M': 90,
-               '6M': 180, '1Y': 365, '3Y': 1095, '5Y': 1825}
-
-    for name, days in periods.items():
-        if len(nav) >= days:
-            old = nav.iloc[-days]
-            ret[name] = ((curr - old) / old) * 100 if old > 0 else 0
-            if 'Y' in name and days >= 365:
-                years = days / 365
-                ret[f'{name}_CAGR'] = (
-                    ((curr / old) ** (1/years)) - 1) * 100 if old > 0 else 0
-
-    # Inception
-    first = nav.iloc[0]
-    years = (nav.index[-1] - nav.index[0]).days / 365.25
-    if years > 0 and first > 0:
-        ret['Inception'] = (((curr / first) ** (1/years)) - 1) * 100
-
-    return ret
-
-
-def calc_risk(nav):
-    dr = nav.pct_change().dropna()
-    if len(dr) == 0:
-        return {}
+    row = analytics.returns_table(nav.to_frame()).iloc[0]
+    return row.dropna().to_dict()
 
-    cum = (1 + dr).cumprod()
-    rm = cum.expanding().max()
-    dd = (cum - rm) / rm
 
-    return {
-        'volatility': dr.std() * np.sqrt(252) * 100,
-        'max_dd': dd.min() * 100,
-        'sharpe': (dr.mean() * 252 - 0.065) / (dr.std() * np.sqrt(252)) if dr.std() > 0 else 0,
-        'best_day': dr.max() * 100,
-        'worst_day': dr.min() * 100
-    }
+def calc_risk(series):
+    """Risk and distribution stats of a slice of a fund's rolling series
+    (see analytics.series_stats)"""
+    return analytics.series_stats(series)
 
 # Chart Functions
 
 
 def chart_nav(df, name, show_ma=True):
+    # Downsampled to about one point per pixel; moving averages are read
+    # on the same dates, so hovering lines them up
+    df = downsample(df[['nav', 'ma50', 'ma200']], 'nav').round(4)
+    dates = plot_dates(df.index)
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df.index, y=df['nav'], name='NAV',
+        x=dates, y=df['nav'], name='NAV',
         line=dict(color='#667eea', width=2),
         fill='tozeroy', fillcolor='rgba(102,126,234,0.1)'
     ))
 
-    if show_ma and len(df) >= 50:
+    # Moving averages come precomputed with the series, over the full history
+    if show_ma and df['ma50'].notna().any():
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['nav'].rolling(50).mean(),
+            x=dates, y=df['ma50'],
             name='50-Day MA', line=dict(color='orange', width=1.5, dash='dash')
         ))
-    if show_ma and len(df) >= 200:
+    if show_ma and df['ma200'].notna().any():
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['nav'].rolling(200).mean(),
+            x=dates, y=df['ma200'],
             name='200-Day MA', line=dict(color='red', width=1.5, dash='dash')
         ))
 
@@ -178,32 +212,199 @@ def chart_returns(ret_dict):
     return fig
 
 
-def chart_sip(monthly, rate, years):
-    months = int(years * 12)
-    mr = rate / 12 / 100
-    data = []
-    inv = val = 0
+def chart_sip(frame, title):
+    """Invested amount and value (and cash withdrawn, for an SWP) of a
+    backtest over time"""
+    frame = downsample(frame, 'Value').round(2)
+    dates = plot_dates(frame.index)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=dates, y=frame['Invested'], name='Invested',
+                             line=dict(color='orange', width=2)))
+    fig.add_trace(go.Scatter(x=dates, y=frame['Value'], name='Portfolio Value',
+                             line=dict(color='green', width=3), fill='tonexty'))
+    if 'Withdrawn' in frame:
+        fig.add_trace(go.Scatter(x=dates, y=frame['Withdrawn'], name='Withdrawn',
+                                 line=dict(color='#667eea', width=2, dash='dash')))
 
-    for m in range(1, months + 1):
-        inv += monthly
-        val = (val + monthly) * (1 + mr)
-        data.append({'Year': m/12, 'Invested': inv,
-                    'Value': val, 'Gain': val - inv})
+    fig.update_layout(
+        title=title, xaxis_title='Date', yaxis_title='Amount (₹)',
+        template='plotly_dark', hovermode='x unified', height=450
+    )
+    return fig
 
-    df = pd.DataFrame(data)
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df['Year'], y=df['Invested'],
-                  name='Invested', line=dict(color='orange', width=2)))
-    fig.add_trace(go.Scatter(x=df['Year'], y=df['Value'], name='Portfolio Value',
-                             line=dict(color='green', width=3), fill='tonexty'))
+def chart_rolling_sip(xirrs, years):
+    fig = px.histogram(x=xirrs, nbins=50, template='plotly_dark',
+                       labels={'x': f'{years}Y SIP XIRR (%)'})
+    fig.add_vline(x=0, line_color='red', line_dash='dash')
+    fig.update_layout(title=f'{years}-Year SIP Returns by Start Date',
+                      yaxis_title='Start Dates', height=350, showlegend=False)
+    return fig
+
+# Screener and Comparison
+
+
+def open_screener(category):
+    st.session_state.view = "Screener"
+    metrics = get_fund_metrics(get_nav_store().metrics_computed_at())
+    st.session_state.screener_categories = [] if metrics.empty else [
+        c for c in metrics['category'].dropna().unique()
+        if POPULAR_CATEGORIES[category] in c]
+
 
+def open_comparison(codes):
+    st.session_state.compare_codes = list(codes)
+    st.session_state.view = "Compare"
+
+
+def display_screener():
+    st.markdown("### 🔎 Fund Screener")
+    metrics = get_fund_metrics(get_nav_store().metrics_computed_at())
+    if metrics.empty:
+        st.info("No precomputed metrics yet - run `python nav_store.py metrics` "
+                "(nightly, after `python nav_store.py update`)")
+        return
+    st.caption(f"Metrics computed {get_nav_store().metrics_computed_at()} "
+               f"for {len(metrics):,} funds")
+
+    cols = st.columns(len(POPULAR_CATEGORIES))
+    for col, cat in zip(cols, POPULAR_CATEGORIES):
+        col.button(cat, key=f"screen_{cat}", on_click=open_screener, args=(cat,),
+                   use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        categories = st.multiselect("Category", sorted(metrics['category'].dropna().unique()),
+                                    key="screener_categories")
+    with col2:
+        amcs = st.multiselect("Fund House", sorted(metrics['amc'].dropna().unique()))
+    with col3:
+        direct = st.checkbox("Direct plans only", value=True)
+        growth = st.checkbox("Growth options only", value=True)
+        active = st.checkbox("NAV in the last 30 days", value=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+    min_years = col1.number_input("Min history (years)", 0.0, 30.0, 0.0, 0.5)
+    min_1y = col2.number_input("Min 1Y return (%)", -100.0, 500.0, -100.0, 1.0)
+    max_vol = col3.number_input("Max volatility (%)", 0.0, 200.0, 200.0, 1.0)
+    max_dd = col4.number_input("Max drawdown (%)", 0.0, 100.0, 100.0, 1.0)
+
+    col1, col2 = st.columns([3, 1])
+    sort_by = col1.selectbox("Sort by", list(SCREENER_METRICS), index=3,
+                             format_func=SCREENER_METRICS.get)
+    ascending = col2.checkbox("Ascending", value=sort_by in ('volatility',))
+
+    # Whole-table vectorised filters
+    mask = metrics['years'] >= min_years
+    if categories:
+        mask &= metrics['category'].isin(categories)
+    if amcs:
+        mask &= metrics['amc'].isin(amcs)
+    if direct:
+        mask &= metrics['name'].str.contains('direct', case=False)
+    if growth:
+        mask &= metrics['name'].str.contains('growth', case=False)
+    if active:
+        cutoff = (pd.Timestamp(metrics['as_of'].max()) - timedelta(days=30)).strftime('%Y-%m-%d')
+        mask &= metrics['as_of'] >= cutoff
+    if min_1y > -100:
+        mask &= metrics['1Y'] >= min_1y
+    if max_vol < 200:
+        mask &= metrics['volatility'] <= max_vol
+    if max_dd < 100:
+        mask &= metrics['max_dd'] >= -max_dd
+
+    result = metrics[mask].sort_values(sort_by, ascending=ascending, na_position='last')
+    st.caption(f"{len(result):,} funds match" +
+               (f" - top {MAX_SCREENER_ROWS} shown" if len(result) > MAX_SCREENER_ROWS else ""))
+    table = result.head(MAX_SCREENER_ROWS)[['name', 'category', 'nav', 'as_of'] +
+                                           list(SCREENER_METRICS)]
+    st.dataframe(table.rename(columns={'name': 'Fund', 'category': 'Category', 'nav': 'NAV',
+                                       'as_of': 'As of', **SCREENER_METRICS}).round(2),
+                 use_container_width=True)
+
+    picks = st.multiselect("Add to comparison", table.index.tolist(),
+                           format_func=lambda code: metrics.at[code, 'name'],
+                           max_selections=MAX_COMPARE)
+    st.button("⚖️ Compare selected", disabled=len(picks) < 2,
+              on_click=open_comparison, args=(picks,))
+
+
+def display_comparison(fund_index, period_days):
+    st.markdown("### ⚖️ Peer Comparison")
+    if 'compare_codes' not in st.session_state:
+        st.session_state.compare_codes = []
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search = st.text_input("Find a fund to add", key="compare_search")
+        matches, _ = fund_index.search(search, limit=MAX_SEARCH_RESULTS)
+        to_add = st.selectbox("Fund", matches, format_func=fund_index.name, key="compare_add")
+    with col2:
+        st.write("")
+        st.write("")
+        full = len(st.session_state.compare_codes) >= MAX_COMPARE
+        if st.button("➕ Add", disabled=full or to_add is None) \
+                and to_add not in st.session_state.compare_codes:
+            st.session_state.compare_codes.append(to_add)
+
+    codes = st.multiselect("Comparing", st.session_state.compare_codes,
+                           default=st.session_state.compare_codes,
+                           format_func=fund_index.name)
+    st.session_state.compare_codes = codes
+    if len(codes) < 2:
+        st.info(f"Pick 2 to {MAX_COMPARE} funds to compare")
+        return
+
+    for code in codes:
+        get_fund_data(code)
+    history = get_nav_store().nav_matrix(codes)
+    matrix = history
+    if period_days:
+        matrix = history[history.index >= history.index[-1] - timedelta(days=period_days)]
+    # Rebase every fund to 100 on the first day they all have a NAV
+    common = matrix.dropna()
+    if common.empty:
+        st.warning("These funds have no NAV dates in common in this period")
+        return
+    rebased = matrix.loc[common.index[0]:].ffill() / common.iloc[0] * 100
+
+    fig = go.Figure()
+    for code in codes:
+        trace = downsample(rebased[[code]], code).round(2)
+        fig.add_trace(go.Scatter(x=plot_dates(trace.index), y=trace[code],
+                                 name=fund_index.name(code)))
     fig.update_layout(
-        title=f'SIP Growth - ₹{monthly:,.0f}/month @ {rate:.1f}% p.a.',
-        xaxis_title='Years', yaxis_title='Amount (₹)',
-        template='plotly_dark', height=450
+        title='Growth of ₹100', xaxis_title='Date', yaxis_title='Value (₹)',
+        template='plotly_dark', hovermode='x unified', height=500,
+        legend=dict(orientation='h', y=-0.2)
     )
-    return fig, df
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Precomputed metrics; computed here only for funds the table lacks
+    metrics = get_fund_metrics(get_nav_store().metrics_computed_at())
+    table = metrics.reindex(codes) if not metrics.empty else pd.DataFrame(index=codes)
+    missing = table.index[table[list(SCREENER_METRICS)].isna().all(axis=1)] \
+        if not metrics.empty else table.index
+    if len(missing):
+        table = table.combine_first(analytics.metrics_table(history[missing]))
+    table = table.reindex(codes)
+    table.index = [fund_index.name(code) for code in table.index]
+    st.dataframe(table[list(SCREENER_METRICS)].rename(columns=SCREENER_METRICS).T.round(2),
+                 use_container_width=True)
+
+    st.markdown("#### 🎲 Rolling 3-Year SIP Returns")
+    xirrs = backtest.rolling_sip(history, 3)
+    if xirrs.empty:
+        st.info("Not enough history for rolling SIP returns")
+        return
+    fig = go.Figure()
+    for code in codes:
+        fig.add_trace(go.Box(y=xirrs[code].dropna(), name=fund_index.name(code), boxpoints=False))
+    fig.update_layout(yaxis_title='XIRR (%)', template='plotly_dark', height=450,
+                      xaxis=dict(showticklabels=False), legend=dict(orientation='h', y=-0.1))
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("XIRR of a monthly SIP held 3 years, for every start date in each fund's history")
 
 # Main App
 
@@ -216,30 +417,38 @@ def main():
 
     # Sidebar
     with st.sidebar:
+        view = st.radio("View", ["Fund Analysis", "Screener", "Compare"],
+                        horizontal=True, key="view")
+
         st.header("🎯 Fund Selection")
 
         with st.spinner("Loading funds..."):
-            funds = get_all_funds()
+            fund_index = get_fund_index()
 
-        if not funds:
+        if not len(fund_index):
             st.error("Failed to load funds")
             st.stop()
 
-        st.success(f"✅ {len(funds):,} funds loaded")
+        st.success(f"✅ {len(fund_index):,} funds loaded")
+        updated = update_nav_store()
+        st.caption(f"{'📴 Offline - ' if OFFLINE else ''}NAVs stored through {updated or 'N/A'}")
 
         search = st.text_input("🔍 Search", placeholder="HDFC, SBI, Axis...")
+        amc = st.selectbox("Fund House", ["All"] + fund_index.amcs)
+        category = st.selectbox("Category", ["All"] + fund_index.categories)
 
-        filtered = [f for f in funds if search.lower(
-        ) in f['schemeName'].lower()] if search else funds[:100]
+        matches, total = fund_index.search(
+            search, amc=None if amc == "All" else amc,
+            category=None if category == "All" else category, limit=MAX_SEARCH_RESULTS)
 
-        if not filtered:
+        if not matches:
             st.warning("No funds found")
             selected_code = None
         else:
-            fund_map = {f['schemeName']: f['schemeCode']
-                        for f in filtered[:50]}
-            selected_name = st.selectbox("Select Fund", list(fund_map.keys()))
-            selected_code = fund_map[selected_name]
+            if total > len(matches):
+                st.caption(f"Best {len(matches)} of {total:,} matches - refine the search to narrow")
+            selected_code = st.selectbox("Select Fund", matches,
+                                         format_func=fund_index.name)
 
         st.divider()
 
@@ -257,16 +466,23 @@ def main():
         st.markdown("- [Value Research](https://www.valueresearchonline.com/)")
 
     # Main Content
+    if view == "Screener":
+        display_screener()
+        st.stop()
+    if view == "Compare":
+        display_comparison(fund_index, period_days)
+        st.stop()
+
     if not selected_code:
         st.info("👈 Select a fund from sidebar to begin analysis")
 
         st.markdown("### 🔥 Popular Categories")
-        cats = ['Large Cap', 'Mid Cap', 'Small Cap',
-                'Flexi Cap', 'ELSS', 'Debt', 'Hybrid', 'Index']
+        cats = list(POPULAR_CATEGORIES)
         cols = st.columns(4)
         for idx, cat in enumerate(cats):
             with cols[idx % 4]:
-                st.button(cat, key=cat, use_container_width=True)
+                st.button(cat, key=cat, on_click=open_screener, args=(cat,),
+                          use_container_width=True)
 
         st.markdown("### 📊 Features")
         col1, col2, col3 = st.columns(3)
@@ -287,45 +503,47 @@ def main():
         with col3:
             st.markdown("""
             **🧮 Planning Tools**
-            - SIP calculator
-            - Wealth projections
-            - Goal planning
+            - SIP, STP and SWP backtests
+            - XIRR on actual NAVs
+            - Rolling SIP returns
             """)
 
         st.stop()
 
     # Fetch Fund Data
     with st.spinner("Fetching fund data..."):
-        fund_data = get_fund_data(selected_code)
+        fund_meta = get_fund_data(selected_code)
 
-    if not fund_data:
+    if not fund_meta:
         st.error("Failed to fetch fund data")
         st.stop()
 
-    df = parse_nav(fund_data)
-    if df is None or df.empty:
+    history = get_nav_store().nav_series(selected_code)
+    if history.empty:
         st.error("No NAV data available")
         st.stop()
 
-    # Filter by period
+    # Filter by period: a slice of the precomputed series
+    df = history
     if period_days:
-        cutoff = df.index[-1] - timedelta(days=period_days)
-        df = df[df.index >= cutoff]
+        cutoff = history.index[-1] - timedelta(days=period_days)
+        df = history[history.index >= cutoff]
 
-    # Calculate metrics
-    returns = calc_returns(df['nav'])
-    risk = calc_risk(df['nav'])
+    # Calculate metrics: returns over fixed periods use the whole history,
+    # risk covers the selected period
+    returns = calc_returns(history['nav'])
+    risk = calc_risk(df)
 
     # Fund Info
     st.markdown("### 📊 Fund Information")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.info(f"**Name:** {fund_data['meta']['scheme_name']}")
+        st.info(f"**Name:** {fund_meta['scheme_name']}")
     with col2:
         st.info(
-            f"**Category:** {fund_data['meta'].get('scheme_category', 'N/A')}")
+            f"**Category:** {fund_meta.get('scheme_category', 'N/A')}")
     with col3:
-        st.info(f"**Type:** {fund_data['meta'].get('scheme_type', 'N/A')}")
+        st.info(f"**Type:** {fund_meta.get('scheme_type', 'N/A')}")
 
     st.divider()
 
@@ -349,17 +567,26 @@ def main():
         ["📈 Charts", "💰 Returns", "⚠️ Risk", "🧮 SIP", "📊 Stats"])
 
     with tab1:
+        # Zooming here re-reads the window at full resolution; the chart's
+        # own zoom only magnifies the downsampled points
+        first, last = df.index[0].date(), df.index[-1].date()
+        zoom = (first, last)
+        if first < last:
+            zoom = st.slider("Zoom", min_value=first, max_value=last, value=(first, last),
+                             format="DD-MMM-YYYY", key=f"zoom_{selected_code}_{period_sel}")
         st.plotly_chart(chart_nav(
-            df, fund_data['meta']['scheme_name'], show_ma), use_container_width=True)
+            df.loc[str(zoom[0]):str(zoom[1])], fund_meta['scheme_name'], show_ma),
+            use_container_width=True)
 
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("**📊 NAV Statistics**")
             stats = pd.DataFrame({
-                'Metric': ['Current', 'High', 'Low', 'Average', 'Median'],
+                'Metric': ['Current', 'High', 'Low', 'Average', 'Median', 'All-Time High'],
                 'Value': [f"₹{curr_nav:.4f}", f"₹{df['nav'].max():.4f}",
                           f"₹{df['nav'].min():.4f}", f"₹{df['nav'].mean():.4f}",
-                          f"₹{df['nav'].median():.4f}"]
+                          f"₹{df['nav'].median():.4f}",
+                          f"₹{df['peak'].iloc[-1]:.4f} ({risk.get('current_dd', 0):+.2f}%)"]
             })
             st.dataframe(stats, hide_index=True, use_container_width=True)
 
@@ -406,6 +633,7 @@ def main():
 
         col1.metric("Best Day", f"{risk.get('best_day', 0):.2f}%")
         col2.metric("Worst Day", f"{risk.get('worst_day', 0):.2f}%")
+        col3.metric("Sortino Ratio", f"{risk.get('sortino', 0):.2f}")
 
         st.markdown("**📉 Risk Interpretation**")
         vol = risk.get('volatility', 0)
@@ -417,62 +645,112 @@ def main():
             st.warning("🔴 High Risk - For aggressive investors")
 
     with tab4:
-        st.markdown("### 💰 SIP Investment Calculator")
+        st.markdown("### 💰 Backtest on Actual NAVs")
+        navs = history['nav']
+        first_day, last_day = navs.index[0].date(), navs.index[-1].date()
 
         col1, col2 = st.columns([1, 2])
 
         with col1:
             st.markdown("**Investment Parameters**")
-            sip_amt = st.number_input(
-                "Monthly SIP (₹)", 500, 1000000, 5000, 500)
-            sip_years = st.slider("Duration (Years)", 1, 30, 10)
-
-            exp_ret = returns.get(
-                'Inception', 12.0) if 'Inception' in returns else 12.0
-            st.info(f"📊 Historical Return: {exp_ret:.2f}% p.a.")
-
-            use_custom = st.checkbox("Use Custom Return")
-            if use_custom:
-                exp_ret = st.slider("Expected Return (%)",
-                                    0.0, 30.0, exp_ret, 0.5)
+            plan = st.radio("Plan", BACKTEST_PLANS, horizontal=True)
+            start = st.date_input(
+                "Start Date", max(first_day, (navs.index[-1] - pd.DateOffset(years=5)).date()),
+                min_value=first_day, max_value=last_day)
+            end = st.date_input("End Date", last_day, min_value=first_day, max_value=last_day)
+            day = st.slider("Day of Month", 1, 28, min(start.day, 28))
+
+            if plan == "SIP":
+                amount = st.number_input("Monthly SIP (₹)", 500, 1000000, 5000, 500)
+            else:
+                amount = st.number_input("Investment (₹)", 1000, 100000000, 500000, 1000)
+            if plan == "SWP":
+                flow = st.number_input("Monthly Withdrawal (₹)", 500, 10000000, 5000, 500)
+            if plan == "STP":
+                flow = st.number_input("Monthly Transfer (₹)", 500, 10000000, 25000, 500)
+                source_search = st.text_input("Transfer From", "liquid",
+                                              help="The fund invested in first")
+                sources, _ = fund_index.search(source_search, limit=MAX_SEARCH_RESULTS)
+                source_code = st.selectbox("Source Fund", sources, format_func=fund_index.name)
 
         with col2:
-            fig_sip, sip_df = chart_sip(sip_amt, exp_ret, sip_years)
-            st.plotly_chart(fig_sip, use_container_width=True)
-
-            final = sip_df.iloc[-1]
-            col_a, col_b, col_c = st.columns(3)
-            col_a.metric("Total Invested", f"₹{final['Invested']:,.0f}")
-            col_b.metric("Expected Value", f"₹{final['Value']:,.0f}")
-            col_c.metric("Wealth Gained", f"₹{final['Gain']:,.0f}")
+            try:
+                if plan == "SIP":
+                    frame, summary = backtest.sip(navs, amount, start, end, day)
+                elif plan == "Lumpsum":
+                    frame, summary = backtest.lumpsum(navs, amount, start, end)
+                elif plan == "SWP":
+                    frame, summary = backtest.swp(navs, amount, flow, start, end, day)
+                elif source_code is None:
+                    raise ValueError("Pick a fund to transfer from")
+                else:
+                    get_fund_data(source_code)
+                    source = get_nav_store().nav_frame(source_code)['nav']
+                    frame, summary = backtest.stp(source, navs, amount, flow, start, end, day)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                st.plotly_chart(chart_sip(frame, f"{plan} - {summary['start']:%d-%b-%Y} to "
+                                                 f"{summary['end']:%d-%b-%Y}"),
+                                use_container_width=True)
+                col_a, col_b, col_c, col_d = st.columns(4)
+                col_a.metric("Total Invested", f"₹{summary['invested']:,.0f}")
+                col_b.metric("Final Value", f"₹{summary['value']:,.0f}")
+                if plan == "SWP":
+                    col_c.metric("Withdrawn", f"₹{summary['withdrawn']:,.0f}")
+                else:
+                    col_c.metric("Wealth Gained", f"₹{summary['gain']:,.0f}")
+                col_d.metric("XIRR", f"{summary['xirr']:.2f}%")
+
+        st.markdown("#### 🎲 Rolling SIP Returns")
+        available = [y for y in ROLLING_SIP_YEARS
+                     if navs.index[0] + pd.DateOffset(years=y) <= navs.index[-1]]
+        if not available:
+            st.info("Not enough history for rolling SIP returns")
+        else:
+            years = st.radio("SIP Length (Years)", available, horizontal=True,
+                             index=min(1, len(available) - 1))
+            xirrs = get_rolling_sip(selected_code, years, update_nav_store())
+            if xirrs.empty:
+                st.info("Not enough history for rolling SIP returns")
+            else:
+                col_a, col_b, col_c, col_d = st.columns(4)
+                col_a.metric("Median XIRR", f"{xirrs.median():.2f}%")
+                col_b.metric("Worst", f"{xirrs.min():.2f}%")
+                col_c.metric("Best", f"{xirrs.max():.2f}%")
+                col_d.metric("Starts With a Loss", f"{(xirrs < 0).mean() * 100:.1f}%")
+                st.plotly_chart(chart_rolling_sip(xirrs, years), use_container_width=True)
+                st.caption(f"Monthly SIPs of {years} years started on each of {len(xirrs):,} "
+                           f"days from {xirrs.index[0]:%d-%b-%Y} to {xirrs.index[-1]:%d-%b-%Y}")
 
     with tab5:
-        dr = df['nav'].pct_change().dropna()
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("**📈 Performance Stats**")
-            perf = pd.DataFrame({
-                'Metric': ['Best Day', 'Worst Day', 'Avg Change', 'Positive Days', 'Win Rate'],
-                'Value': [f"{dr.max()*100:.2f}%", f"{dr.min()*100:.2f}%",
-                          f"{dr.mean()*100:.4f}%", f"{(dr>0).sum()}",
-                          f"{(dr>0).sum()/len(dr)*100:.1f}%"]
-            })
-            st.dataframe(perf, hide_index=True, use_container_width=True)
-
-        with col2:
-            st.markdown("**📊 Distribution**")
-            dist = pd.DataFrame({
-                'Metric': ['Mean', 'Median', 'Std Dev', 'Skewness', 'Kurtosis'],
-                'Value': [f"{dr.mean()*100:.4f}%", f"{dr.median()*100:.4f}%",
-                          f"{dr.std()*100:.4f}%", f"{dr.skew():.2f}", f"{dr.kurtosis():.2f}"]
-            })
-            st.dataframe(dist, hide_index=True, use_container_width=True)
+        if not risk:
+            st.info("Not enough NAVs in this period")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**📈 Performance Stats**")
+                perf = pd.DataFrame({
+                    'Metric': ['Best Day', 'Worst Day', 'Avg Change', 'Positive Days', 'Win Rate'],
+                    'Value': [f"{risk['best_day']:.2f}%", f"{risk['worst_day']:.2f}%",
+                              f"{risk['mean']:.4f}%", f"{risk['up_days']}",
+                              f"{risk['up_days']/risk['days']*100:.1f}%"]
+                })
+                st.dataframe(perf, hide_index=True, use_container_width=True)
+
+            with col2:
+                st.markdown("**📊 Distribution**")
+                dist = pd.DataFrame({
+                    'Metric': ['Mean', 'Median', 'Std Dev', 'Skewness', 'Kurtosis'],
+                    'Value': [f"{risk['mean']:.4f}%", f"{risk['median']:.4f}%",
+                              f"{risk['std']:.4f}%", f"{risk['skew']:.2f}", f"{risk['kurtosis']:.2f}"]
+                })
+                st.dataframe(dist, hide_index=True, use_container_width=True)
 
     # Footer
     st.divider()
     st.caption(
-        "📊 Indian MF Dashboard | Data: MFAPI.in | For educational purposes only")
+        "📊 Indian MF Dashboard | Data: AMFI, MFAPI.in | For educational purposes only")
     st.caption(
         f"⚠️ Past performance is not indicative of future results | Updated: {datetime.now().strftime('%d-%b-%Y %H:%M')}")
 
@@ -0,0 +1,288 @@
+"""
+Investment backtests on real NAV history for the Indian MF Dashboard
+
+SIP, lumpsum, STP and SWP plans are replayed against a fund's actual
+NAVs: every purchase or redemption happens at the NAV of its scheduled
+day, or of the next day with a NAV when that is a holiday, and the plan is
+valued at the last NAV on or before its end date. Returns are XIRR.
+
+rolling_sip replays a SIP started on every NAV date at once, for many
+funds, to show the spread of outcomes an investor could have had.
+"""
+
+import numpy as np
+import pandas as pd
+
+# XIRR is searched for between these annual rates
+XIRR_BRACKET = (-0.9999, 100.0)
+
+# Upper bound on (start dates x instalments x funds) handled per rolling_sip batch
+ROLLING_BATCH = 4_000_000
+
+
+def xirr(amounts, years, tol=1e-10, max_iter=100):
+    """Annualised rate (as a fraction) at which cash flows net to zero.
+
+    amounts, years: arrays of shape (..., flows) - amounts (negative when
+    invested) and their times in years from the first flow; a rate is
+    solved for every leading position at once, iterating only on those
+    not yet converged. Newton steps that leave the bracket known to hold
+    the root are replaced by bisection, so it always converges. NaN where
+    no rate between XIRR_BRACKET nets to zero.
+    """
+    amounts, years = np.broadcast_arrays(np.asarray(amounts, dtype=float),
+                                         np.asarray(years, dtype=float))
+    shape = amounts.shape[:-1]
+    amounts = amounts.reshape(-1, amounts.shape[-1])
+    years = years.reshape(-1, years.shape[-1])
+
+    def npv(rate, rows):
+        discount = np.exp(-years[rows] * np.log1p(rate)[:, None])
+        flows = amounts[rows] * discount
+        return np.nansum(flows, axis=1), np.nansum(-years[rows] * flows, axis=1) / (1 + rate)
+
+    everything = np.arange(len(amounts))
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        low_sign = np.sign(npv(np.full(len(amounts), XIRR_BRACKET[0]), everything)[0])
+        high_sign = np.sign(npv(np.full(len(amounts), XIRR_BRACKET[1]), everything)[0])
+        result = np.full(len(amounts), np.nan)
+
+        # Only positions still converging are iterated on
+        rows = np.flatnonzero(low_sign * high_sign < 0)
+        low = np.full(len(rows), XIRR_BRACKET[0])
+        high = np.full(len(rows), XIRR_BRACKET[1])
+        rate = np.full(len(rows), 0.1)
+        for _ in range(max_iter):
+            if not len(rows):
+                break
+            value, slope = npv(rate, rows)
+            # Keep the root bracketed: rate replaces the end of matching sign
+            on_low_side = np.sign(value) == low_sign[rows]
+            low, high = np.where(on_low_side, rate, low), np.where(on_low_side, high, rate)
+            step = rate - value / slope
+            step = np.where(np.isfinite(step) & (step > low) & (step < high),
+                            step, (low + high) / 2)
+            converged = np.abs(step - rate) <= tol * (1 + np.abs(rate))
+            result[rows[converged]] = step[converged]
+            rows, rate, low, high = (a[~converged] for a in (rows, step, low, high))
+        result[rows] = rate
+    return result.reshape(shape)
+
+
+def monthly_dates(start, end, day):
+    """The `day` of every month (the month's last day if it is shorter)
+    from start through end"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    months = pd.period_range(start, end, freq='M')
+    dates = months.to_timestamp() + pd.to_timedelta(
+        np.minimum(day, months.days_in_month) - 1, unit='D')
+    return dates[(dates >= start) & (dates <= end)]
+
+
+def _window(navs, start, end):
+    """Positions of the first NAV on or after start and the last on or before end"""
+    end = navs.index[-1] if end is None else pd.Timestamp(end)
+    first = navs.index.searchsorted(pd.Timestamp(start))
+    last = navs.index.searchsorted(end, side='right') - 1
+    if first >= len(navs) or first > last:
+        raise ValueError("No NAVs between the start and end dates")
+    return first, last
+
+
+def _trades(navs, dates, last):
+    """Positions of the NAVs each date trades at - the next one on a
+    holiday - dropping dates that would trade after position last"""
+    positions = navs.index.searchsorted(dates)
+    return positions[positions <= last]
+
+
+def _redeem(units, prices, amounts):
+    """Units sold and cash paid by redemptions of `amounts` from a holding
+    of `units`; the redemption that exhausts it pays what is left"""
+    wanted = amounts / prices
+    left = units - np.concatenate([[0], np.cumsum(wanted)[:-1]])
+    sold = np.clip(np.minimum(wanted, left), 0, None)
+    return sold, sold * prices
+
+
+def _holdings(navs, first, last, positions, units):
+    """Value per day, first through last, of units bought (or sold, if
+    negative) at positions"""
+    bought = np.bincount(positions - first, weights=units, minlength=last - first + 1)
+    held = np.cumsum(bought)
+    held[np.abs(held) < 1e-9] = 0  # rounding left after selling everything
+    return held * navs.to_numpy()[first:last + 1]
+
+
+def _daily(navs, first, last, positions, cash):
+    """Running total per day of cash flowing at positions"""
+    flows = np.bincount(positions - first, weights=cash, minlength=last - first + 1)
+    return np.cumsum(flows)
+
+
+def _summary(frame, dates, amounts):
+    """Totals of a backtest's daily frame and the XIRR (%) of its cash
+    flows (amounts negative when invested)"""
+    years = (pd.DatetimeIndex(dates) - dates[0]).days.to_numpy() / 365
+    final = frame.iloc[-1]
+    invested = final['Invested']
+    returned = final['Value'] + final.get('Withdrawn', 0)
+    return {
+        'invested': invested,
+        'value': final['Value'],
+        'withdrawn': final.get('Withdrawn', 0),
+        'gain': returned - invested,
+        'xirr': float(xirr(amounts, years)) * 100,
+        'start': frame.index[0],
+        'end': frame.index[-1],
+    }
+
+
+def sip(navs, amount, start, end=None, day=None):
+    """Monthly SIP of `amount` on `day` (default start's day) from start
+    through end (default the latest NAV).
+
+    navs: one fund's NAVs, indexed by date. Returns a daily frame
+    (Invested, Value) and a summary with XIRR (see _summary).
+    """
+    first, last = _window(navs, start, end)
+    start = pd.Timestamp(start)
+    dates = monthly_dates(start, navs.index[last], day or start.day)
+    positions = _trades(navs, dates, last)
+    units = amount / navs.to_numpy()[positions]
+    frame = pd.DataFrame({
+        'Invested': _daily(navs, first, last, positions, np.full(len(positions), amount)),
+        'Value': _holdings(navs, first, last, positions, units),
+    }, index=navs.index[first:last + 1])
+    summary = _summary(frame, navs.index[np.r_[positions, last]],
+                       np.r_[np.full(len(positions), -amount), frame['Value'].iloc[-1]])
+    summary['instalments'] = len(positions)
+    return frame, summary
+
+
+def lumpsum(navs, amount, start, end=None):
+    """One purchase of `amount` on start, held through end"""
+    first, last = _window(navs, start, end)
+    frame = pd.DataFrame({
+        'Invested': np.full(last - first + 1, float(amount)),
+        'Value': amount / navs.iloc[first] * navs.to_numpy()[first:last + 1],
+    }, index=navs.index[first:last + 1])
+    summary = _summary(frame, navs.index[[first, last]], [-amount, frame['Value'].iloc[-1]])
+    return frame, summary
+
+
+def swp(navs, amount, withdrawal, start, end=None, day=None):
+    """`amount` invested on start, then `withdrawal` redeemed on `day` of
+    every month after it until end or until the units run out.
+
+    The frame adds Withdrawn (cash taken out so far) to Invested and Value.
+    """
+    first, last = _window(navs, start, end)
+    start = navs.index[first]
+    dates = monthly_dates(start + pd.Timedelta(days=1), navs.index[last], day or start.day)
+    positions = _trades(navs, dates, last)
+    positions = positions[positions > first]
+    units = amount / navs.iloc[first]
+    sold, paid = _redeem(units, navs.to_numpy()[positions], np.full(len(positions), withdrawal))
+    frame = pd.DataFrame({
+        'Invested': np.full(last - first + 1, float(amount)),
+        'Value': _holdings(navs, first, last, np.r_[first, positions], np.r_[units, -sold]),
+        'Withdrawn': _daily(navs, first, last, positions, paid),
+    }, index=navs.index[first:last + 1])
+    summary = _summary(frame, navs.index[np.r_[first, positions, last]],
+                       np.r_[-amount, paid, frame['Value'].iloc[-1]])
+    summary['withdrawals'] = int((paid > 0).sum())
+    return frame, summary
+
+
+def stp(source, target, amount, transfer, start, end=None, day=None):
+    """`amount` invested in the source fund on start, then `transfer`
+    moved to the target fund on `day` of every month after it until end
+    or until the source runs out. Each leg trades at its own
+    fund's NAV (rolled forward over that fund's holidays).
+
+    The frame adds Source and Target (each fund's value) to Invested and
+    Value (their sum).
+    """
+    first, last = _window(source, start, end)
+    start, end = source.index[first], source.index[last]
+    t_first, t_last = _window(target, start, end)
+    dates = monthly_dates(start + pd.Timedelta(days=1), end, day or start.day)
+    out = _trades(source, dates, last)
+    # Each transfer buys the target at its first NAV on or after the redemption
+    into = target.index.searchsorted(source.index[out])
+    keep = (out > first) & (into <= t_last)
+    out, into = out[keep], into[keep]
+
+    units = amount / source.iloc[first]
+    sold, moved = _redeem(units, source.to_numpy()[out], np.full(len(out), transfer))
+    index = source.index[first:last + 1]
+    target_value = pd.Series(
+        _holdings(target, t_first, t_last, into, moved / target.to_numpy()[into]),
+        index=target.index[t_first:t_last + 1])
+    frame = pd.DataFrame({
+        'Invested': float(amount),
+        'Source': _holdings(source, first, last, np.r_[first, out], np.r_[units, -sold]),
+        # The target's value as of each of the source's NAV dates
+        'Target': target_value.reindex(index.union(target_value.index)).ffill()
+                              .reindex(index).fillna(0).to_numpy(),
+    }, index=index)
+    frame['Value'] = frame['Source'] + frame['Target']
+    frame = frame[['Invested', 'Value', 'Source', 'Target']]
+    summary = _summary(frame, index[[0, -1]], [-amount, frame['Value'].iloc[-1]])
+    summary['transfers'] = int((moved > 0).sum())
+    return frame, summary
+
+
+def rolling_sip(matrix, years, step=1):
+    """XIRR (%) of a monthly SIP of `years` started on every `step`th NAV
+    date, per fund.
+
+    matrix: NAVs of many funds (see NavStore.nav_matrix). Instalments fall
+    on the start date's day of each month, each bought at the fund's next
+    NAV on a holiday, and the SIP is valued at the last NAV on or before
+    start + years. Returns start dates x funds, NaN where the fund did not
+    exist yet at the start or has no NAVs through the end. All start
+    dates and funds are solved together, in batches.
+    """
+    values = matrix.to_numpy(dtype=float)
+    count, funds = values.shape
+    index = matrix.index
+    starts = np.arange(0, count, step)
+    starts = starts[index[starts] + pd.DateOffset(years=years) <= index[-1]]
+    months = int(round(years * 12))
+    if not len(starts) or not months:
+        return pd.DataFrame(columns=matrix.columns, dtype=float)
+
+    # Per fund, the row of the next NAV on or after each row (count if
+    # none) and of the last NAV on or before it (-1 if none)
+    has_nav = ~np.isnan(values)
+    rows = np.arange(count)[:, None]
+    next_nav = np.minimum.accumulate(np.where(has_nav, rows, count)[::-1], axis=0)[::-1]
+    next_nav = np.vstack([next_nav, np.full((1, funds), count)])
+    prev_nav = np.maximum.accumulate(np.where(has_nav, rows, -1), axis=0)
+    first_nav = np.where(has_nav.any(axis=0), has_nav.argmax(axis=0), count)
+    padded = np.vstack([values, np.full((1, funds), np.nan)])
+    day_numbers = np.r_[(index - index[0]).days.to_numpy(), 0]
+
+    start_dates = index[starts]
+    scheduled = np.column_stack([
+        index.searchsorted(start_dates + pd.DateOffset(months=m)) for m in range(months)])
+    ends = index.searchsorted(start_dates + pd.DateOffset(years=years), side='right') - 1
+
+    out = np.full((len(starts), funds), np.nan)
+    batch = max(1, ROLLING_BATCH // (len(starts) * months))
+    for lo in range(0, funds, batch):
+        cols = np.arange(lo, min(lo + batch, funds))
+        trade = next_nav[:, cols][scheduled]                         # starts x months x funds
+        valued = prev_nav[:, cols][ends]                             # starts x funds
+        value = (1 / padded[trade, cols]).sum(axis=1) * padded[valued, cols]
+        # The fund must exist at the start and trade every instalment by the end
+        valid = (first_nav[cols] <= starts[:, None]) & (trade[:, -1, :] <= valued) \
+            & ~np.isnan(value)
+        days = np.concatenate([day_numbers[trade], day_numbers[valued][:, None, :]], axis=1)
+        amounts = np.concatenate([np.full(trade.shape, -1.0), value[:, None, :]], axis=1)
+        rates = xirr(np.moveaxis(amounts, 1, -1),
+                     np.moveaxis(days - days[:, :1, :], 1, -1) / 365)
+        out[:, cols] = np.where(valid, rates * 100, np.nan)
+    return pd.DataFrame(out, index=start_dates, columns=matrix.columns)
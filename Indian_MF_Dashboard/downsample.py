@@ -0,0 +1,69 @@
+"""
+Chart downsampling for the Indian MF Dashboard
+
+A fund's full history is thousands of daily NAVs per trace, far more than
+a chart has pixels across. Traces are cut down on the server to about
+CHART_POINTS points with Largest-Triangle-Three-Buckets (LTTB), which keeps
+the points that shape the line - peaks, troughs and turns - so the chart
+looks the same while the payload sent to the browser shrinks.
+
+Series no longer than the budget are returned untouched, so a chart
+zoomed into a short window shows every NAV.
+"""
+
+import numpy as np
+
+# Points kept per trace: about the pixel width of a full-width chart
+CHART_POINTS = 1000
+
+
+def lttb_indices(x, y, points=CHART_POINTS):
+    """Positions of the `points` samples of (x, y) that LTTB keeps, in order.
+
+    The first and last samples are always kept; the rest are split into
+    points - 2 buckets and from each the sample forming the largest
+    triangle with the previous bucket's mean and the next bucket's mean is
+    kept. Anchoring on the previous bucket's mean rather than its chosen
+    sample lets every bucket be decided at once.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    starts, sizes = edges[:-1], np.diff(edges)
+    mean_x = np.add.reduceat(x[1:-1], starts - 1) / sizes
+    mean_y = np.add.reduceat(y[1:-1], starts - 1) / sizes
+
+    # Anchors per bucket: the mean before it (first point for the first
+    # bucket) and the mean after it (last point for the last bucket)
+    before_x, before_y = np.r_[x[0], mean_x[:-1]], np.r_[y[0], mean_y[:-1]]
+    after_x, after_y = np.r_[mean_x[1:], x[-1]], np.r_[mean_y[1:], y[-1]]
+
+    bucket = np.repeat(np.arange(len(sizes)), sizes)
+    px, py = x[1:-1], y[1:-1]
+    area = np.abs((before_x[bucket] - after_x[bucket]) * (py - before_y[bucket])
+                  - (before_x[bucket] - px) * (after_y[bucket] - before_y[bucket]))
+    # Largest area first within each bucket; NaN areas sort last
+    order = np.lexsort((-np.nan_to_num(area, nan=-1), bucket))
+    chosen = order[starts - 1] + 1
+    return np.r_[0, chosen, n - 1]
+
+
+def downsample(frame, column, points=CHART_POINTS):
+    """Rows of frame (indexed by date) kept by LTTB on `column`; other
+    columns (e.g. moving averages) are sampled on the same dates"""
+    values = frame[column].to_numpy(dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) <= points:
+        return frame
+    x = frame.index[valid].asi8
+    keep = valid[lttb_indices(x, values[valid], points)]
+    return frame.iloc[keep]
+
+
+def plot_dates(index):
+    """Dates as plain YYYY-MM-DD strings, the shortest form Plotly reads"""
+    return index.strftime('%Y-%m-%d')
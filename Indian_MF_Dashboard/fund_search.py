@@ -0,0 +1,145 @@
+"""
+Fund search index for the Indian MF Dashboard
+
+Built once per fund-list refresh. Every word of every scheme name is
+indexed, as are its prefixes, so a query is a few set intersections
+instead of a scan over ~40k names. Results can be narrowed by fund house
+and category and come back ranked.
+"""
+
+import bisect
+import re
+from heapq import nsmallest
+from itertools import islice
+
+# Prefixes up to this length get their own posting sets; longer ones are
+# answered from the sorted vocabulary
+INDEXED_PREFIX = 3
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+def _plan_rank(name):
+    # Direct before Regular plans, Growth before IDCW/dividend options
+    name = name.lower()
+    return ('direct' not in name) + ('growth' not in name)
+
+
+class FundIndex:
+    """Inverted index over scheme names with fund house/category facets.
+
+    search() ranks matches in tiers - the name starting with the query,
+    then every query word matching a whole word - and within a tier by
+    plan type, then name. Tiers and ranking are set operations and scans
+    of precomputed orders, so even a query matching every fund is quick.
+    """
+
+    def __init__(self, funds):
+        self.codes = [f['schemeCode'] for f in funds]
+        self.names = [f['schemeName'] for f in funds]
+        self._position = {code: i for i, code in enumerate(self.codes)}
+        self._lower = [name.lower() for name in self.names]
+        self._tokens = [frozenset(tokenize(name)) for name in self.names]
+
+        postings, short = {}, {}
+        for i, tokens in enumerate(self._tokens):
+            for token in tokens:
+                postings.setdefault(token, set()).add(i)
+                for n in range(1, min(len(token), INDEXED_PREFIX) + 1):
+                    short.setdefault(token[:n], set()).add(i)
+        self._postings = postings
+        self._short = short
+        self._vocabulary = sorted(postings)
+
+        self._facets = {'amc': {}, 'category': {}}
+        for i, fund in enumerate(funds):
+            for facet, values in self._facets.items():
+                if fund.get(facet):
+                    values.setdefault(fund[facet], set()).add(i)
+
+        # Static order: plan type, then name; query-specific ranks come first
+        order = sorted(range(len(funds)), key=lambda i: (_plan_rank(self.names[i]), self._lower[i]))
+        self._static_rank = [0] * len(funds)
+        for rank, i in enumerate(order):
+            self._static_rank[i] = rank
+        self._ordered = order
+
+        # Names in alphabetical order, to find those starting with a phrase
+        self._alphabetical = sorted(range(len(funds)), key=self._lower.__getitem__)
+        self._sorted_lower = [self._lower[i] for i in self._alphabetical]
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def amcs(self):
+        return sorted(self._facets['amc'])
+
+    @property
+    def categories(self):
+        return sorted(self._facets['category'])
+
+    def name(self, code):
+        return self.names[self._position[code]]
+
+    def _prefix_matches(self, prefix):
+        if len(prefix) <= INDEXED_PREFIX:
+            return self._short.get(prefix, set())
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = set()
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+        return matches
+
+    def _starting_with(self, phrase):
+        start = bisect.bisect_left(self._sorted_lower, phrase)
+        end = bisect.bisect_left(self._sorted_lower, phrase + "\uffff")
+        return set(self._alphabetical[start:end])
+
+    def _top(self, ids, limit, exclude=()):
+        """The first `limit` of ids (less any in exclude) in plan type/name order"""
+        # Scanning the precomputed order finds `limit` of them after about
+        # limit * len(self) / len(ids) steps; sorting costs about len(ids)
+        if len(ids) ** 2 < limit * len(self._ordered):
+            return nsmallest(limit, ids.difference(*exclude), key=self._static_rank.__getitem__)
+        return list(islice((i for i in self._ordered
+                            if i in ids and not any(i in s for s in exclude)), limit))
+
+    def search(self, query="", amc=None, category=None, limit=50):
+        """Codes of the best `limit` matches, and how many funds match in all.
+
+        Every query word must match the start of a word in the name.
+        """
+        words = tokenize(query)
+        facets = []
+        if amc:
+            facets.append(self._facets['amc'].get(amc, set()))
+        if category:
+            facets.append(self._facets['category'].get(category, set()))
+
+        sets = sorted([self._prefix_matches(word) for word in words] + facets, key=len)
+        if not sets:
+            return [self.codes[i] for i in self._ordered[:limit]], len(self.codes)
+
+        matches = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+        if not words:
+            return [self.codes[i] for i in self._top(matches, limit)], len(matches)
+
+        # Whole-word matches are a subset of the prefix matches
+        exact = sorted((self._postings.get(word, set()) for word in words), key=len)
+        whole = exact[0].intersection(*exact[1:], *facets) \
+            if len(exact) + len(facets) > 1 else exact[0]
+        leading = matches & self._starting_with(query.strip().lower())
+        best = []
+        for tier, exclude in ((leading & whole, ()), (leading, (whole,)),
+                              (whole, (leading,)), (matches, (leading, whole))):
+            if len(best) >= limit:
+                break
+            best.extend(self._top(tier, limit - len(best), exclude))
+        return [self.codes[i] for i in best], len(matches)
@@ -0,0 +1,528 @@
+"""
+Local NAV store for the Indian MF Dashboard
+
+Scheme details and every scheme's NAV history live in one SQLite file,
+clustered by (scheme code, date), so reading any fund over any date range
+is a local index range scan instead of an HTTP call.
+
+The store is filled from AMFI's bulk files - NAVAll.txt (the latest NAV of
+every scheme) and the NAV history report (every scheme over a date range) -
+and, the first time a fund is opened, from MFAPI.in for its full history.
+Updates only append dates that are not stored yet.
+
+Opened funds also get a stored rolling series (moving averages, running
+peak and running sums of returns), extended by each update with the new
+NAVs only.
+
+    python nav_store.py update            # append NAVs published since the last update
+    python nav_store.py load FILE [...]   # AMFI text files and/or MFAPI JSON dumps
+    python nav_store.py metrics           # recompute the screener's metrics (nightly)
+    python nav_store.py demo              # synthetic stand-in data for offline use
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+
+import analytics
+
+# SQLite file holding scheme details and NAV history
+NAV_DB = os.environ.get("MF_NAV_DB", "nav_store.sqlite3")
+
+# With MF_OFFLINE=1 the dashboard never calls out and serves only stored data
+OFFLINE = os.environ.get("MF_OFFLINE", "0") == "1"
+
+AMFI_NAVALL_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+AMFI_HISTORY_URL = "https://portal.amfiindia.com/DownloadNAVHistoryReport_Po.aspx"
+MFAPI_URL = "https://api.mfapi.in/mf"
+
+# Days asked for per NAV history report (AMFI limits the range)
+HISTORY_CHUNK_DAYS = 90
+
+REQUEST_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schemes (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    amc TEXT,
+    category TEXT,
+    scheme_type TEXT,
+    isin_growth TEXT,
+    isin_reinvest TEXT
+);
+CREATE TABLE IF NOT EXISTS navs (
+    code INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    nav REAL NOT NULL,
+    PRIMARY KEY (code, date)
+) WITHOUT ROWID;
+-- Every NAV of a scheme up to complete_through is stored
+CREATE TABLE IF NOT EXISTS histories (
+    code INTEGER PRIMARY KEY,
+    complete_through TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- Rolling series (analytics.extend_series) of the funds that have been
+-- opened, one row per NAV; series_state records what each covers
+CREATE TABLE IF NOT EXISTS nav_series (
+    code INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    ret REAL,
+    ma50 REAL,
+    ma200 REAL,
+    peak REAL NOT NULL,
+    n REAL NOT NULL,
+    s1 REAL NOT NULL,
+    s2 REAL NOT NULL,
+    s3 REAL NOT NULL,
+    s4 REAL NOT NULL,
+    down2 REAL NOT NULL,
+    wins REAL NOT NULL,
+    PRIMARY KEY (code, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series_state (
+    code INTEGER PRIMARY KEY,
+    through TEXT NOT NULL,
+    risk_free REAL NOT NULL
+);
+-- A NAV stored before a series' last date invalidates the series
+CREATE TRIGGER IF NOT EXISTS navs_backfill AFTER INSERT ON navs
+WHEN NEW.date <= (SELECT through FROM series_state WHERE code = NEW.code)
+BEGIN
+    DELETE FROM series_state WHERE code = NEW.code;
+END;
+"""
+
+_UPSERT_SCHEME = """
+INSERT INTO schemes (code, name, amc, category, scheme_type, isin_growth, isin_reinvest)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (code) DO UPDATE SET
+    name = excluded.name,
+    amc = COALESCE(excluded.amc, amc),
+    category = COALESCE(excluded.category, category),
+    scheme_type = COALESCE(excluded.scheme_type, scheme_type),
+    isin_growth = COALESCE(excluded.isin_growth, isin_growth),
+    isin_reinvest = COALESCE(excluded.isin_reinvest, isin_reinvest)
+"""
+
+
+def _isin(value):
+    return value if value and value != '-' else None
+
+
+def parse_amfi(lines):
+    """NAV rows from NAVAll.txt or a NAV history report.
+
+    Both are ';'-separated with a header row, interleaved with
+    "Open Ended Schemes(Equity Scheme - Large Cap Fund)" category lines
+    and fund house lines. Yields
+    (code, name, amc, category, scheme_type, isin_growth, isin_reinvest, date, nav)
+    with the date as YYYY-MM-DD; rows without a numeric NAV are skipped.
+    """
+    columns = None
+    amc = category = scheme_type = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if ';' not in line:
+            if line.endswith(')') and '(' in line:
+                scheme_type, _, category = line[:-1].partition('(')
+                scheme_type, category = scheme_type.strip(), category.strip()
+            else:
+                amc = line
+            continue
+
+        fields = [f.strip() for f in line.split(';')]
+        if columns is None:
+            def col(prefix):
+                return next(i for i, name in enumerate(fields) if name.startswith(prefix))
+            columns = (col('Scheme Code'), col('Scheme Name'), col('ISIN Div Payout'),
+                       col('ISIN Div Reinvestment'), col('Net Asset Value'), col('Date'))
+            continue
+        code, name, growth, reinvest, nav, day = (fields[i] for i in columns)
+        if not code.isdigit():
+            continue
+        try:
+            nav = float(nav)
+            day = datetime.strptime(day, '%d-%b-%Y').strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+        yield (int(code), name, amc, category, scheme_type,
+               _isin(growth), _isin(reinvest), day, nav)
+
+
+class NavStore:
+    """Scheme list and NAV history of every fund, in SQLite.
+
+    Safe to share between Streamlit sessions: each thread gets its own
+    connection, and readers never wait for the (WAL) writer.
+    """
+
+    def __init__(self, db_path=NAV_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, key):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def updated_through(self):
+        """Last day covered by a bulk update (YYYY-MM-DD), or None"""
+        return self._meta('updated_through')
+
+    # Loading
+
+    def add_rows(self, rows):
+        """Store parse_amfi() rows; returns how many NAVs were new"""
+        schemes, navs = {}, []
+        for code, name, amc, category, scheme_type, growth, reinvest, day, nav in rows:
+            schemes[code] = (code, name, amc, category, scheme_type, growth, reinvest)
+            navs.append((code, day, nav))
+        with self._conn() as conn:
+            conn.executemany(_UPSERT_SCHEME, schemes.values())
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO navs VALUES (?, ?, ?)", navs)
+            return conn.total_changes - before
+
+    def add_history(self, payload, complete_through=None):
+        """Store one fund's MFAPI.in payload ({"meta": ..., "data": [...]}).
+
+        complete_through: date up to which the payload holds every NAV
+        (defaults to its latest NAV date).
+        """
+        meta = payload['meta']
+        code = int(meta['scheme_code'])
+        navs = []
+        for row in payload['data']:
+            try:
+                navs.append((code, datetime.strptime(row['date'], '%d-%m-%Y').strftime('%Y-%m-%d'),
+                             float(row['nav'])))
+            except (ValueError, TypeError):
+                continue
+        if complete_through is None:
+            complete_through = max((day for _, day, _ in navs), default=None)
+
+        with self._conn() as conn:
+            conn.execute(_UPSERT_SCHEME, (
+                code, meta['scheme_name'], meta.get('fund_house'), meta.get('scheme_category'),
+                meta.get('scheme_type'), _isin(meta.get('isin_growth')),
+                _isin(meta.get('isin_div_reinvestment'))))
+            conn.executemany("INSERT OR IGNORE INTO navs VALUES (?, ?, ?)", navs)
+            if complete_through:
+                conn.execute(
+                    "INSERT INTO histories VALUES (?, ?) ON CONFLICT (code) DO UPDATE"
+                    " SET complete_through = MAX(complete_through, excluded.complete_through)",
+                    (code, complete_through))
+
+    def load_file(self, path):
+        """Load an AMFI text file or an MFAPI.in JSON dump"""
+        with open(path, encoding='utf-8', errors='replace') as f:
+            if path.endswith('.json'):
+                self.add_history(json.load(f))
+                return
+            self.add_rows(parse_amfi(f))
+
+    def _mark_updated(self, previous, through):
+        with self._conn() as conn:
+            # Histories that were complete when this update's range started
+            # are now complete through its end
+            if previous is not None:
+                conn.execute("UPDATE histories SET complete_through = ?"
+                             " WHERE complete_through >= ? AND complete_through < ?",
+                             (through, previous, through))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('updated_through', ?)", (through,))
+
+    def update(self, today=None):
+        """Append NAVs published since the last update, for every scheme.
+
+        The first update loads NAVAll.txt (the latest NAV of every scheme);
+        later ones download AMFI's NAV history report from the last update
+        through today. Ranges start on the last updated day itself, so
+        NAVs published after an update ran that day are still picked up.
+        Rolling series already stored are extended with the new NAVs.
+        Returns the day the store is now updated through.
+        """
+        today = today or date.today()
+        previous = self.updated_through()
+        if previous is None:
+            response = requests.get(AMFI_NAVALL_URL, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            rows = list(parse_amfi(response.text.splitlines()))
+            self.add_rows(rows)
+            through = max((row[7] for row in rows), default=None)
+            if through is not None:
+                self._mark_updated(None, through)
+            self.refresh_all_series()
+            return through
+
+        start = date.fromisoformat(previous)
+        while start <= today:
+            end = min(start + timedelta(days=HISTORY_CHUNK_DAYS - 1), today)
+            response = requests.get(AMFI_HISTORY_URL, timeout=REQUEST_TIMEOUT, params={
+                'frmdt': start.strftime('%d-%b-%Y'), 'todt': end.strftime('%d-%b-%Y')})
+            response.raise_for_status()
+            self.add_rows(parse_amfi(response.text.splitlines()))
+            start = end + timedelta(days=1)
+        self._mark_updated(previous, today.isoformat())
+        self.refresh_all_series()
+        return today.isoformat()
+
+    def needs_history(self, code):
+        """Whether the store may be missing NAVs of code (never synced,
+        or bulk updates have not kept it complete)"""
+        row = self._conn().execute(
+            "SELECT complete_through FROM histories WHERE code = ?", (int(code),)).fetchone()
+        if row is None:
+            return True
+        return row['complete_through'] < (self.updated_through() or date.today().isoformat())
+
+    def fetch_history(self, code):
+        """Fetch code's full history from MFAPI.in into the store"""
+        response = requests.get(f"{MFAPI_URL}/{code}", timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get('meta') and payload.get('data'):
+            self.add_history(payload, complete_through=date.today().isoformat())
+
+    # Reading
+
+    def funds(self):
+        """Every scheme, as [{'schemeCode', 'schemeName', 'amc', 'category'}]"""
+        rows = self._conn().execute(
+            "SELECT code, name, amc, category FROM schemes ORDER BY code").fetchall()
+        return [{'schemeCode': r['code'], 'schemeName': r['name'],
+                 'amc': r['amc'], 'category': r['category']} for r in rows]
+
+    def fund_meta(self, code):
+        """Scheme details in MFAPI.in's meta shape, or None"""
+        row = self._conn().execute("SELECT * FROM schemes WHERE code = ?", (int(code),)).fetchone()
+        if row is None:
+            return None
+        return {
+            'scheme_code': row['code'],
+            'scheme_name': row['name'],
+            'fund_house': row['amc'],
+            'scheme_category': row['category'],
+            'scheme_type': row['scheme_type'],
+            'isin_growth': row['isin_growth'],
+            'isin_div_reinvestment': row['isin_reinvest'],
+        }
+
+    def nav_frame(self, code, days=None, start=None, end=None):
+        """NAVs of code indexed by date (column 'nav').
+
+        days keeps only the last `days` calendar days before the latest
+        NAV; start/end (YYYY-MM-DD) bound the range explicitly.
+        """
+        query, params = "SELECT date, nav FROM navs WHERE code = ?", [int(code)]
+        if days is not None:
+            query += (" AND date >= (SELECT date(MAX(date), ?) FROM navs WHERE code = ?)")
+            params += [f"-{int(days)} days", int(code)]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(end)
+        df = pd.read_sql_query(query + " ORDER BY date", self._conn(), params=params)
+        df['date'] = pd.to_datetime(df['date'])
+        return df.set_index('date')
+
+    def nav_matrix(self, codes=None, start=None, end=None):
+        """NAVs of many funds aligned by date: one column per scheme code,
+        NaN where a fund has no NAV that day. codes=None reads every fund."""
+        conn = self._conn()
+        query, params = "SELECT code, date, nav FROM navs", []
+        if codes is not None:
+            # A temp table (per connection) instead of an IN list of any length
+            with conn:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected_codes (code INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM selected_codes")
+                conn.executemany("INSERT OR IGNORE INTO selected_codes VALUES (?)",
+                                 [(int(code),) for code in codes])
+            query += " JOIN selected_codes USING (code)"
+        conditions = []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        df = pd.read_sql_query(query, conn, params=params)
+        df['date'] = pd.to_datetime(df['date'])
+        return df.pivot(index='date', columns='code', values='nav').sort_index()
+
+    # Rolling series
+
+    def refresh_series(self, code):
+        """Bring code's rolling series up to date with its NAVs.
+
+        Only NAVs after the series' last date are computed and written. A
+        series is rebuilt from scratch when it has none yet, when an older
+        NAV has been stored since (e.g. by a full history fetch) or when
+        RISK_FREE_RATE has changed.
+        """
+        code = int(code)
+        conn = self._conn()
+        state = conn.execute("SELECT through, risk_free FROM series_state WHERE code = ?",
+                             (code,)).fetchone()
+        if state is None or state['risk_free'] != analytics.RISK_FREE_RATE:
+            state = None
+            navs = self.nav_frame(code)['nav']
+            tail, last = (), None
+        else:
+            navs = self.nav_frame(code, start=state['through'])['nav'].iloc[1:]
+            tail = [row['nav'] for row in conn.execute(
+                "SELECT nav FROM navs WHERE code = ? AND date <= ? ORDER BY date DESC LIMIT ?",
+                (code, state['through'], max(analytics.MA_WINDOWS) - 1))][::-1]
+            last = conn.execute("SELECT * FROM nav_series WHERE code = ? AND date = ?",
+                                (code, state['through'])).fetchone()
+        if navs.empty:
+            return
+
+        series = analytics.extend_series(navs, tail, last)
+        columns = ', '.join(analytics.SERIES_COLUMNS)
+        rows = zip([code] * len(series), series.index.strftime('%Y-%m-%d'),
+                   *(series[c].tolist() for c in analytics.SERIES_COLUMNS))
+        with conn:
+            if state is None:
+                conn.execute("DELETE FROM nav_series WHERE code = ?", (code,))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO nav_series (code, date, {columns})"
+                f" VALUES ({', '.join('?' * (len(analytics.SERIES_COLUMNS) + 2))})", rows)
+            conn.execute("INSERT OR REPLACE INTO series_state VALUES (?, ?, ?)",
+                         (code, series.index[-1].strftime('%Y-%m-%d'), analytics.RISK_FREE_RATE))
+
+    def refresh_all_series(self):
+        """refresh_series for every fund that has a rolling series"""
+        for (code,) in self._conn().execute("SELECT code FROM series_state").fetchall():
+            self.refresh_series(code)
+
+    def nav_series(self, code):
+        """NAVs of code with its rolling series (see analytics.extend_series),
+        indexed by date; the series is brought up to date first"""
+        self.refresh_series(code)
+        columns = ', '.join(f's.{c}' for c in analytics.SERIES_COLUMNS)
+        df = pd.read_sql_query(
+            f"SELECT n.date, n.nav, {columns} FROM navs n"
+            " JOIN nav_series s ON s.code = n.code AND s.date = n.date"
+            " WHERE n.code = ? ORDER BY n.date", self._conn(), params=[int(code)])
+        df['date'] = pd.to_datetime(df['date'])
+        return df.set_index('date')
+
+    # Precomputed metrics
+
+    def save_metrics(self, metrics):
+        """Replace the screener's metrics table (one row per scheme code).
+
+        Rebuilt in one transaction, so readers keep seeing the old table
+        until the new one is complete.
+        """
+        frame = metrics.rename_axis('code').reset_index()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DROP TABLE IF EXISTS fund_metrics")
+            conn.execute(pd.io.sql.get_schema(frame, 'fund_metrics', keys='code', con=conn))
+            conn.executemany(
+                f"INSERT INTO fund_metrics VALUES ({', '.join('?' * len(frame.columns))})",
+                frame.itertuples(index=False, name=None))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('metrics_computed_at', ?)",
+                         (datetime.now().isoformat(timespec='seconds'),))
+
+    def metrics_computed_at(self):
+        return self._meta('metrics_computed_at')
+
+    def load_metrics(self):
+        """Precomputed metrics with scheme name, fund house and category,
+        indexed by scheme code (empty before the first save_metrics)"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'fund_metrics'").fetchone() is None:
+            return pd.DataFrame()
+        return pd.read_sql_query(
+            "SELECT s.name, s.amc, s.category, m.* FROM fund_metrics m"
+            " JOIN schemes s ON s.code = m.code", conn).set_index('code')
+
+
+DEMO_CATEGORIES = [
+    ('Open Ended Schemes', 'Equity Scheme - Large Cap Fund', 0.12, 0.17),
+    ('Open Ended Schemes', 'Equity Scheme - Mid Cap Fund', 0.15, 0.21),
+    ('Open Ended Schemes', 'Equity Scheme - Small Cap Fund', 0.17, 0.25),
+    ('Open Ended Schemes', 'Equity Scheme - Flexi Cap Fund', 0.13, 0.18),
+    ('Open Ended Schemes', 'Equity Scheme - ELSS', 0.13, 0.19),
+    ('Open Ended Schemes', 'Debt Scheme - Corporate Bond Fund', 0.07, 0.02),
+    ('Open Ended Schemes', 'Hybrid Scheme - Aggressive Hybrid Fund', 0.11, 0.13),
+    ('Open Ended Schemes', 'Other Scheme - Index Funds', 0.12, 0.17),
+]
+DEMO_AMCS = ['Alpha', 'Bharat', 'Coastal', 'Deccan', 'Everest', 'Ganga']
+
+
+def seed_demo(store, schemes=160, years=12, seed=7):
+    """Fill store with synthetic schemes and daily NAVs, as a stand-in for
+    offline development and demos (not real data)"""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=years * 252)
+    rows = []
+    for i in range(schemes):
+        scheme_type, category, drift, vol = DEMO_CATEGORIES[i % len(DEMO_CATEGORIES)]
+        amc = DEMO_AMCS[i % len(DEMO_AMCS)]
+        plan = 'Direct Plan - Growth' if i % 2 else 'Regular Plan - Growth'
+        name = f"{amc} {category.split(' - ')[1]} {i // 2 + 1} - {plan}"
+        # Funds launch at different times, so histories have different lengths
+        first = int(rng.integers(0, len(days) // 2)) if i % 3 else 0
+        steps = rng.normal(drift / 252, vol / np.sqrt(252), len(days) - first)
+        navs = 10 * np.exp(np.cumsum(steps))
+        rows.extend((100000 + i, name, f"{amc} Mutual Fund", category, scheme_type, None, None,
+                     day.strftime('%Y-%m-%d'), round(float(nav), 4))
+                    for day, nav in zip(days[first:], navs))
+    store.add_rows(rows)
+    through = days[-1].strftime('%Y-%m-%d')
+    with store._conn() as conn:
+        conn.executemany("INSERT OR REPLACE INTO histories VALUES (?, ?)",
+                         [(100000 + i, through) for i in range(schemes)])
+    store._mark_updated(None, through)
+
+
+if __name__ == "__main__":
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ('update', [])
+    nav_store = NavStore()
+    if command == 'update':
+        print(f"Updated through {nav_store.update()}")
+    elif command == 'load':
+        for path in args:
+            nav_store.load_file(path)
+            print(f"Loaded {path}")
+    elif command == 'metrics':
+        print(f"Metrics computed for {analytics.refresh_metrics(nav_store):,} funds")
+    elif command == 'demo':
+        seed_demo(nav_store)
+        analytics.refresh_metrics(nav_store)
+        print(f"Stand-in data written to {nav_store.db_path}")
+    else:
+        sys.exit(__doc__)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The dashboard's modules sit next to each other at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+
+
+@pytest.fixture
+def matrix():
+    """Three funds' NAVs: one launched late and one with gaps"""
+    rng = np.random.default_rng(11)
+    days = pd.bdate_range('2016-01-01', '2022-12-30')
+    values = 10 * np.exp(np.cumsum(rng.normal(0.0004, 0.01, (len(days), 3)), axis=0))
+    matrix = pd.DataFrame(values, index=days, columns=[101, 102, 103])
+    matrix.iloc[:700, 1] = np.nan
+    matrix.iloc[rng.choice(len(days), 200, replace=False), 2] = np.nan
+    return matrix
+
+
+def as_of(navs, date):
+    return navs[:date].dropna().iloc[-1]
+
+
+def test_returns_are_calendar_periods(matrix):
+    table = analytics.returns_table(matrix)
+    for code in matrix:
+        navs = matrix[code].dropna()
+        end = navs.index[-1]
+        for name in ('1M', '1Y', '3Y'):
+            start = end - analytics.PERIODS[name]
+            expected = (navs.iloc[-1] / as_of(navs, start) - 1) * 100
+            assert table.at[code, name] == pytest.approx(expected)
+    # Fund 102 launched under five years before the end
+    assert np.isnan(table.at[102, '5Y'])
+    assert not np.isnan(table.at[101, '5Y_CAGR'])
+
+
+def test_risk_matches_pandas(matrix):
+    table = analytics.risk_table(matrix)
+    for code in matrix:
+        returns = matrix[code].dropna().pct_change().dropna()
+        volatility = returns.std() * np.sqrt(analytics.TRADING_DAYS)
+        assert table.at[code, 'volatility'] == pytest.approx(volatility * 100)
+        assert table.at[code, 'sharpe'] == pytest.approx(
+            (returns.mean() * analytics.TRADING_DAYS - analytics.RISK_FREE_RATE) / volatility)
+        navs = matrix[code].dropna()
+        assert table.at[code, 'max_dd'] == pytest.approx((navs / navs.cummax() - 1).min() * 100)
+        assert table.at[code, 'worst_day'] == pytest.approx(returns.min() * 100)
+
+
+def test_rolling_returns(matrix):
+    rolling = analytics.rolling_returns(matrix, years=3)
+    navs = matrix[101]
+    date = navs.index[-1]
+    expected = ((navs.iloc[-1] / as_of(navs, date - pd.DateOffset(years=3))) ** (1 / 3) - 1) * 100
+    assert rolling.at[date, 101] == pytest.approx(expected)
+    assert rolling[102].first_valid_index() == matrix[102].first_valid_index() + pd.DateOffset(years=3)
+
+
+def test_empty_columns_have_no_metrics(matrix):
+    matrix[104] = np.nan
+    table = analytics.metrics_table(matrix)
+    assert table.loc[104].isna().all()
+    assert list(analytics.latest_table(matrix).index) == [101, 102, 103]
+
+
+def test_extend_series_continues_where_it_stopped(matrix):
+    navs = matrix[101]
+    whole = analytics.extend_series(navs)
+    first = analytics.extend_series(navs.iloc[:1000])
+    rest = analytics.extend_series(navs.iloc[1000:], tail=navs.iloc[:1000].to_numpy(),
+                                   last=first.iloc[-1])
+    pd.testing.assert_frame_equal(pd.concat([first, rest]), whole)
+    assert whole['ma200'].iloc[-1] == pytest.approx(navs.iloc[-200:].mean())
+
+
+def test_series_stats_match_pandas(matrix):
+    navs = matrix[101]
+    series = analytics.extend_series(navs)
+    series.insert(0, 'nav', navs)
+    window = series.loc['2019-01-01':'2020-12-31']
+    stats = analytics.series_stats(window)
+    returns = window['nav'].pct_change().dropna()
+    assert stats['days'] == len(returns)
+    assert stats['mean'] == pytest.approx(returns.mean() * 100)
+    assert stats['std'] == pytest.approx(returns.std() * 100)
+    assert stats['skew'] == pytest.approx(returns.skew())
+    assert stats['kurtosis'] == pytest.approx(returns.kurt())
+    assert stats['up_days'] == (returns > 0).sum()
+    navs = window['nav']
+    assert stats['max_dd'] == pytest.approx((navs / navs.cummax() - 1).min() * 100)
+    assert analytics.series_stats(window.iloc[:2]) == {}
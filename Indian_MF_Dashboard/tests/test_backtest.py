@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+
+
+def navs_growing(rate, start='2020-01-01', end='2024-12-31'):
+    """Daily NAVs (weekdays only) compounding at `rate` a year"""
+    days = pd.bdate_range(start, end)
+    years = (days - days[0]).days.to_numpy() / 365
+    return pd.Series(10 * (1 + rate) ** years, index=days)
+
+
+def test_xirr_known_rates():
+    assert backtest.xirr([-100, 110], [0, 1]) == pytest.approx(0.10)
+    assert backtest.xirr([-100, -100, 231], [0, 1, 2]) == pytest.approx(0.10, abs=1e-3)
+    # Solved per row; NaN where no rate nets the flows to zero
+    rates = backtest.xirr([[-100, 50], [-100, 200], [100, 100]], [0, 1])
+    assert rates[:2] == pytest.approx([-0.5, 1.0])
+    assert np.isnan(rates[2])
+
+
+def test_monthly_dates_clip_to_month_end():
+    dates = backtest.monthly_dates('2023-01-31', '2023-04-30', 31)
+    assert list(dates.strftime('%m-%d')) == ['01-31', '02-28', '03-31', '04-30']
+
+
+def test_sip_earns_the_fund_rate():
+    navs = navs_growing(0.12)
+    frame, summary = backtest.sip(navs, 1000, '2020-01-05', '2023-01-04')
+    assert summary['instalments'] == 36
+    assert summary['invested'] == 36000
+    assert summary['xirr'] == pytest.approx(12, abs=0.1)
+    # The 5th of January 2020 is a Sunday: bought on Monday the 6th
+    assert frame.index[0] == pd.Timestamp('2020-01-06')
+    assert frame['Invested'].iloc[0] == 1000
+
+
+def test_lumpsum_matches_the_nav_change():
+    navs = navs_growing(0.08)
+    frame, summary = backtest.lumpsum(navs, 5000, '2021-03-01', '2022-03-01')
+    assert summary['value'] == pytest.approx(5000 * navs['2022-03-01'] / navs['2021-03-01'])
+    assert summary['xirr'] == pytest.approx(8, abs=0.05)
+
+
+def test_swp_stops_when_units_run_out():
+    navs = pd.Series(10.0, index=pd.bdate_range('2020-01-01', '2021-12-31'))
+    frame, summary = backtest.swp(navs, 10000, 3000, '2020-01-01')
+    assert summary['withdrawals'] == 4  # 3000 x 3, then the last 1000
+    assert summary['withdrawn'] == pytest.approx(10000)
+    assert frame['Value'].iloc[-1] == 0
+
+
+def test_stp_moves_money_to_the_target():
+    source = navs_growing(0.06)
+    target = navs_growing(0.15)
+    frame, summary = backtest.stp(source, target, 12000, 1000, '2021-01-01', '2022-06-30')
+    # The source grows while it is drawn down, so a 13th, partial transfer empties it
+    assert summary['transfers'] == 13
+    assert frame['Source'].iloc[-1] == 0
+    assert 6 < summary['xirr'] < 15
+
+
+def test_rolling_sip_matches_sip():
+    rng = np.random.default_rng(3)
+    days = pd.bdate_range('2019-01-01', '2022-12-31')
+    matrix = pd.DataFrame(10 * np.exp(np.cumsum(rng.normal(0.0004, 0.01, (len(days), 2)), axis=0)),
+                          index=days, columns=['a', 'b'])
+    matrix.iloc[:300, 1] = np.nan  # 'b' launches later
+    rolling = backtest.rolling_sip(matrix, 1, step=7)
+    # Where a year on is a weekend, sip() through that day has the same
+    # 12 instalments and is valued at the same (Friday's) NAV
+    ends = rolling.index + pd.DateOffset(years=1)
+    checked = 0
+    for start, end in zip(rolling.index[ends.dayofweek >= 5], ends[ends.dayofweek >= 5]):
+        for code in matrix:
+            navs = matrix[code].dropna()
+            if start < navs.index[0]:
+                assert np.isnan(rolling.at[start, code])
+                continue
+            _, summary = backtest.sip(navs, 1, start, end)
+            assert summary['instalments'] == 12
+            assert rolling.at[start, code] == pytest.approx(summary['xirr'], abs=1e-6)
+            checked += 1
+    assert checked > 20
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from downsample import downsample, lttb_indices, plot_dates
+
+
+def test_short_series_are_untouched():
+    assert list(lttb_indices(range(10), range(10), points=20)) == list(range(10))
+    frame = pd.DataFrame({'nav': np.arange(50.0)}, index=pd.bdate_range('2024-01-01', periods=50))
+    assert downsample(frame, 'nav', points=50) is frame
+
+
+def test_keeps_ends_and_spikes():
+    y = np.zeros(1000)
+    y[[123, 600]] = [50, -40]
+    kept = lttb_indices(np.arange(1000), y, points=50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+    assert {123, 600} <= set(kept)
+
+
+def test_downsample_samples_every_column_on_the_same_dates():
+    days = pd.bdate_range('2000-01-03', periods=5000)
+    nav = np.cumsum(np.random.default_rng(5).normal(size=len(days))) + 100
+    frame = pd.DataFrame({'nav': nav, 'ma200': pd.Series(nav).rolling(200).mean().to_numpy()},
+                         index=days)
+    frame.iloc[:10, 0] = np.nan  # before launch
+    small = downsample(frame, 'nav', points=300)
+    assert len(small) == 300
+    assert small.index[0] == days[10] and small.index[-1] == days[-1]
+    pd.testing.assert_frame_equal(small, frame.loc[small.index])
+    assert plot_dates(small.index)[0] == days[10].strftime('%Y-%m-%d')
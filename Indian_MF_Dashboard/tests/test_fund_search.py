@@ -0,0 +1,42 @@
+from fund_search import FundIndex
+
+FUNDS = [
+    {'schemeCode': '0', 'schemeName': 'HDFC Flexi Cap Fund - Direct Plan - Growth',
+     'amc': 'HDFC', 'category': 'Equity Scheme - Flexi Cap Fund'},
+    {'schemeCode': '1', 'schemeName': 'SBI Flexi Cap Fund - Direct Plan - Growth',
+     'amc': 'SBI', 'category': 'Equity Scheme - Flexi Cap Fund'},
+    {'schemeCode': '2', 'schemeName': 'HDFC Mid Cap Opportunities Fund - Regular Plan - IDCW',
+     'amc': 'HDFC', 'category': 'Equity Scheme - Mid Cap Fund'},
+    {'schemeCode': '3', 'schemeName': 'HDFC Mid Cap Opportunities Fund - Direct Plan - Growth',
+     'amc': 'HDFC', 'category': 'Equity Scheme - Mid Cap Fund'},
+    {'schemeCode': '4', 'schemeName': 'SBI Capital Protection Fund',
+     'amc': 'SBI', 'category': 'Debt Scheme - Credit Risk Fund'},
+]
+
+
+def test_every_word_matches_a_word_prefix():
+    index = FundIndex(FUNDS)
+    assert index.search('sbi flex') == (['1'], 1)
+    assert index.search('hdfc mid')[0] == ['3', '2']  # Direct/Growth plans first
+
+
+def test_ranking_tiers():
+    index = FundIndex(FUNDS)
+    # Names starting with the query, then whole-word matches, then prefix matches
+    assert index.search('sbi cap') == (['4', '1'], 2)
+    assert index.search('cap')[0][-1] == '4'  # only 'capital' in its name
+
+
+def test_facet_filters_apply_to_every_tier():
+    index = FundIndex(FUNDS)
+    assert index.search('flexi', amc='HDFC') == (['0'], 1)
+    assert index.search('cap', amc='HDFC') == (['0', '3', '2'], 3)
+    assert index.search('cap', amc='SBI', category='Debt Scheme - Credit Risk Fund') == (['4'], 1)
+    assert index.search('', amc='SBI') == (['1', '4'], 2)
+    assert index.search('cap', amc='Nobody') == ([], 0)
+
+
+def test_limit_and_total():
+    index = FundIndex(FUNDS)
+    assert index.search('fund', limit=2) == (['0', '3'], 5)
+    assert index.search(limit=3) == (['0', '3', '1'], 5)
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+import analytics
+from nav_store import NavStore, seed_demo
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NavStore(str(tmp_path / 'navs.db'))
+    seed_demo(store, schemes=8, years=2)
+    return store
+
+
+def test_save_metrics_replaces_the_table(store):
+    assert store.load_metrics().empty
+
+    assert analytics.refresh_metrics(store) == 8
+    first = store.load_metrics()
+    assert analytics.refresh_metrics(store) == 8
+    pd.testing.assert_frame_equal(store.load_metrics(), first)
+
+    store.save_metrics(first[['nav']].iloc[:3])
+    assert list(store.load_metrics().index) == list(first.index[:3])
+    assert store.metrics_computed_at() is not None
+
+
+def test_save_metrics_is_all_or_nothing(store):
+    analytics.refresh_metrics(store)
+    before = store.load_metrics()
+    broken = before[['nav']].copy()
+    broken.index = [before.index[0]] * len(broken)  # duplicate codes
+    with pytest.raises(Exception):
+        store.save_metrics(broken)
+    pd.testing.assert_frame_equal(store.load_metrics(), before)
+
+
+def test_nav_matrix_selects_codes(store):
+    codes = [fund['schemeCode'] for fund in store.funds()][:3]
+    matrix = store.nav_matrix(codes)
+    assert sorted(matrix.columns) == sorted(int(code) for code in codes)
+    assert not store._conn().in_transaction
+
+
+def test_nav_series_extends_incrementally(store):
+    code = store.funds()[0]['schemeCode']
+    navs = store.nav_frame(code)['nav']
+    cut = navs.index[-30].strftime('%Y-%m-%d')
+    with store._conn() as conn:
+        conn.execute("DELETE FROM navs WHERE code = ? AND date > ?", (int(code), cut))
+    assert len(store.nav_series(code)) == len(navs) - 29
+
+    store.add_rows([(int(code), 'Fund', 'AMC', 'Category', 'Type', None, None,
+                     day.strftime('%Y-%m-%d'), nav) for day, nav in navs.iloc[-29:].items()])
+    series = store.nav_series(code)
+    expected = analytics.extend_series(navs)
+    pd.testing.assert_frame_equal(series[list(analytics.SERIES_COLUMNS)], expected,
+                                  check_freq=False, check_names=False)
@@ -0,0 +1,129 @@
+import json
+import os
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, jsonify
+
+# Seconds an aggregate stays cached before it is recomputed
+AGGREGATE_TTL = int(os.environ.get("AGGREGATE_CACHE_SECONDS", "300"))
+MAX_CACHED_AGGREGATES = 512
+
+PERCENTILES = (50, 75, 90, 95)
+
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+class AggregateCache:
+    """Computed aggregates per (name, repo, arguments, token), kept for ttl
+    seconds; the oldest entries are dropped once max_items is reached"""
+
+    def __init__(self, ttl=AGGREGATE_TTL, max_items=MAX_CACHED_AGGREGATES):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            while len(self._entries) > self.max_items:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+        return value
+
+
+def columns(rows, names):
+    """Row tuples -> {name: [values]}, the columnar shape every aggregate returns"""
+    return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+
+def since_date(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def parse_time(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ") if value else None
+
+
+def branch_staleness(branches, comparisons, base):
+    """Per-branch last commit age and ahead/behind counts against base.
+
+    comparisons are GitHub compare responses of each branch head against
+    base (head...base), so their base_commit is the branch's head commit
+    and their ahead/behind counts are base's. A branch whose comparison
+    failed keeps the date of its own commit, if it carries one.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for branch, comparison in zip(branches, comparisons):
+        head, ahead, behind = branch['commit'], None, None
+        if comparison is not None and comparison.status_code == 200:
+            body = comparison.json()
+            head = body.get('base_commit') or head
+            ahead, behind = body.get('behind_by'), body.get('ahead_by')
+        if branch['name'] == base:
+            ahead = behind = 0
+        last_commit = head.get('commit', {}).get('author', {}).get('date')
+        age = None
+        if last_commit:
+            age = round((now - parse_time(last_commit)).total_seconds() / 86400, 1)
+        rows.append((branch['name'], last_commit, age,
+                     ahead, behind, branch.get('protected', False)))
+    rows.sort(key=lambda row: (row[2] is None, row[2]))
+    return {
+        'base': base,
+        'data': columns(rows, ('branch', 'last_commit_date', 'age_days',
+                               'ahead_by', 'behind_by', 'protected')),
+    }
+
+
+def pr_lead_times(pulls):
+    """Hours from opening to merge for merged PRs, with percentiles"""
+    rows = []
+    for pr in pulls:
+        merged_at = parse_time(pr.get('merged_at'))
+        if merged_at is None:
+            continue
+        hours = (merged_at - parse_time(pr['created_at'])).total_seconds() / 3600
+        rows.append((pr['number'], pr['user']['login'], pr['created_at'],
+                     pr['merged_at'], round(hours, 2)))
+
+    hours = [row[4] for row in rows]
+    if len(hours) >= 2:
+        cuts = statistics.quantiles(hours, n=100, method='inclusive')
+        percentiles = {f"p{p}": round(cuts[p - 1], 2) for p in PERCENTILES}
+    else:
+        percentiles = {f"p{p}": (hours[0] if hours else None) for p in PERCENTILES}
+    return {
+        'merged_prs': len(rows),
+        'considered_prs': len(pulls),
+        'lead_time_hours': percentiles,
+        'data': columns(rows, ('number', 'author', 'created_at', 'merged_at', 'lead_time_hours')),
+    }
+
+
+def respond(payload, fmt="json"):
+    """JSON by default; ?format=arrow sends payload['data'] as an Arrow IPC
+    stream (needs pyarrow), with the other fields in the schema metadata"""
+    if fmt != "arrow":
+        return jsonify(payload)
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return jsonify({"error": "format=arrow needs pyarrow installed on the API server"}), 400
+
+    table = pa.table(payload['data'])
+    meta = {k: json.dumps(v) for k, v in payload.items() if k != 'data'}
+    table = table.replace_schema_metadata(meta)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), mimetype=ARROW_MIMETYPE)
@@ -2,40 +2,53 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import requests
 from datetime import datetime, timedelta
-from collections import defaultdict
 import base64
+import aggregates
+import metrics
+from github_client import GitHubClient, token_key
+from commit_store import CommitStore, repo_key
+from github_graphql import GraphQLBackend, use_graphql
+from stats_warmer import STATS_KINDS, StatsWarmer
+from repo_analysis import RepoAnalysis
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
 
-# GitHub API base URL
-GITHUB_API_URL = "https://api.github.com"
+# Largest request body the API accepts (it only serves small GETs)
+app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
 
-
-def get_headers(token=None):
-    """Get headers for GitHub API requests"""
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    if token:
-        headers["Authorization"] = f"token {token}"
-    return headers
+# Shared, pooled GitHub client (keep-alive connections, bounded fan-out)
+github = GitHubClient()
+graphql = GraphQLBackend(github)
+store = CommitStore()
+aggregate_cache = aggregates.AggregateCache()
+stats_warmer = StatsWarmer(github, store)
+repo_analysis = RepoAnalysis(github, store, graphql)
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "API is running"})
+    """Health check endpoint, with the caller's remaining GitHub quota"""
+    token = request.headers.get('X-GitHub-Token')
+    return jsonify({
+        "status": "healthy",
+        "message": "API is running",
+        "rate_limit": github.quota(token),
+        "graphql_rate_limit": github.quota(token, "graphql")
+    })
 
 
 @app.route('/api/repository/<owner>/<repo>', methods=['GET'])
 def get_repository_info(owner, repo):
     """Get basic repository information"""
     token = request.headers.get('X-GitHub-Token')
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}"
-
     try:
-        response = requests.get(url, headers=get_headers(token))
-        response.raise_for_status()
-        return jsonify(response.json())
+        repo_info = github.get_json(f"/repos/{owner}/{repo}", token)
+
+        # Have GitHub start computing the Activity statistics right away
+        stats_warmer.warm(owner, repo, token)
+        return jsonify(repo_info)
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
@@ -44,28 +57,60 @@ def get_repository_info(owner, repo):
 def get_branches(owner, repo):
     """Get all branches in the repository"""
     token = request.headers.get('X-GitHub-Token')
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/branches"
-
     try:
-        response = requests.get(url, headers=get_headers(
-            token), params={'per_page': 100})
-        response.raise_for_status()
-        branches = response.json()
-
-        # Get detailed info for each branch
-        detailed_branches = []
-        for branch in branches:
-            branch_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/branches/{branch['name']}"
-            branch_response = requests.get(
-                branch_url, headers=get_headers(token))
-            if branch_response.status_code == 200:
-                detailed_branches.append(branch_response.json())
-
-        return jsonify(detailed_branches)
+        return jsonify(_branch_details(owner, repo, token))
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
 
+def _branch_details(owner, repo, token):
+    """Every branch with its head commit, via GraphQL or one REST call each"""
+    # GraphQL returns every branch with its head commit in one query per 100
+    if use_graphql(request.args.get('backend'), token):
+        return graphql.branches(owner, repo, token)
+
+    branches = github.get_pages(
+        f"/repos/{owner}/{repo}/branches", token, params={'per_page': 100})
+
+    # Get detailed info for each branch, fetched concurrently
+    responses = github.get_many(
+        [f"/repos/{owner}/{repo}/branches/{branch['name']}" for branch in branches],
+        token
+    )
+    return [r.json() for r in responses if r is not None and r.status_code == 200]
+
+
+def _sync_branch(owner, repo, branch_name, token, max_commits):
+    """Sync a branch into the commit store; GraphQL also reports protection"""
+    if use_graphql(request.args.get('backend'), token):
+        return graphql.sync_branch(store, owner, repo, branch_name, token, max_commits)
+    store.sync_branch(github, owner, repo, branch_name, token, max_commits)
+    return None
+
+
+def _fill_line_stats(owner, repo, branch_name, token, max_commits):
+    """Fetch additions/deletions for the newest stored commits that lack them"""
+    key = repo_key(owner, repo)
+    missing = store.missing_stats(key, branch_name, max_commits)
+    if use_graphql(request.args.get('backend'), token):
+        # Batched: one query per 100 commits
+        store.set_stats(key, graphql.commit_stats(owner, repo, missing, token))
+        return
+
+    # Concurrently, and only as many as the rate limit allows
+    budget = github.call_budget(token)
+    if budget is not None:
+        missing = missing[:budget]
+    commit_details = github.get_many(
+        [f"/repos/{owner}/{repo}/commits/{sha}" for sha in missing], token)
+    line_stats = []
+    for sha, commit_detail in zip(missing, commit_details):
+        if commit_detail is not None and commit_detail.status_code == 200:
+            stats = commit_detail.json().get('stats', {})
+            line_stats.append((sha, stats.get('additions', 0), stats.get('deletions', 0)))
+    store.set_stats(key, line_stats)
+
+
 @app.route('/api/repository/<owner>/<repo>/branch/<path:branch_name>/commits', methods=['GET'])
 def get_branch_commits(owner, repo, branch_name):
     """Get commits for a specific branch"""
@@ -73,16 +118,14 @@ def get_branch_commits(owner, repo, branch_name):
     since = request.args.get('since', None)
     per_page = request.args.get('per_page', 100)
 
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits"
     params = {'sha': branch_name, 'per_page': per_page}
 
     if since:
         params['since'] = since
 
     try:
-        response = requests.get(url, headers=get_headers(token), params=params)
-        response.raise_for_status()
-        return jsonify(response.json())
+        return jsonify(github.get_json(
+            f"/repos/{owner}/{repo}/commits", token, params=params))
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
@@ -91,81 +134,23 @@ def get_branch_commits(owner, repo, branch_name):
 def get_branch_stats(owner, repo, branch_name):
     """Get comprehensive statistics for a branch"""
     token = request.headers.get('X-GitHub-Token')
+    max_commits = max(1, request.args.get('max_commits', 100, type=int))
 
     try:
-        # Get commits
-        commits_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits"
-        commits_response = requests.get(
-            commits_url,
-            headers=get_headers(token),
-            params={'sha': branch_name, 'per_page': 100}
-        )
-        commits_response.raise_for_status()
-        commits = commits_response.json()
-
-        # Analyze commits
-        contributor_stats = defaultdict(
-            lambda: {'commits': 0, 'additions': 0, 'deletions': 0})
-        commit_dates = []
-        total_additions = 0
-        total_deletions = 0
-
-        for commit in commits[:50]:  # Limit to avoid rate limiting
-            if commit.get('author'):
-                author = commit['author'].get('login', 'Unknown')
-                contributor_stats[author]['commits'] += 1
-
-            commit_date = commit['commit']['author']['date']
-            commit_dates.append(commit_date)
-
-            # Get commit details for file changes
-            commit_sha = commit['sha']
-            commit_detail_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{commit_sha}"
-            commit_detail = requests.get(
-                commit_detail_url, headers=get_headers(token))
-
-            if commit_detail.status_code == 200:
-                stats = commit_detail.json().get('stats', {})
-                additions = stats.get('additions', 0)
-                deletions = stats.get('deletions', 0)
-
-                total_additions += additions
-                total_deletions += deletions
-
-                if commit.get('author'):
-                    author = commit['author'].get('login', 'Unknown')
-                    contributor_stats[author]['additions'] += additions
-                    contributor_stats[author]['deletions'] += deletions
-
-        # Calculate activity timeline
-        activity_timeline = defaultdict(int)
-        for date_str in commit_dates:
-            date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
-            day = date.strftime("%Y-%m-%d")
-            activity_timeline[day] += 1
-
-        # Sort contributors by commits
-        top_contributors = sorted(
-            [{'author': k, **v} for k, v in contributor_stats.items()],
-            key=lambda x: x['commits'],
-            reverse=True
-        )[:10]
-
-        # Get branch protection status
-        protection_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/branches/{branch_name}/protection"
-        protection_response = requests.get(
-            protection_url, headers=get_headers(token))
-        is_protected = protection_response.status_code == 200
-
-        return jsonify({
-            'total_commits': len(commits),
-            'total_additions': total_additions,
-            'total_deletions': total_deletions,
-            'contributors': top_contributors,
-            'activity_timeline': dict(sorted(activity_timeline.items())),
-            'is_protected': is_protected,
-            'last_commit_date': commits[0]['commit']['author']['date'] if commits else None
-        })
+        # Sync the branch into the local store; only new commits are fetched
+        is_protected = _sync_branch(owner, repo, branch_name, token, max_commits)
+        _fill_line_stats(owner, repo, branch_name, token, max_commits)
+
+        # Aggregate contributors, totals and the activity timeline in SQL
+        stats = store.branch_stats(repo_key(owner, repo), branch_name, max_commits)
+
+        # Get branch protection status (GraphQL already reported it)
+        if is_protected is None:
+            protection_response = github.get(
+                f"/repos/{owner}/{repo}/branches/{branch_name}/protection", token)
+            is_protected = protection_response.status_code == 200
+
+        return jsonify({**stats, 'is_protected': is_protected})
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
@@ -174,12 +159,9 @@ def get_branch_stats(owner, repo, branch_name):
 def compare_branches(owner, repo, base, head):
     """Compare two branches"""
     token = request.headers.get('X-GitHub-Token')
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/compare/{base}...{head}"
-
     try:
-        response = requests.get(url, headers=get_headers(token))
-        response.raise_for_status()
-        return jsonify(response.json())
+        return jsonify(github.get_json(
+            f"/repos/{owner}/{repo}/compare/{base}...{head}", token))
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
@@ -188,13 +170,9 @@ def compare_branches(owner, repo, base, head):
 def get_contributors(owner, repo):
     """Get repository contributors"""
     token = request.headers.get('X-GitHub-Token')
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contributors"
-
     try:
-        response = requests.get(url, headers=get_headers(
-            token), params={'per_page': 100})
-        response.raise_for_status()
-        return jsonify(response.json())
+        return jsonify(github.get_json(
+            f"/repos/{owner}/{repo}/contributors", token, params={'per_page': 100}))
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
@@ -204,13 +182,9 @@ def get_pull_requests(owner, repo):
     """Get pull requests"""
     token = request.headers.get('X-GitHub-Token')
     state = request.args.get('state', 'open')
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls"
-
     try:
-        response = requests.get(url, headers=get_headers(
-            token), params={'state': state, 'per_page': 50})
-        response.raise_for_status()
-        return jsonify(response.json())
+        return jsonify(github.get_json(
+            f"/repos/{owner}/{repo}/pulls", token, params={'state': state, 'per_page': 50}))
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
@@ -218,16 +192,195 @@ def get_pull_requests(owner, repo):
 @app.route('/api/repository/<owner>/<repo>/code-frequency', methods=['GET'])
 def get_code_frequency(owner, repo):
     """Get code frequency statistics"""
+    return get_repository_stats(owner, repo, 'code_frequency')
+
+
+@app.route('/api/repository/<owner>/<repo>/stats/<kind>', methods=['GET'])
+def get_repository_stats(owner, repo, kind):
+    """Get one of GitHub's computed statistics (see STATS_KINDS).
+
+    Answers 202 while GitHub is still computing it; a background warmer
+    keeps polling, so a later request returns it at once.
+    """
     token = request.headers.get('X-GitHub-Token')
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/stats/code_frequency"
+    if kind not in STATS_KINDS:
+        return jsonify({"error": f"Unknown statistic: {kind}"}), 404
+    try:
+        data = stats_warmer.get(owner, repo, kind, token)
+        if data is None:
+            response = jsonify({
+                "status": "pending",
+                "message": "GitHub is still computing these statistics; try again shortly"
+            })
+            response.headers['Retry-After'] = '5'
+            return response, 202
+        return jsonify(data)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 400
+
+
+def _aggregate(name, owner, repo, token, compute):
+    """Serve an aggregate from the server-side cache, computing it on a miss"""
+    args = tuple(sorted((k, v) for k, v in request.args.items() if k != 'format'))
+    payload = aggregate_cache.get_or_compute(
+        (name, repo_key(owner, repo), args, token_key(token)), compute)
+    return aggregates.respond(payload, request.args.get('format', 'json'))
+
+
+def _default_branch(owner, repo, token):
+    return github.get_json(f"/repos/{owner}/{repo}", token)['default_branch']
+
+
+@app.route('/api/repository/<owner>/<repo>/aggregates/author-activity', methods=['GET'])
+def get_author_activity(owner, repo):
+    """Commits and line changes per author per week on one branch"""
+    token = request.headers.get('X-GitHub-Token')
+    days = max(1, request.args.get('days', 90, type=int))
+    max_commits = max(1, request.args.get('max_commits', 500, type=int))
+
+    def compute():
+        branch = request.args.get('branch') or _default_branch(owner, repo, token)
+        _sync_branch(owner, repo, branch, token, max_commits)
+        _fill_line_stats(owner, repo, branch, token, max_commits)
+        since = aggregates.since_date(days)
+        rows = store.author_activity(repo_key(owner, repo), branch, since)
+        return {
+            'branch': branch,
+            'since': since,
+            'data': aggregates.columns(
+                rows, ('author', 'week', 'commits', 'additions', 'deletions'))
+        }
 
     try:
-        response = requests.get(url, headers=get_headers(token))
-        response.raise_for_status()
-        return jsonify(response.json())
+        return _aggregate('author-activity', owner, repo, token, compute)
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 400
 
 
+@app.route('/api/repository/<owner>/<repo>/aggregates/daily-commits', methods=['GET'])
+def get_daily_commits(owner, repo):
+    """Distinct commits per day across one or more branches"""
+    token = request.headers.get('X-GitHub-Token')
+    days = max(1, request.args.get('days', 90, type=int))
+    max_commits = max(1, request.args.get('max_commits', 500, type=int))
+
+    def compute():
+        branches = [b for b in request.args.get('branches', '').split(',') if b]
+        if not branches:
+            branches = [_default_branch(owner, repo, token)]
+        for branch in branches:
+            _sync_branch(owner, repo, branch, token, max_commits)
+        since = aggregates.since_date(days)
+        rows = store.daily_commits(repo_key(owner, repo), branches, since)
+        return {
+            'branches': branches,
+            'since': since,
+            'data': aggregates.columns(rows, ('day', 'commits'))
+        }
+
+    try:
+        return _aggregate('daily-commits', owner, repo, token, compute)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/repository/<owner>/<repo>/aggregates/branch-staleness', methods=['GET'])
+def get_branch_staleness(owner, repo):
+    """Age of each branch's last commit and how far it is ahead/behind base"""
+    token = request.headers.get('X-GitHub-Token')
+
+    def compute():
+        base = request.args.get('base') or _default_branch(owner, repo, token)
+        if use_graphql(request.args.get('backend'), token):
+            branches = graphql.branches(owner, repo, token)
+        else:
+            # The listing has no commit dates; each comparison below brings
+            # its branch's head commit, so no per-branch details are fetched
+            branches = github.get_pages(
+                f"/repos/{owner}/{repo}/branches", token, params={'per_page': 100})
+        # Compared head...base, base_commit is the branch head; only that
+        # and the ahead/behind counts are needed, so ask for one commit page
+        comparisons = github.get_many(
+            [f"/repos/{owner}/{repo}/compare/{branch['commit']['sha']}...{base}"
+             for branch in branches],
+            token,
+            params={'per_page': 1}
+        )
+        return aggregates.branch_staleness(branches, comparisons, base)
+
+    try:
+        return _aggregate('branch-staleness', owner, repo, token, compute)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/repository/<owner>/<repo>/aggregates/pr-lead-time', methods=['GET'])
+def get_pr_lead_time(owner, repo):
+    """Open-to-merge time of recent pull requests, with percentiles"""
+    token = request.headers.get('X-GitHub-Token')
+    max_prs = max(1, request.args.get('max_prs', 300, type=int))
+
+    def compute():
+        pulls = github.get_pages(
+            f"/repos/{owner}/{repo}/pulls",
+            token,
+            params={'state': 'closed', 'sort': 'created', 'direction': 'desc',
+                    'per_page': min(max_prs, 100)},
+            max_items=max_prs
+        )
+        return aggregates.pr_lead_times(pulls)
+
+    try:
+        return _aggregate('pr-lead-time', owner, repo, token, compute)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 400
+
+
+def _analysis_status(job):
+    """A job row as returned by the analysis endpoints"""
+    return {
+        "job_id": job['job_id'],
+        "state": job['state'],
+        "branches_total": job['branches_total'],
+        "branches_done": job['branches_done'],
+        "error": job['error'],
+        "updated_at": job['updated_at'],
+    }
+
+
+@app.route('/api/repository/<owner>/<repo>/analysis', methods=['POST'])
+def start_repository_analysis(owner, repo):
+    """Start analysing every branch of the repository in the background.
+
+    Answers 202 with the job id; poll /api/analysis/<job_id> for progress.
+    """
+    token = request.headers.get('X-GitHub-Token')
+    job = repo_analysis.start(owner, repo, token,
+                              use_graphql(request.args.get('backend'), token))
+    response = jsonify(_analysis_status(job))
+    response.headers['Location'] = f"/api/analysis/{job['job_id']}"
+    return response, 202
+
+
+@app.route('/api/analysis/<job_id>', methods=['GET'])
+def get_analysis_status(job_id):
+    """Progress of a repository analysis job"""
+    job = repo_analysis.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown analysis job"}), 404
+    return jsonify(_analysis_status(job))
+
+
+@app.route('/api/repository/<owner>/<repo>/analysis', methods=['GET'])
+def get_repository_analysis(owner, repo):
+    """Latest finished analysis: per-branch divergence, contributors, churn and age"""
+    token = request.headers.get('X-GitHub-Token')
+    job = repo_analysis.latest(owner, repo, token)
+    if job is None:
+        return jsonify({"error": "No analysis yet; POST to this URL to start one"}), 404
+    payload = {**job['result'], 'job_id': job['job_id'], 'finished_at': job['updated_at']}
+    return aggregates.respond(payload, request.args.get('format', 'json'))
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
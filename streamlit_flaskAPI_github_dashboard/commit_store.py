@@ -0,0 +1,430 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from rate_limit import INTERACTIVE
+
+# SQLite file holding synced commits, shared by all API processes
+STORE_DB = os.environ.get("GITHUB_STORE_DB", "commit_store.sqlite3")
+
+# Commits requested per page while syncing (GitHub's maximum)
+SYNC_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    author TEXT,
+    date TEXT NOT NULL,
+    additions INTEGER,
+    deletions INTEGER,
+    PRIMARY KEY (repo, sha)
+);
+CREATE TABLE IF NOT EXISTS commit_parents (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    PRIMARY KEY (repo, sha, parent)
+);
+CREATE TABLE IF NOT EXISTS branch_commits (
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (repo, branch, sha)
+);
+CREATE TABLE IF NOT EXISTS branch_sync (
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    head TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (repo, branch)
+);
+CREATE INDEX IF NOT EXISTS commits_by_date ON commits (repo, date);
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    job_id TEXT PRIMARY KEY,
+    repo TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    state TEXT NOT NULL,
+    branches_total INTEGER,
+    branches_done INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analysis_jobs_by_repo ON analysis_jobs (repo, scope, created_at);
+CREATE TABLE IF NOT EXISTS repo_stats (
+    repo TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (repo, kind, scope)
+);
+"""
+
+# Every stored ancestor of a head commit, following all parents
+_ANCESTRY = """
+WITH RECURSIVE ancestry(sha) AS (
+    SELECT :head
+    UNION
+    SELECT p.parent FROM ancestry a
+    JOIN commit_parents p ON p.repo = :repo AND p.sha = a.sha
+)
+"""
+
+# The newest :limit commits of a synced branch
+_SELECTED = """
+WITH selected AS (
+    SELECT c.* FROM branch_commits b
+    JOIN commits c ON c.repo = b.repo AND c.sha = b.sha
+    WHERE b.repo = :repo AND b.branch = :branch
+    ORDER BY c.date DESC, c.sha
+    LIMIT :limit
+)
+"""
+
+
+def repo_key(owner, repo):
+    return f"{owner}/{repo}".lower()
+
+
+class CommitStore:
+    """Local SQLite store of commits and their line stats per repository.
+
+    Commits are stored once per repository with their parent links, so
+    branches that share history share rows; a branch is just the set of
+    commits reachable from its head. Syncing a branch only fetches commits
+    GitHub has that the store does not, and stats are aggregated in SQL.
+    """
+
+    def __init__(self, db_path=STORE_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add_commits(self, repo, commits):
+        """Store commits as returned by GitHub's list-commits endpoint.
+
+        Commits that carry a "stats" entry (as the GraphQL backend's do)
+        also record their additions/deletions.
+        """
+        rows, parents = [], []
+        for commit in commits:
+            author = None
+            if commit.get('author'):
+                author = commit['author'].get('login', 'Unknown')
+            stats = commit.get('stats', {})
+            rows.append((repo, commit['sha'], author, commit['commit']['author']['date'],
+                         stats.get('additions'), stats.get('deletions')))
+            parents.extend((repo, commit['sha'], p['sha']) for p in commit.get('parents', []))
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO commits VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (repo, sha) DO UPDATE SET"
+                " additions = COALESCE(commits.additions, excluded.additions),"
+                " deletions = COALESCE(commits.deletions, excluded.deletions)",
+                rows)
+            conn.executemany("INSERT OR IGNORE INTO commit_parents VALUES (?, ?, ?)", parents)
+
+    def set_stats(self, repo, stats):
+        """Record (sha, additions, deletions) from commit details"""
+        with self._conn() as conn:
+            conn.executemany(
+                "UPDATE commits SET additions = ?, deletions = ? WHERE repo = ? AND sha = ?",
+                [(additions, deletions, repo, sha) for sha, additions, deletions in stats])
+
+    def _ancestry(self, repo, head):
+        """(stored commits reachable from head, whether all of its
+        ancestors are stored)"""
+        row = self._conn().execute(
+            _ANCESTRY + "SELECT COUNT(c.sha), COUNT(*) - COUNT(c.sha) FROM ancestry"
+            " LEFT JOIN commits c ON c.repo = :repo AND c.sha = ancestry.sha",
+            {"repo": repo, "head": head}
+        ).fetchone()
+        return row[0], row[1] == 0
+
+    def reachable(self, repo, head):
+        """Number of stored commits reachable from head"""
+        return self._ancestry(repo, head)[0]
+
+    def sync_state(self, repo, branch):
+        row = self._conn().execute(
+            "SELECT head, depth, complete, synced_at FROM branch_sync"
+            " WHERE repo = ? AND branch = ?", (repo, branch)).fetchone()
+        return dict(row) if row else None
+
+    def mark_synced(self, repo, branch, head, depth, complete):
+        """Point branch at head and rebuild its commit membership"""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM branch_commits WHERE repo = ? AND branch = ?",
+                         (repo, branch))
+            conn.execute(
+                _ANCESTRY + "INSERT INTO branch_commits SELECT :repo, :branch, c.sha"
+                " FROM ancestry JOIN commits c ON c.repo = :repo AND c.sha = ancestry.sha",
+                {"repo": repo, "branch": branch, "head": head})
+            conn.execute(
+                "INSERT OR REPLACE INTO branch_sync VALUES (?, ?, ?, ?, ?, ?)",
+                (repo, branch, head, depth, int(complete), time.time()))
+
+    def refresh_membership(self, repo, branches):
+        """Rebuild the commit membership of synced branches at their heads.
+
+        Syncing one branch can store older ancestors of another, e.g. of
+        the default branch when a branch forked before its synced window;
+        the other branch only counts them once its membership is rebuilt.
+        """
+        for branch in branches:
+            state = self.sync_state(repo, branch)
+            if state:
+                depth, complete = self._ancestry(repo, state['head'])
+                self.mark_synced(repo, branch, state['head'], depth,
+                                 state['complete'] or complete)
+
+    def sync_pages(self, repo, branch, head, pages, max_commits=100):
+        """Bring branch up to date given its current head.
+
+        pages yields (commits, is_last) pairs walking back from head and
+        is only consumed until at least max_commits are reachable in the store,
+        every ancestor of head is stored or history ends. After an update
+        that is usually the first page, since older history is already
+        stored.
+        """
+        state = self.sync_state(repo, branch)
+        if state and state['head'] == head and (
+                state['complete'] or state['depth'] >= max_commits):
+            return head
+
+        depth, complete = self._ancestry(repo, head)
+        if depth < max_commits and not complete:
+            for commits, is_last in pages:
+                self.add_commits(repo, commits)
+                depth, complete = self._ancestry(repo, head)
+                if is_last:
+                    complete = True
+                    break
+                if depth >= max_commits or complete:
+                    break
+
+        self.mark_synced(repo, branch, head, depth, complete)
+        return head
+
+    def sync_branch(self, client, owner, repo, branch, token=None, max_commits=100,
+                    head=None, priority=INTERACTIVE):
+        """Sync branch from the REST API, fetching only what is new.
+
+        Pass head when it is already known (e.g. from a branch listing)
+        to skip looking it up.
+        """
+        if head is None:
+            head = client.get_json(
+                f"/repos/{owner}/{repo}/branches/{branch}", token,
+                priority=priority)['commit']['sha']
+
+        def pages():
+            response = client.get(
+                f"/repos/{owner}/{repo}/commits", token,
+                params={'sha': head, 'per_page': SYNC_PAGE_SIZE}, priority=priority)
+            while True:
+                response.raise_for_status()
+                next_url = response.links.get("next", {}).get("url")
+                yield response.json(), not next_url
+                response = client.get(next_url, token, priority=priority)
+
+        return self.sync_pages(repo_key(owner, repo), branch, head, pages(), max_commits)
+
+    def missing_stats(self, repo, branch, limit):
+        """SHAs among the newest `limit` branch commits without line stats"""
+        rows = self._conn().execute(
+            _SELECTED + "SELECT sha FROM selected WHERE additions IS NULL ORDER BY date DESC",
+            {"repo": repo, "branch": branch, "limit": limit}).fetchall()
+        return [row['sha'] for row in rows]
+
+    def branch_stats(self, repo, branch, limit):
+        """Aggregate stats over the newest `limit` commits of a synced branch"""
+        conn = self._conn()
+        params = {"repo": repo, "branch": branch, "limit": limit}
+
+        totals = conn.execute(
+            _SELECTED + "SELECT COUNT(*) AS total_commits,"
+            " COUNT(additions) AS analysed_commits,"
+            " COALESCE(SUM(additions), 0) AS total_additions,"
+            " COALESCE(SUM(deletions), 0) AS total_deletions,"
+            " MAX(date) AS last_commit_date FROM selected", params).fetchone()
+
+        contributors = conn.execute(
+            _SELECTED + "SELECT author, COUNT(*) AS commits,"
+            " COALESCE(SUM(additions), 0) AS additions,"
+            " COALESCE(SUM(deletions), 0) AS deletions"
+            " FROM selected WHERE author IS NOT NULL"
+            " GROUP BY author ORDER BY commits DESC, author LIMIT 10", params).fetchall()
+
+        timeline = conn.execute(
+            _SELECTED + "SELECT substr(date, 1, 10) AS day, COUNT(*) AS commits"
+            " FROM selected GROUP BY day ORDER BY day", params).fetchall()
+
+        return {
+            **dict(totals),
+            'contributors': [dict(row) for row in contributors],
+            'activity_timeline': {row['day']: row['commits'] for row in timeline},
+        }
+
+    def author_activity(self, repo, branch, since):
+        """(author, week, commits, additions, deletions) rows for a synced
+        branch's commits dated on or after since (YYYY-MM-DD); weeks start
+        on Monday"""
+        return self._conn().execute(
+            "SELECT c.author, date(substr(c.date, 1, 10), 'weekday 0', '-6 days') AS week,"
+            " COUNT(*) AS commits, COALESCE(SUM(c.additions), 0) AS additions,"
+            " COALESCE(SUM(c.deletions), 0) AS deletions"
+            " FROM branch_commits b JOIN commits c ON c.repo = b.repo AND c.sha = b.sha"
+            " WHERE b.repo = ? AND b.branch = ? AND c.date >= ? AND c.author IS NOT NULL"
+            " GROUP BY c.author, week ORDER BY week, c.author",
+            (repo, branch, since)).fetchall()
+
+    def daily_commits(self, repo, branches, since):
+        """(day, commits) for distinct commits on any of the synced branches"""
+        marks = ", ".join("?" * len(branches))
+        return self._conn().execute(
+            "SELECT substr(date, 1, 10) AS day, COUNT(*) AS commits FROM commits"
+            " WHERE repo = ? AND date >= ? AND sha IN ("
+            f"  SELECT sha FROM branch_commits WHERE repo = ? AND branch IN ({marks}))"
+            " GROUP BY day ORDER BY day",
+            (repo, since, repo, *branches)).fetchall()
+
+    def save_repo_stats(self, repo, kind, scope, data):
+        """Store a GitHub /stats/{kind} result for one token scope"""
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO repo_stats VALUES (?, ?, ?, ?, ?)",
+                         (repo, kind, scope, json.dumps(data), time.time()))
+
+    def load_repo_stats(self, repo, kind, scope, max_age):
+        """A stored /stats/{kind} result no older than max_age seconds, or None"""
+        row = self._conn().execute(
+            "SELECT data FROM repo_stats WHERE repo = ? AND kind = ? AND scope = ?"
+            " AND fetched_at >= ?", (repo, kind, scope, time.time() - max_age)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def _select_branches(self, conn, branches):
+        # A temp table (per connection) instead of an IN list of any length
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected_branches (branch TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM selected_branches")
+        conn.executemany("INSERT OR IGNORE INTO selected_branches VALUES (?)",
+                         [(branch,) for branch in branches])
+
+    def diverged_missing_stats(self, repo, base, branches):
+        """SHAs of commits on any of branches but not on base that lack line stats"""
+        with self._conn() as conn:
+            self._select_branches(conn, branches)
+            rows = conn.execute(
+                "SELECT DISTINCT c.sha FROM branch_commits b"
+                " JOIN selected_branches s ON s.branch = b.branch"
+                " JOIN commits c ON c.repo = b.repo AND c.sha = b.sha"
+                " LEFT JOIN branch_commits d ON d.repo = b.repo AND d.branch = ? AND d.sha = b.sha"
+                " WHERE b.repo = ? AND d.sha IS NULL AND c.additions IS NULL",
+                (base, repo)).fetchall()
+        return [row['sha'] for row in rows]
+
+    def detached(self, repo, base, branches):
+        """Those of branches sharing no stored commit with base: their merge
+        base with it lies outside the synced history"""
+        with self._conn() as conn:
+            self._select_branches(conn, branches)
+            rows = conn.execute(
+                "SELECT s.branch FROM selected_branches s WHERE s.branch != ? AND NOT EXISTS ("
+                " SELECT 1 FROM branch_commits b"
+                " JOIN branch_commits d ON d.repo = b.repo AND d.branch = ? AND d.sha = b.sha"
+                " WHERE b.repo = ? AND b.branch = s.branch)",
+                (base, base, repo)).fetchall()
+        return sorted(row['branch'] for row in rows)
+
+    def divergence(self, repo, base, branches):
+        """Per-branch figures against base, in one pass over the stored history.
+
+        Rows of (branch, head_date, commits, ahead, contributors, churn,
+        churn_unknown), where contributors and churn (lines added plus
+        deleted) cover the commits ahead of base, and churn_unknown counts
+        those without line stats. behind = base commits - (commits - ahead).
+        """
+        with self._conn() as conn:
+            self._select_branches(conn, branches)
+            rows = conn.execute(
+                "SELECT b.branch, h.date AS head_date, COUNT(*) AS commits,"
+                " SUM(d.sha IS NULL) AS ahead,"
+                " COUNT(DISTINCT CASE WHEN d.sha IS NULL THEN c.author END) AS contributors,"
+                " COALESCE(SUM(CASE WHEN d.sha IS NULL THEN c.additions + c.deletions END), 0)"
+                "  AS churn,"
+                " SUM(d.sha IS NULL AND c.additions IS NULL) AS churn_unknown"
+                " FROM branch_commits b"
+                " JOIN selected_branches s ON s.branch = b.branch"
+                " JOIN commits c ON c.repo = b.repo AND c.sha = b.sha"
+                " JOIN branch_sync y ON y.repo = b.repo AND y.branch = b.branch"
+                " JOIN commits h ON h.repo = b.repo AND h.sha = y.head"
+                " LEFT JOIN branch_commits d ON d.repo = b.repo AND d.branch = ? AND d.sha = b.sha"
+                " WHERE b.repo = ?"
+                " GROUP BY b.branch",
+                (base, repo)).fetchall()
+            distinct = conn.execute(
+                "SELECT COUNT(DISTINCT b.sha) FROM branch_commits b"
+                " JOIN selected_branches s ON s.branch = b.branch WHERE b.repo = ?",
+                (repo,)).fetchone()[0]
+        return [tuple(row) for row in rows], distinct
+
+    def save_analysis(self, job_id, **fields):
+        """Create or update an analysis job row"""
+        fields['updated_at'] = time.time()
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        with self._conn() as conn:
+            if 'repo' in fields:
+                fields.setdefault('created_at', fields['updated_at'])
+                names = ", ".join(fields)
+                conn.execute(
+                    f"INSERT INTO analysis_jobs (job_id, {names})"
+                    f" VALUES (?, {', '.join('?' * len(fields))})",
+                    (job_id, *fields.values()))
+            else:
+                assignments = ", ".join(f"{name} = ?" for name in fields)
+                conn.execute(f"UPDATE analysis_jobs SET {assignments} WHERE job_id = ?",
+                             (*fields.values(), job_id))
+
+    def advance_analysis(self, job_id):
+        """Count one more branch done"""
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET branches_done = branches_done + 1, updated_at = ?"
+                " WHERE job_id = ?", (time.time(), job_id))
+
+    def load_analysis(self, job_id=None, repo=None, scope=None, state=None):
+        """One job by id, or the newest job for repo/scope (in state, if given)"""
+        if job_id is not None:
+            row = self._conn().execute(
+                "SELECT * FROM analysis_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        else:
+            query = "SELECT * FROM analysis_jobs WHERE repo = ? AND scope = ?"
+            params = [repo, scope]
+            if state is not None:
+                query += " AND state = ?"
+                params.append(state)
+            row = self._conn().execute(
+                query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
@@ -5,6 +5,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
+from dashboard_data import ApiCache
 
 # Page configuration
 st.set_page_config(
@@ -17,6 +18,12 @@ st.set_page_config(
 # API Configuration
 API_BASE_URL = "http://localhost:5000/api"
 
+# Seconds a health check result is reused
+HEALTH_TTL = 30
+
+# Default history window of the Activity tab
+DEFAULT_ACTIVITY_DAYS = 90
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -50,26 +57,62 @@ if 'current_owner' not in st.session_state:
     st.session_state.current_owner = ""
 if 'current_repo' not in st.session_state:
     st.session_state.current_repo = ""
+if 'analysis_job' not in st.session_state:
+    st.session_state.analysis_job = None
 
 
-def make_api_request(endpoint, method="GET", params=None):
-    """Make API request with token"""
-    headers = {}
-    if st.session_state.github_token:
-        headers['X-GitHub-Token'] = st.session_state.github_token
+@st.cache_resource
+def get_api_cache():
+    """One response cache per dashboard server, shared by all sessions"""
+    return ApiCache(API_BASE_URL)
 
-    url = f"{API_BASE_URL}{endpoint}"
 
+def make_api_request(endpoint, method="GET", params=None, ttl=None):
+    """Make API request with token, reusing cached responses (GET only)"""
     try:
-        if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        if method == "POST":
+            return get_api_cache().post(endpoint, params, st.session_state.github_token)
+        data = get_api_cache().get(
+            endpoint, params, st.session_state.github_token, ttl=ttl)
+        if isinstance(data, dict) and data.get('status') == 'pending':
+            st.info(f"⏳ {data['message']}")
+            return None
+        return data
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: {str(e)}")
         return None
 
 
+def make_aggregate_request(owner, repo, name, params=None):
+    """Fetch a server-side aggregate; returns (payload, DataFrame of its columns)"""
+    payload = make_api_request(f"/repository/{owner}/{repo}/aggregates/{name}", params=params)
+    if not payload:
+        return None, None
+    return payload, pd.DataFrame(payload['data'])
+
+
+def prefetch_repository(owner, repo):
+    """Start every independent request the page will make, all at once.
+
+    The display_* functions below then block only on their own data (their
+    make_api_request joins the in-flight call), so each section renders as
+    soon as it is ready and the page takes about as long as its slowest call.
+    """
+    base = f"/repository/{owner}/{repo}"
+    days = st.session_state.get("activity_days", DEFAULT_ACTIVITY_DAYS)
+    get_api_cache().prefetch([
+        (base, None),
+        (f"{base}/aggregates/branch-staleness", None),
+        (f"{base}/pull-requests", {'state': st.session_state.get("pr_state", "open")}),
+        (f"{base}/aggregates/pr-lead-time", None),
+        (f"{base}/contributors", None),
+        (f"{base}/code-frequency", None),
+        (f"{base}/stats/commit_activity", None),
+        (f"{base}/aggregates/daily-commits", {'days': days}),
+        (f"{base}/aggregates/author-activity", {'days': days}),
+    ], st.session_state.github_token)
+
+
 def display_repository_overview(owner, repo):
     """Display repository overview"""
     repo_info = make_api_request(f"/repository/{owner}/{repo}")
@@ -103,13 +146,13 @@ def display_repository_overview(owner, repo):
 
 def display_branch_analysis(owner, repo):
     """Display detailed branch analysis"""
-    branches = make_api_request(f"/repository/{owner}/{repo}/branches")
+    staleness, staleness_df = make_aggregate_request(owner, repo, "branch-staleness")
 
-    if branches:
-        st.subheader(f"📊 Branch Analysis ({len(branches)} branches)")
+    if staleness and not staleness_df.empty:
+        st.subheader(f"📊 Branch Analysis ({len(staleness_df)} branches)")
 
         # Branch selector with multiple options
-        branch_names = [b['name'] for b in branches]
+        branch_names = sorted(staleness_df['branch'])
 
         col1, col2, col3 = st.columns([2, 2, 1])
         with col1:
@@ -138,6 +181,9 @@ def display_branch_analysis(owner, repo):
             st.write("")
             # Removed the refresh button that was causing issues
 
+        with st.expander(f"🕰️ Branch staleness vs {staleness['base']}"):
+            st.dataframe(staleness_df, use_container_width=True)
+
         st.markdown("---")
 
         if selected_branch:
@@ -209,12 +255,21 @@ def display_branch_analysis(owner, repo):
 
 def display_branch_comparison(owner, repo):
     """Display branch comparison"""
-    branches = make_api_request(f"/repository/{owner}/{repo}/branches")
+    staleness, staleness_df = make_aggregate_request(owner, repo, "branch-staleness")
 
-    if branches:
+    if staleness and not staleness_df.empty:
         st.subheader("🔀 Compare Branches")
 
-        branch_names = [b['name'] for b in branches]
+        # Ahead/behind of every branch against the default branch
+        diverged = staleness_df[staleness_df['branch'] != staleness['base']]
+        if not diverged.empty:
+            fig = px.bar(diverged.head(30), x='branch', y=['ahead_by', 'behind_by'],
+                         title=f"Commits Ahead/Behind {staleness['base']}",
+                         barmode='group')
+            fig.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig, use_container_width=True)
+
+        branch_names = sorted(staleness_df['branch'])
 
         col1, col2 = st.columns(2)
         with col1:
@@ -270,12 +325,81 @@ def display_branch_comparison(owner, repo):
                         fig.update_layout(xaxis_tickangle=-45)
                         st.plotly_chart(fig, use_container_width=True)
 
+    display_repository_analysis(owner, repo)
+
+
+def display_repository_analysis(owner, repo):
+    """Every branch against the default branch, from a background analysis job"""
+    st.markdown("---")
+    st.subheader("🧭 Repository-wide Branch Analysis")
+    endpoint = f"/repository/{owner}/{repo}/analysis"
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if st.button("▶️ Run analysis", help="Sync every branch's history and compare it "
+                                             "with the default branch, in the background"):
+            job = make_api_request(endpoint, method="POST")
+            if job:
+                st.session_state.analysis_job = job['job_id']
+
+    # Ask for the latest result again once a tracked job has finished
+    refresh = False
+    job_id = st.session_state.analysis_job
+    if job_id:
+        job = make_api_request(f"/analysis/{job_id}", ttl=0)
+        if job and job['state'] in ('queued', 'running'):
+            with col2:
+                total = job['branches_total'] or 0
+                st.progress(job['branches_done'] / total if total else 0.0,
+                            text=f"Analysing branches: {job['branches_done']}/{total or '?'}")
+                st.button("🔄 Check progress")
+        else:
+            if job and job['state'] == 'failed':
+                st.error(f"Analysis failed: {job['error']}")
+            st.session_state.analysis_job = None
+            refresh = True
+
+    try:
+        result = get_api_cache().get(endpoint, token=st.session_state.github_token,
+                                     refresh=refresh)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            st.caption("No analysis has been run for this repository yet.")
+        else:
+            st.error(f"API Error: {str(e)}")
+        return
+    except requests.exceptions.RequestException as e:
+        st.error(f"API Error: {str(e)}")
+        return
+
+    analysis_df = pd.DataFrame(result['data'])
+    finished = datetime.fromtimestamp(result['finished_at']).strftime('%Y-%m-%d %H:%M')
+    st.caption(f"{result['branches']} branches, {result['distinct_commits']} distinct commits, "
+               f"against {result['default_branch']}; finished {finished}")
+    if result['failed_branches']:
+        st.warning(f"Could not sync: {', '.join(result['failed_branches'])}")
+    if result.get('forked_outside_window'):
+        st.warning(f"Forked from {result['default_branch']} outside the synced history, "
+                   f"so not compared: {', '.join(result['forked_outside_window'])}")
+
+    if not analysis_df.empty:
+        fig = px.scatter(analysis_df.dropna(subset=['ahead_by']), x='age_days', y='churn',
+                         size='ahead_by',
+                         color='contributors', hover_name='branch',
+                         title='Churn Ahead of the Default Branch vs. Branch Age',
+                         labels={'age_days': 'Days since last commit',
+                                 'churn': 'Lines changed (ahead commits)'})
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(analysis_df[['branch', 'last_commit_date', 'age_days', 'ahead_by',
+                                  'behind_by', 'contributors', 'churn', 'churn_unknown']],
+                     use_container_width=True)
+
 
 def display_pull_requests(owner, repo):
     """Display pull requests analysis"""
     st.subheader("🔄 Pull Requests")
 
-    state = st.radio("PR State", ["open", "closed", "all"], horizontal=True)
+    state = st.radio("PR State", ["open", "closed", "all"], horizontal=True, key="pr_state")
 
     prs = make_api_request(f"/repository/{owner}/{repo}/pull-requests",
                            params={'state': state})
@@ -313,6 +437,19 @@ def display_pull_requests(owner, repo):
                          title='PR State Distribution')
             st.plotly_chart(fig, use_container_width=True)
 
+    # Lead time (open -> merge) of recently closed PRs, computed by the API
+    lead_time, lead_df = make_aggregate_request(owner, repo, "pr-lead-time")
+    if lead_time and lead_time['merged_prs']:
+        st.subheader("⏱️ PR Lead Time")
+        cols = st.columns(len(lead_time['lead_time_hours']))
+        for col, (name, hours) in zip(cols, lead_time['lead_time_hours'].items()):
+            with col:
+                st.metric(f"{name.upper()} (hours)", hours)
+        fig = px.histogram(lead_df, x='lead_time_hours', nbins=30,
+                           title=f"Open-to-Merge Time of {lead_time['merged_prs']} Merged PRs",
+                           labels={'lead_time_hours': 'Hours'})
+        st.plotly_chart(fig, use_container_width=True)
+
 
 def display_contributors(owner, repo):
     """Display contributors analysis"""
@@ -381,6 +518,15 @@ def main():
 
         analyze_button = st.button("🔍 Analyze Repository", type="primary")
 
+        # Cached data controls
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔄 Refresh", help="Fetch this repository's data again"):
+                get_api_cache().invalidate(owner, repo, st.session_state.github_token)
+        with col2:
+            if st.button("🧹 Clear cache", help="Forget all cached API responses"):
+                get_api_cache().invalidate()
+
         if analyze_button:
             st.session_state.analyzed = True
             st.session_state.current_owner = owner
@@ -397,13 +543,15 @@ def main():
         st.session_state.current_repo = repo
 
         # Health check
-        health = make_api_request("/health")
+        health = make_api_request("/health", ttl=HEALTH_TTL)
         if not health:
             st.error(
                 "❌ Cannot connect to Flask API. Make sure it's running on port 5000")
             st.code("python app.py", language="bash")
             return
 
+        prefetch_repository(owner, repo)
+
         # Repository Overview
         with st.container():
             display_repository_overview(owner, repo)
@@ -449,6 +597,38 @@ def main():
                                   xaxis_title='Date', yaxis_title='Lines of Code')
                 st.plotly_chart(fig, use_container_width=True)
 
+            st.subheader("📆 Weekly Commits (last year)")
+            commit_activity = make_api_request(
+                f"/repository/{owner}/{repo}/stats/commit_activity")
+            if commit_activity:
+                weekly_df = pd.DataFrame(commit_activity)
+                weekly_df['week'] = pd.to_datetime(weekly_df['week'], unit='s')
+                fig = px.bar(weekly_df, x='week', y='total',
+                             labels={'week': 'Week', 'total': 'Commits'})
+                st.plotly_chart(fig, use_container_width=True)
+
+            days = st.slider("Days of history", 7, 365, DEFAULT_ACTIVITY_DAYS,
+                             key="activity_days")
+
+            st.subheader("📅 Daily Commits")
+            daily, daily_df = make_aggregate_request(
+                owner, repo, "daily-commits", params={'days': days})
+            if daily and not daily_df.empty:
+                fig = px.bar(daily_df, x='day', y='commits',
+                             title=f"Commits per Day on {', '.join(daily['branches'])}")
+                st.plotly_chart(fig, use_container_width=True)
+
+            st.subheader("👥 Author Activity")
+            activity, activity_df = make_aggregate_request(
+                owner, repo, "author-activity", params={'days': days})
+            if activity and not activity_df.empty:
+                matrix = activity_df.pivot_table(index='author', columns='week',
+                                                 values='commits', fill_value=0)
+                fig = px.imshow(matrix, aspect='auto', color_continuous_scale='Greens',
+                                title=f"Commits per Author per Week on {activity['branch']}",
+                                labels={'color': 'Commits'})
+                st.plotly_chart(fig, use_container_width=True)
+
     elif not analyze_button and not st.session_state.analyzed:
         # Welcome screen
         st.info(
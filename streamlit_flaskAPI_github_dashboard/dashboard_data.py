@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Seconds a backend response is reused before the dashboard asks again
+CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", "300"))
+
+# Most responses kept; expired ones are dropped first, then the oldest
+MAX_ENTRIES = 512
+
+# (connect, read) timeout in seconds for each backend call
+REQUEST_TIMEOUT = (3.05, float(os.environ.get("DASHBOARD_REQUEST_TIMEOUT", "60")))
+
+# Backend calls a prefetch runs at once
+PREFETCH_WORKERS = int(os.environ.get("DASHBOARD_PREFETCH_WORKERS", "8"))
+
+
+def token_fingerprint(token=None):
+    """Short, non-reversible id for a token, so cached data stays per token"""
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+class _InFlight:
+    """A backend call that identical concurrent requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ApiCache:
+    """Backend responses for the dashboard, shared by every session.
+
+    Entries are keyed by endpoint, query parameters and token fingerprint
+    and expire after ttl seconds. When several reruns or sessions ask for
+    the same thing at once, only the first calls the backend and the rest
+    wait for its answer. Errors and 202 (still computing) answers are
+    never cached.
+
+    prefetch() starts independent requests on a thread pool; a later get()
+    for the same data joins the in-flight call instead of issuing its own,
+    so a page renders each section as soon as its own data has arrived.
+    """
+
+    def __init__(self, base_url, ttl=CACHE_TTL, max_entries=MAX_ENTRIES,
+                 timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS,
+                                            thread_name_prefix="prefetch")
+
+    def _fetch(self, endpoint, params, token, method="GET"):
+        headers = {}
+        if token:
+            headers['X-GitHub-Token'] = token
+        response = self.session.request(method, f"{self.base_url}{endpoint}",
+                                        headers=headers, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.status_code, response.json()
+
+    def _store(self, key, expires, value):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            if len(self._entries) > self.max_entries:
+                now = time.time()
+                for old in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                    del self._entries[old]
+                while len(self._entries) > self.max_entries:
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+
+    def get(self, endpoint, params=None, token=None, ttl=None, refresh=False):
+        """GET endpoint from the backend, raising requests' exceptions;
+        refresh=True skips a cached response"""
+        key = (endpoint, tuple(sorted((params or {}).items())), token_fingerprint(token))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time() and not refresh:
+                return entry[1]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            status, flight.result = self._fetch(endpoint, params, token)
+            # 202 = the backend is still computing this; ask again next time
+            if status == 200:
+                self._store(key, time.time() + (self.ttl if ttl is None else ttl),
+                            flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def post(self, endpoint, params=None, token=None):
+        """POST to endpoint (never cached), raising requests' exceptions"""
+        return self._fetch(endpoint, params, token, method="POST")[1]
+
+    def prefetch(self, calls, token=None):
+        """Start fetching (endpoint, params) pairs concurrently.
+
+        Returns at once; failures are left for the later get() to report.
+        """
+        def fetch(endpoint, params):
+            try:
+                self.get(endpoint, params, token)
+            except Exception:
+                pass
+
+        for endpoint, params in calls:
+            self._executor.submit(fetch, endpoint, params)
+
+    def invalidate(self, owner=None, repo=None, token=None):
+        """Forget one repository's responses for token, or everything"""
+        with self._lock:
+            if owner is None:
+                self._entries.clear()
+                return
+            prefix = f"/repository/{owner}/{repo}"
+            fingerprint = token_fingerprint(token)
+            for key in [k for k in self._entries
+                        if k[2] == fingerprint and (k[0] == prefix or k[0].startswith(prefix + "/"))]:
+                del self._entries[key]
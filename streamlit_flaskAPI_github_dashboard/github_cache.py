@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Responses kept in memory per API process
+CACHE_SIZE = int(os.environ.get("GITHUB_CACHE_SIZE", "2048"))
+
+# Optional SQLite file shared by all API processes and restarts
+CACHE_DB = os.environ.get("GITHUB_CACHE_DB", "")
+
+# Headers worth keeping with a cached body
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+# A commit addressed by its full SHA can never change
+_IMMUTABLE_PATH = re.compile(r"/repos/[^/]+/[^/]+/commits/[0-9a-f]{40}$")
+
+
+def is_immutable(url):
+    return bool(_IMMUTABLE_PATH.search(url.split("?", 1)[0]))
+
+
+def cache_key(url, params, scope):
+    """Key a response by URL, query parameters and token scope"""
+    raw = json.dumps([url, sorted((params or {}).items()), scope], default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """The parts of a GitHub response needed to revalidate and replay it"""
+
+    def __init__(self, url, headers, body, immutable=False):
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.immutable = immutable
+
+    @classmethod
+    def from_response(cls, response):
+        headers = {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers}
+        return cls(response.url, headers, response.content, is_immutable(response.url))
+
+    def validators(self):
+        """Conditional-request headers; a 304 answer is free against the rate limit"""
+        headers = {}
+        if "ETag" in self.headers:
+            headers["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["Last-Modified"]
+        return headers
+
+    def to_response(self, extra_headers=None):
+        """Rebuild a 200 requests.Response, e.g. to answer a 304"""
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = self.url
+        response._content = self.body
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(self.headers)
+        if extra_headers:
+            # Keep fresh rate-limit headers from the 304
+            response.headers.update(
+                {k: v for k, v in extra_headers.items() if k.startswith("X-RateLimit")})
+        return response
+
+
+class ResponseCache:
+    """In-memory LRU of GitHub responses, backed by SQLite when db_path is set"""
+
+    def __init__(self, max_items=CACHE_SIZE, db_path=CACHE_DB):
+        self.max_items = max_items
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, url TEXT, headers TEXT, body BLOB,"
+                " immutable INTEGER, stored_at REAL)"
+            )
+            self._db.commit()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT url, headers, body, immutable FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CachedResponse(row[0], json.loads(row[1]), row[2], bool(row[3]))
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, entry.url, json.dumps(entry.headers), entry.body,
+                     int(entry.immutable), time.time())
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
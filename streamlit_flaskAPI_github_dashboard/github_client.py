@@ -0,0 +1,211 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from github_cache import CachedResponse, ResponseCache, cache_key
+from rate_limit import INTERACTIVE, MAX_RETRIES, Scheduler
+
+# GitHub API base URL
+GITHUB_API_URL = "https://api.github.com"
+
+# (connect, read) timeout in seconds for every GitHub call
+REQUEST_TIMEOUT = (5, 30)
+
+# Kept-alive connections to api.github.com per API process
+POOL_SIZE = int(os.environ.get("GITHUB_POOL_SIZE", "32"))
+
+# Most detail requests in flight at once per API process
+MAX_CONCURRENCY = int(os.environ.get("GITHUB_MAX_CONCURRENCY", "16"))
+
+# Fan-out allows one in-flight request per this many rate-limit calls left
+CALLS_PER_SLOT = 50
+
+# Calls always left unspent for other dashboard requests
+RATE_LIMIT_RESERVE = 100
+
+
+def token_key(token=None):
+    """Short, non-reversible id for a token (or anonymous access)"""
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def get_headers(token=None):
+    """Get headers for GitHub API requests"""
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    if token:
+        headers["Authorization"] = f"token {token}"
+    return headers
+
+
+def _scope(token, resource):
+    # Scheduler key: GitHub budgets each API resource separately per token
+    return token_key(token) if resource == "core" else f"{token_key(token)}:{resource}"
+
+
+class GitHubClient:
+    """Shared GitHub REST client.
+
+    One pooled requests.Session keeps connections to GitHub alive across
+    calls and threads, and get_many() fans independent requests out over
+    a bounded thread pool instead of issuing them one after another.
+
+    Successful responses are cached and revalidated with ETag /
+    Last-Modified, so unchanged data costs a 304 (which GitHub does not
+    count against the rate limit). Commits fetched by full SHA are served
+    from the cache without asking GitHub at all.
+
+    Every call goes through a rate-limit Scheduler: background calls
+    (priority=BACKGROUND) yield to interactive ones, and rate-limited
+    calls are retried after the backoff GitHub asks for.
+    """
+
+    def __init__(self, base_url=GITHUB_API_URL, pool_size=POOL_SIZE,
+                 max_concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT,
+                 cache=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else ResponseCache()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.scheduler = Scheduler(max_concurrency)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created lazily so a forking server never inherits live threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix="github"
+                )
+            return self._executor
+
+    def url(self, path):
+        return path if path.startswith("http") else f"{self.base_url}{path}"
+
+    def _send(self, method, url, scope, priority, **kwargs):
+        """Issue one request through the scheduler, retrying rate limits"""
+        for attempt in range(MAX_RETRIES + 1):
+            with self.scheduler.slot(scope, priority):
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            if not self.scheduler.record(scope, response) or attempt == MAX_RETRIES:
+                return response
+
+    def get(self, path, token=None, params=None, priority=INTERACTIVE):
+        """GET a path such as /repos/{owner}/{repo}; returns the Response"""
+        url = self.url(path)
+        scope = token_key(token)
+        key = cache_key(url, params, scope)
+        cached = self.cache.get(key)
+        if cached is not None and cached.immutable:
+            return cached.to_response()
+
+        headers = get_headers(token)
+        if cached is not None:
+            headers.update(cached.validators())
+        response = self._send("GET", url, scope, priority, headers=headers, params=params)
+
+        if response.status_code == 304 and cached is not None:
+            return cached.to_response(response.headers)
+        if response.status_code == 200 and (
+                "ETag" in response.headers or "Last-Modified" in response.headers):
+            self.cache.put(key, CachedResponse.from_response(response))
+        return response
+
+    def post(self, path, payload, token=None, priority=INTERACTIVE, resource="core"):
+        """POST a JSON payload (e.g. a GraphQL query); never cached.
+
+        resource names the rate-limit bucket GitHub charges, which is
+        tracked separately per token (GraphQL has its own).
+        """
+        return self._send("POST", self.url(path), _scope(token, resource), priority,
+                          headers=get_headers(token), json=payload)
+
+    def remaining(self, token=None):
+        """Rate-limit calls left for token as last reported, or None"""
+        return self.scheduler.remaining(token_key(token))
+
+    def call_budget(self, token=None):
+        """How many more calls a request may spend (None = unknown)"""
+        remaining = self.remaining(token)
+        if remaining is None:
+            return None
+        return max(0, remaining - RATE_LIMIT_RESERVE)
+
+    def fanout_limit(self, token=None):
+        """Concurrency for get_many, shrinking as the rate limit runs low
+        and after GitHub pushes back"""
+        limit = min(self.max_concurrency, self.scheduler.concurrency(token_key(token)))
+        remaining = self.remaining(token)
+        if remaining is None:
+            return limit
+        return max(1, min(limit, remaining // CALLS_PER_SLOT))
+
+    def quota(self, token=None, resource="core"):
+        """Rate-limit state for token as last reported by GitHub"""
+        return self.scheduler.snapshot(_scope(token, resource))
+
+    def get_pages(self, path, token=None, params=None, max_items=None,
+                  priority=INTERACTIVE):
+        """GET a list endpoint, following Link: rel="next" pages.
+
+        Stops after max_items items (all pages when None).
+        """
+        items = []
+        response = self.get(path, token, params, priority)
+        while True:
+            response.raise_for_status()
+            items.extend(response.json())
+            next_url = response.links.get("next", {}).get("url")
+            if not next_url or (max_items is not None and len(items) >= max_items):
+                break
+            response = self.get(next_url, token, priority=priority)
+        return items[:max_items] if max_items is not None else items
+
+    def get_json(self, path, token=None, params=None, priority=INTERACTIVE):
+        """GET and decode JSON, raising requests' HTTPError on failure"""
+        response = self.get(path, token, params, priority)
+        response.raise_for_status()
+        return response.json()
+
+    def get_many(self, paths, token=None, params=None, limit=None,
+                 priority=INTERACTIVE):
+        """GET several paths concurrently, returning responses in order.
+
+        At most `limit` (default: fanout_limit(token)) of them are in
+        flight at once. A request that fails at the network level (or
+        waits out a rate limit for too long) yields None.
+        """
+        paths = list(paths)
+        limit = max(1, min(limit or self.fanout_limit(token), self.max_concurrency))
+        results = [None] * len(paths)
+
+        def fetch(path):
+            try:
+                return self.get(path, token, params, priority)
+            except requests.exceptions.RequestException:
+                return None
+
+        pool = self._pool()
+        pending = {}
+        next_index = 0
+        while next_index < len(paths) or pending:
+            while next_index < len(paths) and len(pending) < limit:
+                pending[pool.submit(fetch, paths[next_index])] = next_index
+                next_index += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+        return results
@@ -0,0 +1,183 @@
+import os
+
+import requests
+
+from commit_store import repo_key
+from rate_limit import INTERACTIVE
+
+# Data backend used when a request does not pass ?backend= ("rest" or "graphql")
+DEFAULT_BACKEND = os.environ.get("GITHUB_BACKEND", "rest")
+
+GRAPHQL_PATH = "/graphql"
+
+# Page sizes; history pages with additions/deletions are costly for GitHub
+BRANCH_PAGE_SIZE = 100
+HISTORY_PAGE_SIZE = 50
+STATS_BATCH_SIZE = 100
+
+_COMMIT_FIELDS = """
+    oid
+    url
+    message
+    additions
+    deletions
+    committedDate
+    author { name email date user { login } }
+    parents(first: 10) { nodes { oid } }
+"""
+
+BRANCHES_QUERY = """
+query($owner: String!, $repo: String!, $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    refs(refPrefix: "refs/heads/", first: %d, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        branchProtectionRule { id }
+        target { ... on Commit { %s } }
+      }
+    }
+  }
+}
+""" % (BRANCH_PAGE_SIZE, _COMMIT_FIELDS)
+
+HEAD_QUERY = """
+query($owner: String!, $repo: String!, $branch: String!) {
+  repository(owner: $owner, name: $repo) {
+    ref(qualifiedName: $branch) {
+      branchProtectionRule { id }
+      target { ... on Commit { oid } }
+    }
+  }
+}
+"""
+
+HISTORY_QUERY = """
+query($owner: String!, $repo: String!, $head: GitObjectID!, $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    object(oid: $head) {
+      ... on Commit {
+        history(first: %d, after: $cursor) {
+          pageInfo { hasNextPage endCursor }
+          nodes { %s }
+        }
+      }
+    }
+  }
+}
+""" % (HISTORY_PAGE_SIZE, _COMMIT_FIELDS)
+
+
+class GraphQLError(requests.exceptions.RequestException):
+    """GitHub answered a GraphQL query with errors"""
+
+
+def use_graphql(requested, token):
+    """Whether to use GraphQL; it needs a token, so anonymous calls use REST"""
+    return (requested or DEFAULT_BACKEND) == "graphql" and bool(token)
+
+
+def normalise_commit(node):
+    """A GraphQL Commit in the shape of a REST list-commits item, plus stats"""
+    author = node['author'] or {}
+    user = author.get('user')
+    return {
+        'sha': node['oid'],
+        'html_url': node['url'],
+        'commit': {
+            'author': {
+                'name': author.get('name'),
+                'email': author.get('email'),
+                # GitHub can omit the author; the commit always has a date
+                'date': author.get('date') or node['committedDate'],
+            },
+            'message': node['message'],
+        },
+        'author': {'login': user['login']} if user else None,
+        'parents': [{'sha': p['oid']} for p in node['parents']['nodes']],
+        'stats': {
+            'additions': node['additions'],
+            'deletions': node['deletions'],
+            'total': node['additions'] + node['deletions'],
+        },
+    }
+
+
+class GraphQLBackend:
+    """Branch and commit data from GitHub's GraphQL API.
+
+    One query returns a page of branches with their head commits and
+    protection, or a page of history with line stats, where REST needs a
+    call per branch, per commit and per protection check. Results are
+    normalised to the REST shapes the API already returns.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def query(self, query, variables, token, priority=INTERACTIVE):
+        response = self.client.post(
+            GRAPHQL_PATH, {"query": query, "variables": variables}, token,
+            priority=priority, resource="graphql")
+        response.raise_for_status()
+        body = response.json()
+        if body.get('errors'):
+            raise GraphQLError("; ".join(e.get('message', '') for e in body['errors']))
+        return body['data']
+
+    def branches(self, owner, repo, token):
+        """All branches, shaped like REST GET /repos/{owner}/{repo}/branches/{name}"""
+        branches, cursor = [], None
+        while True:
+            refs = self.query(BRANCHES_QUERY, {"owner": owner, "repo": repo, "cursor": cursor},
+                              token)['repository']['refs']
+            for ref in refs['nodes']:
+                branches.append({
+                    'name': ref['name'],
+                    'commit': normalise_commit(ref['target']),
+                    'protected': ref['branchProtectionRule'] is not None,
+                })
+            if not refs['pageInfo']['hasNextPage']:
+                return branches
+            cursor = refs['pageInfo']['endCursor']
+
+    def sync_branch(self, store, owner, repo, branch, token=None, max_commits=100,
+                    priority=INTERACTIVE):
+        """Sync branch into the commit store; returns whether it is protected"""
+        ref = self.query(HEAD_QUERY, {"owner": owner, "repo": repo, "branch": branch},
+                         token, priority)['repository']['ref']
+        if ref is None:
+            raise GraphQLError(f"Branch not found: {branch}")
+        head = ref['target']['oid']
+
+        def pages():
+            cursor = None
+            while True:
+                history = self.query(
+                    HISTORY_QUERY,
+                    {"owner": owner, "repo": repo, "head": head, "cursor": cursor},
+                    token, priority)['repository']['object']['history']
+                is_last = not history['pageInfo']['hasNextPage']
+                yield [normalise_commit(node) for node in history['nodes']], is_last
+                cursor = history['pageInfo']['endCursor']
+
+        store.sync_pages(repo_key(owner, repo), branch, head, pages(), max_commits)
+        return ref['branchProtectionRule'] is not None
+
+    def commit_stats(self, owner, repo, shas, token, priority=INTERACTIVE):
+        """[(sha, additions, deletions)], batching many commits per query"""
+        stats = []
+        for start in range(0, len(shas), STATS_BATCH_SIZE):
+            batch = shas[start:start + STATS_BATCH_SIZE]
+            fields = "\n".join(
+                f'c{i}: object(oid: "{sha}") {{ ... on Commit {{ additions deletions }} }}'
+                for i, sha in enumerate(batch))
+            data = self.query(
+                "query($owner: String!, $repo: String!) {"
+                " repository(owner: $owner, name: $repo) { %s } }" % fields,
+                {"owner": owner, "repo": repo}, token, priority)['repository']
+            for i, sha in enumerate(batch):
+                node = data.get(f"c{i}")
+                if node:
+                    stats.append((sha, node['additions'], node['deletions']))
+        return stats
@@ -0,0 +1,54 @@
+# Production serving profile for the GitHub dashboard API.
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Every setting can be overridden with the environment variables below.
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# ---------------- CONFIG ----------------
+bind = os.environ.get("DASHBOARD_API_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("DASHBOARD_API_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+
+# Requests spend most of their time waiting on GitHub, so each worker
+# serves several of them concurrently from a thread pool.
+worker_class = "gthread"
+threads = int(os.environ.get("DASHBOARD_API_THREADS", "8"))
+timeout = int(os.environ.get("DASHBOARD_API_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("DASHBOARD_API_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# The API only takes small GET requests
+limit_request_line = 8190
+limit_request_fields = 50
+
+accesslog = "-"
+# ----------------------------------------
+
+# Shared folder for per-process metric files, read back by /metrics.
+# Must be set before the app (and prometheus_client) is imported.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "github_api_metrics")
+)
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def worker_exit(server, worker):
+    # Stop background statistics polling and queued analyses before the worker exits
+    from app import repo_analysis, stats_warmer
+    stats_warmer.shutdown()
+    repo_analysis.shutdown()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,76 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Under gunicorn, gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR so every
+# worker writes its samples there and /metrics sums them.
+
+REQUEST_SECONDS = Histogram(
+    "github_api_request_seconds",
+    "Time to serve a dashboard API request",
+    ["endpoint", "method", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+IN_FLIGHT = Gauge(
+    "github_api_requests_in_flight",
+    "Requests currently being served",
+    multiprocess_mode="livesum"
+)
+RESPONSE_BYTES = Counter(
+    "github_api_response_bytes_total",
+    "Response body bytes sent to the dashboard",
+    ["endpoint"]
+)
+
+
+def _start():
+    g.metrics_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _finish(status, size=0):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    IN_FLIGHT.dec()
+    REQUEST_SECONDS.labels(endpoint, request.method, status).observe(
+        time.perf_counter() - start)
+    RESPONSE_BYTES.labels(endpoint).inc(size)
+
+
+def _after(response):
+    _finish(str(response.status_code), response.content_length or 0)
+    return response
+
+
+def _teardown(exc):
+    if exc is not None:
+        _finish("500")
+
+
+def metrics_view():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
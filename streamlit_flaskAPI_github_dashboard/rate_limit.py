@@ -0,0 +1,170 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+# Request priorities: dashboard users first, cache warming/sync jobs second
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Background calls pause while fewer than this many calls are left
+BACKGROUND_RESERVE = int(os.environ.get("GITHUB_BACKGROUND_RESERVE", "500"))
+
+# Longest an interactive request waits out a rate limit before failing
+MAX_WAIT_SECONDS = float(os.environ.get("GITHUB_MAX_WAIT_SECONDS", "30"))
+
+# Retries of a rate-limited call, and the first backoff step in seconds
+MAX_RETRIES = 3
+BASE_BACKOFF = 1.0
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """GitHub's rate limit would keep this request waiting too long"""
+
+
+class _TokenBudget:
+    """What GitHub last told us about one token's limits"""
+
+    def __init__(self, max_concurrency):
+        self.remaining = None
+        self.limit = None
+        self.reset = None
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.interactive = 0
+        self.in_flight = 0
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.cond = threading.Condition()
+
+    def wait_seconds(self, priority, now):
+        wait = self.blocked_until - now
+        floor = 0 if priority == INTERACTIVE else BACKGROUND_RESERVE
+        if self.remaining is not None and self.remaining <= floor and self.reset:
+            wait = max(wait, self.reset - now)
+        return wait
+
+
+class Scheduler:
+    """Per-token GitHub rate-limit budget shared by all request threads.
+
+    Every call takes a slot first: it waits while the token is backing
+    off, out of quota or already has `concurrency` calls in flight, and
+    background calls also yield to interactive ones and keep
+    BACKGROUND_RESERVE calls for them. record()
+    reads the rate-limit headers of each response; on a primary or
+    secondary rate limit it blocks the token (Retry-After, the reset time
+    or exponential backoff, plus jitter) and halves its concurrency, which
+    then grows back by one per successful call.
+    """
+
+    def __init__(self, max_concurrency, max_wait=MAX_WAIT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, key):
+        with self._lock:
+            budget = self._budgets.get(key)
+            if budget is None:
+                budget = self._budgets[key] = _TokenBudget(self.max_concurrency)
+            return budget
+
+    @contextmanager
+    def slot(self, key, priority=INTERACTIVE):
+        budget = self._budget(key)
+        interactive = priority == INTERACTIVE
+        with budget.cond:
+            if interactive:
+                budget.interactive += 1
+            try:
+                while True:
+                    wait = budget.wait_seconds(priority, time.time())
+                    if wait <= 0 and budget.in_flight < budget.concurrency \
+                            and (interactive or budget.interactive == 0):
+                        break
+                    if interactive and wait > self.max_wait:
+                        raise RateLimited(
+                            f"GitHub rate limit reached; retry in {int(wait) + 1} seconds")
+                    budget.cond.wait(timeout=min(wait, 1.0) if wait > 0 else 1.0)
+            except BaseException:
+                if interactive:
+                    budget.interactive -= 1
+                    budget.cond.notify_all()
+                raise
+            budget.in_flight += 1
+            if budget.remaining is not None:
+                budget.remaining -= 1  # corrected by the response headers
+        try:
+            yield
+        finally:
+            with budget.cond:
+                budget.in_flight -= 1
+                if interactive:
+                    budget.interactive -= 1
+                budget.cond.notify_all()
+
+    def record(self, key, response):
+        """Update the budget from a response; True if it should be retried"""
+        budget = self._budget(key)
+        headers = response.headers
+        now = time.time()
+        with budget.cond:
+            if "X-RateLimit-Remaining" in headers:
+                budget.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Limit" in headers:
+                budget.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Reset" in headers:
+                budget.reset = int(headers["X-RateLimit-Reset"])
+
+            limited = response.status_code == 429 or (
+                response.status_code == 403 and (
+                    budget.remaining == 0
+                    or "Retry-After" in headers
+                    or "rate limit" in response.text.lower()
+                )
+            )
+            if not limited:
+                budget.failures = 0
+                budget.concurrency = min(budget.max_concurrency, budget.concurrency + 1)
+                return False
+
+            if "Retry-After" in headers:
+                delay = float(headers["Retry-After"])
+            elif budget.remaining == 0 and budget.reset:
+                delay = budget.reset - now
+            else:
+                # Secondary (abuse) limit without a hint: back off exponentially
+                delay = BASE_BACKOFF * 2 ** budget.failures
+            budget.failures += 1
+            budget.concurrency = max(1, budget.concurrency // 2)
+            budget.blocked_until = max(
+                budget.blocked_until, now + max(0.0, delay) + random.uniform(0, 1))
+            budget.cond.notify_all()
+            return True
+
+    def remaining(self, key):
+        budget = self._budgets.get(key)
+        return budget.remaining if budget else None
+
+    def concurrency(self, key):
+        budget = self._budgets.get(key)
+        return budget.concurrency if budget else self.max_concurrency
+
+    def snapshot(self, key):
+        """Quota as last reported by GitHub, for /api/health"""
+        budget = self._budgets.get(key)
+        if budget is None:
+            return {"remaining": None, "limit": None, "reset": None,
+                    "backoff_seconds": 0, "concurrency": self.max_concurrency}
+        return {
+            "remaining": budget.remaining,
+            "limit": budget.limit,
+            "reset": budget.reset,
+            "backoff_seconds": round(max(0.0, budget.blocked_until - time.time()), 1),
+            "concurrency": budget.concurrency,
+        }
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import requests
+
+import aggregates
+from commit_store import repo_key
+from github_client import token_key
+from rate_limit import BACKGROUND
+
+# Analysis jobs run at once per API process
+ANALYSIS_WORKERS = int(os.environ.get("GITHUB_ANALYSIS_WORKERS", "2"))
+
+# Branches synced at once within one job
+BRANCH_WORKERS = int(os.environ.get("GITHUB_ANALYSIS_BRANCH_WORKERS", "8"))
+
+# Newest commits of each branch taken into account
+ANALYSIS_MAX_COMMITS = int(os.environ.get("GITHUB_ANALYSIS_MAX_COMMITS", "1000"))
+
+# How far back the default branch is synced to reach branches that forked
+# from it before its newest ANALYSIS_MAX_COMMITS
+ANALYSIS_MAX_BASE_COMMITS = int(os.environ.get("GITHUB_ANALYSIS_MAX_BASE_COMMITS", "5000"))
+
+# A running job not updated for this many seconds is assumed dead
+# (e.g. its worker process was restarted)
+STALE_SECONDS = 600
+
+RESULT_COLUMNS = ('branch', 'last_commit_date', 'age_days', 'ahead_by', 'behind_by',
+                  'contributors', 'churn', 'churn_unknown')
+
+
+class RepoAnalysis:
+    """Repository-wide branch analysis, run as a background job.
+
+    Every branch's history is synced into the commit store once, so
+    commits shared between branches are fetched and stored a single time
+    (by SHA) and re-runs only fetch what is new. Divergence from the
+    default branch, contributors and churn of the diverged commits and
+    staleness are then computed in one SQL pass over the store. Line stats
+    are fetched only for diverged commits, as those are the only ones the
+    churn figures use. GitHub is called at background priority so
+    interactive requests keep the quota.
+
+    Jobs and their results live in the commit store's database, so any
+    API process can report progress and serve the latest result.
+    """
+
+    def __init__(self, client, store, graphql):
+        self.client = client
+        self.store = store
+        self.graphql = graphql
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        # Created lazily so a forking server never inherits live threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=ANALYSIS_WORKERS, thread_name_prefix="repo-analysis")
+            return self._executor
+
+    def _live(self, job):
+        """job, with a running job that stopped reporting marked failed"""
+        if job and job['state'] in ('queued', 'running') \
+                and time.time() - job['updated_at'] > STALE_SECONDS:
+            self.store.save_analysis(job['job_id'], state='failed',
+                                     error="The job stopped reporting progress")
+            job = self.store.load_analysis(job['job_id'])
+        return job
+
+    def start(self, owner, repo, token=None, use_graphql=False):
+        """Queue an analysis of owner/repo, or return the one already running"""
+        key, scope = repo_key(owner, repo), token_key(token)
+        for state in ('running', 'queued'):
+            job = self._live(self.store.load_analysis(repo=key, scope=scope, state=state))
+            if job and job['state'] == state:
+                return job
+
+        job_id = uuid.uuid4().hex
+        self.store.save_analysis(job_id, repo=key, scope=scope, state='queued')
+        self._pool().submit(self._run, job_id, owner, repo, token, use_graphql)
+        return self.store.load_analysis(job_id)
+
+    def status(self, job_id):
+        return self._live(self.store.load_analysis(job_id))
+
+    def latest(self, owner, repo, token=None):
+        """The newest finished analysis of owner/repo, or None"""
+        return self.store.load_analysis(repo=repo_key(owner, repo), scope=token_key(token),
+                                        state='done')
+
+    def _run(self, job_id, owner, repo, token, use_graphql):
+        try:
+            self.store.save_analysis(job_id, state='running')
+            result = self._analyse(job_id, owner, repo, token, use_graphql)
+            self.store.save_analysis(job_id, state='done', result=result)
+        except Exception as e:
+            self.store.save_analysis(job_id, state='failed', error=str(e))
+
+    def _sync(self, owner, repo, branch, token, use_graphql, max_commits=None):
+        max_commits = max_commits or ANALYSIS_MAX_COMMITS
+        if use_graphql:
+            self.graphql.sync_branch(self.store, owner, repo, branch['name'], token,
+                                     max_commits, priority=BACKGROUND)
+        else:
+            self.store.sync_branch(self.client, owner, repo, branch['name'], token,
+                                   max_commits, head=branch['commit']['sha'],
+                                   priority=BACKGROUND)
+
+    def _analyse(self, job_id, owner, repo, token, use_graphql):
+        key = repo_key(owner, repo)
+        base = self.client.get_json(f"/repos/{owner}/{repo}", token,
+                                    priority=BACKGROUND)['default_branch']
+        branches = self.client.get_pages(f"/repos/{owner}/{repo}/branches", token,
+                                         params={'per_page': 100}, priority=BACKGROUND)
+        self.store.save_analysis(job_id, branches_total=len(branches))
+
+        # The default branch first, so history the others share with it is
+        # already stored and counts towards their depth: most of them stop
+        # after their first page
+        ordered = sorted(branches, key=lambda b: b['name'] != base)
+        self._sync(owner, repo, ordered[0], token, use_graphql)
+        self.store.advance_analysis(job_id)
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=BRANCH_WORKERS,
+                                thread_name_prefix="branch-sync") as pool:
+            futures = {pool.submit(self._sync, owner, repo, branch, token, use_graphql):
+                       branch['name'] for branch in ordered[1:]}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except requests.exceptions.RequestException:
+                    failed.append(futures[future])
+                self.store.advance_analysis(job_id)
+
+        # A branch that forked before the default branch's synced window
+        # stores older default-branch commits, which the default branch only
+        # counts once rebuilt; until its history reaches the fork point the
+        # branch shares nothing with it. Sync it further back for those, and
+        # report branches still out of reach instead of wrong figures.
+        synced = [b['name'] for b in branches if b['name'] not in failed]
+        self.store.refresh_membership(key, synced)
+        detached = self.store.detached(key, base, synced)
+        if detached and ordered[0]['name'] == base:
+            self._sync(owner, repo, ordered[0], token, use_graphql,
+                       max_commits=ANALYSIS_MAX_BASE_COMMITS)
+            self.store.refresh_membership(key, synced)
+            detached = self.store.detached(key, base, synced)
+
+        compared = [name for name in synced if name not in detached]
+        self._fill_line_stats(owner, repo, key, base, compared, token, use_graphql)
+        rows, distinct = self.store.divergence(key, base, synced)
+
+        base_commits = next((row[2] for row in rows if row[0] == base), 0)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        table = []
+        for branch, head_date, commits, ahead, contributors, churn, unknown in rows:
+            age = (now - aggregates.parse_time(head_date)).total_seconds() / 86400
+            if branch in detached:
+                table.append((branch, head_date, round(age, 1), None, None, None, None, None))
+                continue
+            table.append((branch, head_date, round(age, 1), ahead,
+                          base_commits - (commits - ahead),
+                          contributors, churn, unknown))
+        table.sort(key=lambda row: row[2])
+        return {
+            'default_branch': base,
+            'branches': len(branches),
+            'distinct_commits': distinct,
+            'max_commits_per_branch': ANALYSIS_MAX_COMMITS,
+            'failed_branches': sorted(failed),
+            'forked_outside_window': detached,
+            'data': aggregates.columns(table, RESULT_COLUMNS),
+        }
+
+    def _fill_line_stats(self, owner, repo, key, base, branches, token, use_graphql):
+        """Line stats for the diverged commits that lack them"""
+        missing = self.store.diverged_missing_stats(key, base, branches)
+        if use_graphql:
+            self.store.set_stats(key, self.graphql.commit_stats(
+                owner, repo, missing, token, priority=BACKGROUND))
+            return
+
+        budget = self.client.call_budget(token)
+        if budget is not None:
+            missing = missing[:budget]
+        responses = self.client.get_many(
+            [f"/repos/{owner}/{repo}/commits/{sha}" for sha in missing], token,
+            priority=BACKGROUND)
+        line_stats = []
+        for sha, response in zip(missing, responses):
+            if response is not None and response.status_code == 200:
+                stats = response.json().get('stats', {})
+                line_stats.append((sha, stats.get('additions', 0), stats.get('deletions', 0)))
+        self.store.set_stats(key, line_stats)
+
+    def shutdown(self):
+        """Drop queued jobs so a worker can exit; running ones are marked
+        failed by the next status check once they go stale"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
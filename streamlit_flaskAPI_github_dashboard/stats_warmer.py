@@ -0,0 +1,127 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from commit_store import repo_key
+from github_client import token_key
+from rate_limit import BACKGROUND
+
+# GitHub statistics endpoints that are computed asynchronously (202 until ready)
+STATS_KINDS = ("code_frequency", "contributors", "commit_activity", "participation")
+
+# Seconds a fetched statistic is served before it is refreshed
+STATS_TTL = int(os.environ.get("GITHUB_STATS_TTL", "3600"))
+
+# Polling: first delay, longest delay and total time spent per statistic
+POLL_FIRST_DELAY = 1.0
+POLL_MAX_DELAY = 30.0
+POLL_MAX_SECONDS = int(os.environ.get("GITHUB_STATS_POLL_SECONDS", "300"))
+
+# Statistics polled at once per API process
+WARMER_WORKERS = 4
+
+
+class StatsWarmer:
+    """Fetches GitHub's /stats/* endpoints in the background.
+
+    GitHub answers 202 with an empty body while it computes a statistic.
+    get() returns a stored result at once, or asks GitHub once and, on a
+    202, hands the statistic to a background poller (exponential backoff
+    with jitter, background priority) and returns None. Results are kept
+    in the commit store's database, shared by all API processes.
+    """
+
+    def __init__(self, client, store, ttl=STATS_TTL):
+        self.client = client
+        self.store = store
+        self.ttl = ttl
+        self._polling = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = None
+
+    def _pool(self):
+        # Created lazily so a forking server never inherits live threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=WARMER_WORKERS, thread_name_prefix="stats-warmer")
+            return self._executor
+
+    def _key(self, owner, repo, kind, token):
+        return repo_key(owner, repo), kind, token_key(token)
+
+    def _save(self, key, response):
+        # 204: GitHub has no statistics for an empty repository
+        data = response.json() if response.status_code == 200 else []
+        self.store.save_repo_stats(*key, data)
+        return data
+
+    def cached(self, owner, repo, kind, token=None):
+        return self.store.load_repo_stats(*self._key(owner, repo, kind, token),
+                                          max_age=self.ttl)
+
+    def get(self, owner, repo, kind, token=None):
+        """The statistic, or None while GitHub is still computing it"""
+        data = self.cached(owner, repo, kind, token)
+        if data is not None:
+            return data
+
+        key = self._key(owner, repo, kind, token)
+        if key in self._polling:
+            return None
+        response = self.client.get(f"/repos/{owner}/{repo}/stats/{kind}", token)
+        if response.status_code in (200, 204):
+            return self._save(key, response)
+        if response.status_code == 202:
+            self._start(owner, repo, kind, token)
+            return None
+        response.raise_for_status()
+        return None
+
+    def warm(self, owner, repo, token=None):
+        """Start computing every statistic that is not stored yet"""
+        for kind in STATS_KINDS:
+            if self.cached(owner, repo, kind, token) is None:
+                self._start(owner, repo, kind, token)
+
+    def _start(self, owner, repo, kind, token):
+        key = self._key(owner, repo, kind, token)
+        with self._lock:
+            if key in self._polling:
+                return
+            self._polling.add(key)
+        self._pool().submit(self._poll, owner, repo, kind, token, key)
+
+    def _poll(self, owner, repo, kind, token, key):
+        deadline = time.time() + POLL_MAX_SECONDS
+        delay = POLL_FIRST_DELAY
+        try:
+            while True:
+                response = self.client.get(
+                    f"/repos/{owner}/{repo}/stats/{kind}", token, priority=BACKGROUND)
+                if response.status_code in (200, 204):
+                    self._save(key, response)
+                    return
+                if response.status_code != 202 or time.time() + delay > deadline:
+                    return
+                if self._stop.wait(delay + random.uniform(0, delay / 2)):
+                    return
+                delay = min(delay * 2, POLL_MAX_DELAY)
+        except requests.exceptions.RequestException:
+            return
+        finally:
+            with self._lock:
+                self._polling.discard(key)
+
+    def shutdown(self):
+        """Stop polling so a worker can exit without waiting on GitHub"""
+        self._stop.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
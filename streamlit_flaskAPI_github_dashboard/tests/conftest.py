@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The API and dashboard modules sit next to each other at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app opens the commit store; keep it out of the working tree
+os.environ.setdefault("GITHUB_STORE_DB", os.path.join(tempfile.mkdtemp(), "commit_store.sqlite3"))
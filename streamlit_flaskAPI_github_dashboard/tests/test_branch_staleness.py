@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import aggregates
+import app as api
+
+
+def days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Response:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        return self.body
+
+
+class FakeGitHub:
+    """Records the REST paths the API asks GitHub for"""
+
+    def __init__(self, heads):
+        self.heads = heads  # branch -> (sha, days since its last commit, ahead, behind)
+        self.calls = []
+
+    def get_json(self, path, token=None, params=None, priority=None):
+        self.calls.append(path)
+        assert path == "/repos/o/r"
+        return {'default_branch': 'main'}
+
+    def get_pages(self, path, token=None, params=None, max_items=None, priority=None):
+        self.calls.append(path)
+        assert path == "/repos/o/r/branches"
+        return [{'name': name, 'commit': {'sha': sha}, 'protected': name == 'main'}
+                for name, (sha, _, _, _) in self.heads.items()]
+
+    def get_many(self, paths, token=None, params=None, limit=None, priority=None):
+        self.calls.extend(paths)
+        by_sha = {sha: (age, ahead, behind) for sha, age, ahead, behind in self.heads.values()
+                  if age is not None}
+        responses = []
+        for path in paths:
+            head, base = path.rsplit('/', 1)[1].split('...')
+            if head not in by_sha:
+                responses.append(Response({'message': 'Not Found'}, 404))
+                continue
+            age, ahead, behind = by_sha[head]
+            # Compared head...base, base is what is "ahead"
+            responses.append(Response({
+                'base_commit': {'sha': head, 'commit': {'author': {'date': days_ago(age)}}},
+                'ahead_by': behind, 'behind_by': ahead}))
+        return responses
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, 'aggregate_cache', aggregates.AggregateCache())
+    return api.app.test_client()
+
+
+def test_one_github_call_per_branch(client, monkeypatch):
+    github = FakeGitHub({'main': ('m1', 1, 0, 0), 'feature': ('f1', 3, 2, 5),
+                         'old': ('o1', 40, 0, 30)})
+    monkeypatch.setattr(api, 'github', github)
+    body = client.get('/api/repository/o/r/aggregates/branch-staleness').get_json()
+
+    assert body['base'] == 'main'
+    assert body['data']['branch'] == ['main', 'feature', 'old']
+    assert body['data']['age_days'] == [1.0, 3.0, 40.0]
+    assert body['data']['ahead_by'] == [0, 2, 0]
+    assert body['data']['behind_by'] == [0, 5, 30]
+    assert body['data']['protected'] == [True, False, False]
+    # The default branch, the listing and one comparison per branch
+    assert len(github.calls) == 2 + 3
+
+    client.get('/api/repository/o/r/aggregates/branch-staleness')
+    assert len(github.calls) == 5  # served from the aggregate cache
+
+
+def test_failed_comparison(client, monkeypatch):
+    github = FakeGitHub({'main': ('m1', 1, 0, 0), 'feature': ('f1', 3, 2, 5)})
+    github.heads['gone'] = ('missing', None, None, None)
+    monkeypatch.setattr(api, 'github', github)
+    data = client.get('/api/repository/o/r/aggregates/branch-staleness?base=main').get_json()['data']
+    assert data['branch'] == ['main', 'feature', 'gone']
+    assert data['age_days'][2] is None and data['ahead_by'][2] is None
+    assert len(github.calls) == 1 + 3  # base given: no repository lookup
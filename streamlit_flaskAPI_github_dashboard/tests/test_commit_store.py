@@ -0,0 +1,94 @@
+import pytest
+
+from commit_store import CommitStore
+
+
+def commit(sha, parent=None, author='dev', date='2024-01-01T00:00:00Z', stats=None):
+    item = {'sha': sha, 'commit': {'author': {'date': date}},
+            'author': {'login': author} if author else None,
+            'parents': [{'sha': parent}] if parent else []}
+    if stats:
+        item['stats'] = {'additions': stats[0], 'deletions': stats[1]}
+    return item
+
+
+def linear(count, prefix='c', start=1):
+    """count commits, each the parent of the next, newest first"""
+    commits = [commit(f'{prefix}{i}', f'{prefix}{i - 1}' if i > 1 else None,
+                      date=f'2024-01-{i:02d}T00:00:00Z') for i in range(start, start + count)]
+    return commits[::-1]
+
+
+class Pages:
+    """Hands out history in pages, newest first, and counts them"""
+
+    def __init__(self, commits, size):
+        self.commits = commits
+        self.size = size
+        self.served = 0
+
+    def __iter__(self):
+        for start in range(0, len(self.commits), self.size):
+            self.served += 1
+            yield self.commits[start:start + self.size], start + self.size >= len(self.commits)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CommitStore(str(tmp_path / 'store.db'))
+
+
+def test_sync_stops_once_enough_history_is_stored(store):
+    pages = Pages(linear(20), size=5)
+    store.sync_pages('o/r', 'main', 'c20', pages, max_commits=8)
+    assert pages.served == 2
+    assert store.sync_state('o/r', 'main')['depth'] == 10
+
+    # Unchanged head: nothing fetched at all
+    again = Pages(linear(20), size=5)
+    store.sync_pages('o/r', 'main', 'c20', again, max_commits=8)
+    assert again.served == 0
+
+
+def test_new_commits_fetch_only_the_first_page(store):
+    store.sync_pages('o/r', 'main', 'c10', Pages(linear(10), 5), max_commits=100)
+    assert store.sync_state('o/r', 'main')['complete']
+
+    pages = Pages(linear(12), 5)
+    store.sync_pages('o/r', 'main', 'c12', pages, max_commits=100)
+    assert pages.served == 1
+    assert store.reachable('o/r', 'c12') == 12
+    assert store.sync_state('o/r', 'main')['complete']
+
+
+def test_branches_share_stored_commits(store):
+    store.sync_pages('o/r', 'main', 'c5', Pages(linear(5), 10), max_commits=100)
+    feature = [commit('f1', 'c5', author='ann', date='2024-02-01T00:00:00Z')] + linear(5)
+    pages = Pages(feature, 1)
+    store.sync_pages('o/r', 'feature', 'f1', pages, max_commits=100)
+    # The branch's own commit, then nothing more: c5 and older are stored
+    assert pages.served == 1
+    assert store.reachable('o/r', 'f1') == 6
+    rows, distinct = store.divergence('o/r', 'main', ['main', 'feature'])
+    ahead = {row[0]: row[3] for row in rows}
+    assert ahead == {'main': 0, 'feature': 1}
+    assert distinct == 6
+
+
+def test_branch_stats(store):
+    commits = [commit('b', 'a', author='ann', date='2024-01-02T10:00:00Z', stats=(10, 2)),
+               commit('a', author=None, date='2024-01-01T10:00:00Z')]
+    store.sync_pages('o/r', 'main', 'b', Pages(commits, 10), max_commits=100)
+    assert store.missing_stats('o/r', 'main', 10) == ['a']
+    store.set_stats('o/r', [('a', 1, 1)])
+
+    stats = store.branch_stats('o/r', 'main', 10)
+    assert stats['total_commits'] == stats['analysed_commits'] == 2
+    assert (stats['total_additions'], stats['total_deletions']) == (11, 3)
+    assert stats['last_commit_date'] == '2024-01-02T10:00:00Z'
+    assert stats['contributors'] == [{'author': 'ann', 'commits': 1,
+                                      'additions': 10, 'deletions': 2}]
+    assert stats['activity_timeline'] == {'2024-01-01': 1, '2024-01-02': 1}
+    # Stats already known are never overwritten by a later listing without them
+    store.add_commits('o/r', [commit('b', 'a', author='ann', date='2024-01-02T10:00:00Z')])
+    assert store.branch_stats('o/r', 'main', 10)['total_additions'] == 11
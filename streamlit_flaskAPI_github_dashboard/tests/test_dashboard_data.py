@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from dashboard_data import ApiCache
+
+
+class FakeBackend(ApiCache):
+    """ApiCache answering from a dict of endpoint -> (status, body)"""
+
+    def __init__(self, answers, **kwargs):
+        super().__init__("http://backend", **kwargs)
+        self.answers = answers
+        self.calls = []
+
+    def _fetch(self, endpoint, params, token, method="GET"):
+        self.calls.append(endpoint)
+        answer = self.answers[endpoint]
+        if isinstance(answer, Exception):
+            raise answer
+        if callable(answer):
+            answer = answer()
+        return answer
+
+
+def test_responses_are_reused_until_they_expire():
+    cache = FakeBackend({'/a': (200, {'n': 1}), '/status': (200, {})}, ttl=60)
+    assert cache.get('/a') == {'n': 1}
+    assert cache.get('/a') == {'n': 1}
+    assert cache.calls == ['/a']
+    cache.get('/a', token='other')  # cached per token
+    cache.get('/status', ttl=0)  # not kept
+    cache.get('/status', ttl=0)
+    assert cache.calls == ['/a', '/a', '/status', '/status']
+
+
+def test_refresh_skips_the_cached_response():
+    cache = FakeBackend({'/analysis': (200, {'run': 1})}, ttl=300)
+    assert cache.get('/analysis') == {'run': 1}
+    cache.answers['/analysis'] = (200, {'run': 2})
+    assert cache.get('/analysis') == {'run': 1}
+    assert cache.get('/analysis', refresh=True) == {'run': 2}
+    # ... and the new answer is what later calls reuse
+    assert cache.get('/analysis') == {'run': 2}
+    assert len(cache.calls) == 2
+
+
+def test_errors_and_202_are_not_cached():
+    cache = FakeBackend({'/busy': (202, {'status': 'computing'}),
+                         '/down': requests.exceptions.ConnectionError("down")})
+    cache.get('/busy')
+    cache.get('/busy')
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            cache.get('/down')
+    assert cache.calls == ['/busy', '/busy', '/down', '/down']
+
+
+def test_concurrent_gets_share_one_call():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 200, {'ok': True}
+
+    cache = FakeBackend({'/slow': slow})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('/slow')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [{'ok': True}] * 5
+    assert cache.calls == ['/slow']
+
+
+def test_invalidate_one_repository():
+    cache = FakeBackend({'/repository/o/r': (200, 1), '/repository/o/r/branches': (200, 2),
+                         '/repository/o/rx': (200, 3)})
+    for endpoint in cache.answers:
+        cache.get(endpoint)
+    cache.invalidate('o', 'r')
+    for endpoint in cache.answers:
+        cache.get(endpoint)
+    assert cache.calls.count('/repository/o/r') == 2
+    assert cache.calls.count('/repository/o/r/branches') == 2
+    assert cache.calls.count('/repository/o/rx') == 1
+
+
+def test_get_joins_a_prefetch_in_flight():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 200, {'stats': 1}
+
+    cache = FakeBackend({'/stats': slow, '/info': (200, {'info': 1})})
+    cache.prefetch([('/stats', None), ('/info', None)])
+    assert cache.get('/info') == {'info': 1}
+    time.sleep(0.1)
+    release.set()
+    assert cache.get('/stats') == {'stats': 1}
+    assert sorted(cache.calls) == ['/info', '/stats']
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from github_cache import ResponseCache, is_immutable
+from github_client import GitHubClient
+
+SHA = "a" * 40
+
+
+def response(status, body=b"", **headers):
+    result = requests.Response()
+    result.status_code = status
+    result._content = body
+    result.headers = CaseInsensitiveDict({k.replace('_', '-'): v for k, v in headers.items()})
+    return result
+
+
+class FakeSession:
+    """Answers from a function of (url, request headers) and records the calls"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, headers=None, params=None, **kwargs):
+        with self.lock:
+            self.calls.append((url, dict(headers or {})))
+        result = self.answer(url, headers or {})
+        result.url = url
+        return result
+
+
+def client_with(answer, **kwargs):
+    client = GitHubClient(base_url="https://github.test", **kwargs)
+    client.session = FakeSession(answer)
+    return client
+
+
+def test_unchanged_responses_are_revalidated_with_their_etag():
+    def answer(url, headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return response(304, X_RateLimit_Remaining="4000")
+        return response(200, b'{"name": "r"}', ETag='"v1"', X_RateLimit_Remaining="4001")
+
+    client = client_with(answer)
+    assert client.get_json("/repos/o/r") == {"name": "r"}
+    again = client.get("/repos/o/r")
+    assert again.status_code == 200 and again.json() == {"name": "r"}
+    assert client.session.calls[1][1]["If-None-Match"] == '"v1"'
+    assert client.remaining() == 4000
+    # Cached per token
+    client.get("/repos/o/r", token="secret")
+    assert "If-None-Match" not in client.session.calls[2][1]
+
+
+def test_commits_by_sha_are_served_from_the_cache(tmp_path):
+    assert is_immutable(f"https://github.test/repos/o/r/commits/{SHA}")
+    assert not is_immutable("https://github.test/repos/o/r/commits/main")
+
+    cache = ResponseCache(db_path=str(tmp_path / "cache.db"))
+    client = client_with(lambda url, headers: response(200, b'{"sha": "x"}', ETag='"c"'),
+                         cache=cache)
+    client.get(f"/repos/o/r/commits/{SHA}")
+    client.get(f"/repos/o/r/commits/{SHA}")
+    assert len(client.session.calls) == 1
+
+    # ... also by another process sharing the SQLite file
+    other = client_with(lambda url, headers: response(500),
+                        cache=ResponseCache(db_path=str(tmp_path / "cache.db")))
+    assert other.get_json(f"/repos/o/r/commits/{SHA}") == {"sha": "x"}
+    assert other.session.calls == []
+
+
+def test_get_many_keeps_order_and_bounds_concurrency():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def answer(url, headers):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        if url.endswith("/broken"):
+            raise requests.exceptions.ConnectionError("down")
+        return response(200, url.rsplit("/", 1)[1].encode())
+
+    client = client_with(answer, max_concurrency=4)
+    paths = [f"/items/{i}" for i in range(12)] + ["/items/broken"]
+    results = client.get_many(paths, limit=3)
+    assert [r.text for r in results[:-1]] == [str(i) for i in range(12)]
+    assert results[-1] is None
+    assert peak[0] <= 3
+
+
+def test_rate_limited_calls_are_retried():
+    answers = iter([response(429, Retry_After="0"), response(200, b"[]")])
+    client = client_with(lambda url, headers: next(answers))
+    assert client.get_json("/repos/o/r/branches") == []
+    assert len(client.session.calls) == 2
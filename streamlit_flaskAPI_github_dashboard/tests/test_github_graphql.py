@@ -0,0 +1,41 @@
+from github_graphql import normalise_commit
+
+
+def node(**changes):
+    commit = {
+        'oid': 'abc123',
+        'url': 'https://github.com/o/r/commit/abc123',
+        'message': 'Fix things',
+        'additions': 5,
+        'deletions': 2,
+        'committedDate': '2024-03-02T10:00:00Z',
+        'author': {'name': 'Dev', 'email': 'dev@example.com',
+                   'date': '2024-03-01T09:00:00Z', 'user': {'login': 'dev'}},
+        'parents': {'nodes': [{'oid': 'parent1'}]},
+    }
+    commit.update(changes)
+    return commit
+
+
+def test_rest_shape():
+    commit = normalise_commit(node())
+    assert commit['sha'] == 'abc123'
+    assert commit['commit']['author'] == {'name': 'Dev', 'email': 'dev@example.com',
+                                          'date': '2024-03-01T09:00:00Z'}
+    assert commit['author'] == {'login': 'dev'}
+    assert commit['parents'] == [{'sha': 'parent1'}]
+    assert commit['stats'] == {'additions': 5, 'deletions': 2, 'total': 7}
+
+
+def test_missing_author():
+    commit = normalise_commit(node(author=None))
+    assert commit['author'] is None
+    assert commit['commit']['author'] == {'name': None, 'email': None,
+                                          'date': '2024-03-02T10:00:00Z'}
+
+
+def test_author_without_github_user():
+    commit = normalise_commit(node(author={'name': 'Dev', 'email': 'dev@example.com',
+                                           'date': '2024-03-01T09:00:00Z', 'user': None}))
+    assert commit['author'] is None
+    assert commit['commit']['author']['name'] == 'Dev'
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from rate_limit import BACKGROUND, INTERACTIVE, RateLimited, Scheduler
+
+
+class Response:
+    def __init__(self, status_code=200, text="", **headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {name.replace('_', '-'): str(value) for name, value in headers.items()}
+
+
+def test_record_reads_the_quota_headers():
+    scheduler = Scheduler(max_concurrency=8)
+    reset = int(time.time()) + 600
+    assert not scheduler.record('t', Response(**{'X_RateLimit_Remaining': 4999,
+                                                 'X_RateLimit_Limit': 5000,
+                                                 'X_RateLimit_Reset': reset}))
+    snapshot = scheduler.snapshot('t')
+    assert (snapshot['remaining'], snapshot['limit'], snapshot['reset']) == (4999, 5000, reset)
+    with scheduler.slot('t'):
+        assert scheduler.remaining('t') == 4998
+
+
+def test_secondary_limit_backs_off_and_halves_concurrency():
+    scheduler = Scheduler(max_concurrency=8)
+    assert scheduler.record('t', Response(403, "You have exceeded a secondary rate limit",
+                                          Retry_After=60))
+    assert scheduler.concurrency('t') == 4
+    assert 60 <= scheduler.snapshot('t')['backoff_seconds'] <= 61
+    # Longer than an interactive request may wait: fail at once
+    with pytest.raises(RateLimited):
+        with scheduler.slot('t'):
+            pass
+    # Concurrency grows back one step per successful call
+    scheduler.record('t', Response())
+    assert scheduler.concurrency('t') == 5
+
+
+def test_other_forbidden_responses_are_not_rate_limits():
+    scheduler = Scheduler(max_concurrency=8)
+    assert not scheduler.record('t', Response(403, "Resource not accessible"))
+    assert scheduler.concurrency('t') == 8
+
+
+def test_background_calls_keep_a_reserve(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'BACKGROUND_RESERVE', 100)
+    scheduler = Scheduler(max_concurrency=8, max_wait=5)
+    scheduler.record('t', Response(**{'X_RateLimit_Remaining': 50,
+                                      'X_RateLimit_Reset': int(time.time()) + 3600}))
+    with scheduler.slot('t', INTERACTIVE):
+        pass  # interactive calls may use the reserve
+
+    started = threading.Event()
+
+    def background():
+        with scheduler.slot('t', BACKGROUND):
+            started.set()
+
+    thread = threading.Thread(target=background, daemon=True)
+    thread.start()
+    assert not started.wait(0.3)
+    # The quota resets: the background call goes ahead
+    scheduler.record('t', Response(**{'X_RateLimit_Remaining': 5000}))
+    assert started.wait(2)
+
+
+def test_background_calls_yield_to_interactive_ones():
+    scheduler = Scheduler(max_concurrency=8)
+    started = threading.Event()
+
+    def background():
+        with scheduler.slot('t', BACKGROUND):
+            started.set()
+
+    with scheduler.slot('t', INTERACTIVE):
+        thread = threading.Thread(target=background, daemon=True)
+        thread.start()
+        assert not started.wait(0.3)
+    assert started.wait(2)
+
+
+def test_calls_in_flight_are_capped_at_the_concurrency():
+    scheduler = Scheduler(max_concurrency=2)
+    scheduler.record('t', Response(429, Retry_After=0))
+    assert scheduler.concurrency('t') == 1
+    time.sleep(1.1)  # past the backoff jitter
+    started = threading.Event()
+
+    def second():
+        with scheduler.slot('t'):
+            started.set()
+
+    with scheduler.slot('t'):
+        thread = threading.Thread(target=second, daemon=True)
+        thread.start()
+        assert not started.wait(0.3)
+    assert started.wait(2)
@@ -0,0 +1,164 @@
+import time
+
+import pytest
+
+import repo_analysis
+from commit_store import CommitStore
+from repo_analysis import RepoAnalysis
+
+
+class Response:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.links = {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeGitHub:
+    """Just enough of GitHubClient's REST calls, over an in-memory repository"""
+
+    def __init__(self):
+        self.commits = {}
+        self.branches = {}
+        self.commit_pages = 0
+        self.page_size = None
+
+    def commit(self, sha, parent=None, author='dev', day=1, branch=None):
+        self.commits[sha] = {
+            'sha': sha,
+            'commit': {'author': {'date': f'2024-01-{day:02d}T00:00:00Z'}},
+            'author': {'login': author},
+            'parents': [{'sha': parent}] if parent else [],
+        }
+        if branch:
+            self.branches[branch] = sha
+
+    def history(self, head):
+        shas = [head]
+        while self.commits[shas[-1]]['parents']:
+            shas.append(self.commits[shas[-1]]['parents'][0]['sha'])
+        return [self.commits[sha] for sha in shas]
+
+    def get_json(self, path, token=None, params=None, priority=None):
+        assert path == '/repos/o/r'
+        return {'default_branch': 'main'}
+
+    def get_pages(self, path, token=None, params=None, max_items=None, priority=None):
+        return [{'name': name, 'commit': {'sha': sha}} for name, sha in self.branches.items()]
+
+    def get(self, path, token=None, params=None, priority=None):
+        # Next-page URLs are "next:<head>:<offset>"
+        self.commit_pages += 1
+        head, offset = (params['sha'], 0) if params else path.split(':')[1:]
+        history = self.history(head)[int(offset):]
+        if self.page_size is None or len(history) <= self.page_size:
+            return Response(history)
+        response = Response(history[:self.page_size])
+        response.links = {'next': {'url': f'next:{head}:{int(offset) + self.page_size}'}}
+        return response
+
+    def call_budget(self, token=None):
+        return None
+
+    def get_many(self, paths, token=None, params=None, limit=None, priority=None):
+        return [Response({'stats': {'additions': 10, 'deletions': 5}}) for _ in paths]
+
+
+def wait(analysis, job):
+    deadline = time.time() + 10
+    while job['state'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.02)
+        job = analysis.status(job['job_id'])
+    return job
+
+
+@pytest.fixture
+def github():
+    github = FakeGitHub()
+    github.commit('a', day=1)
+    github.commit('b', 'a', day=2, branch='main')
+    github.commit('c', 'b', author='ann', day=3, branch='feature')
+    return github
+
+
+def test_rerunning_an_analysis(tmp_path, github):
+    analysis = RepoAnalysis(github, CommitStore(str(tmp_path / 'store.db')), graphql=None)
+    try:
+        first = wait(analysis, analysis.start('o', 'r'))
+        assert first['state'] == 'done'
+        rows = dict(zip(first['result']['data']['branch'], first['result']['data']['ahead_by']))
+        assert rows == {'main': 0, 'feature': 1}
+
+        # Two new commits on feature: a re-run reports them and only
+        # fetches the feature branch again
+        github.commit('d', 'c', author='bob', day=4)
+        github.commit('e', 'd', author='bob', day=5, branch='feature')
+        pages = github.commit_pages
+        second = wait(analysis, analysis.start('o', 'r'))
+        assert second['job_id'] != first['job_id']
+        assert github.commit_pages == pages + 1
+
+        latest = analysis.latest('o', 'r')
+        assert latest['job_id'] == second['job_id']
+        data = latest['result']['data']
+        feature = data['branch'].index('feature')
+        assert data['ahead_by'][feature] == 3
+        assert data['contributors'][feature] == 2
+        assert data['churn'][feature] == 45
+    finally:
+        analysis.shutdown()
+
+
+def test_branch_forked_before_the_synced_window(tmp_path, monkeypatch):
+    # main has 30 commits and only its newest 10 are synced at first;
+    # feature forked from the fifth
+    monkeypatch.setattr(repo_analysis, 'ANALYSIS_MAX_COMMITS', 10)
+    github = FakeGitHub()
+    github.page_size = 10
+    for i in range(1, 31):
+        github.commit(f'b{i}', f'b{i - 1}' if i > 1 else None, day=1, branch='main')
+    github.commit('f1', 'b5', author='ann', day=2)
+    github.commit('f2', 'f1', author='ann', day=3, branch='feature')
+
+    analysis = RepoAnalysis(github, CommitStore(str(tmp_path / 'store.db')), graphql=None)
+    try:
+        for _ in range(2):
+            job = wait(analysis, analysis.start('o', 'r'))
+            assert job['state'] == 'done'
+            data = job['result']['data']
+            feature = data['branch'].index('feature')
+            assert data['ahead_by'][feature] == 2
+            assert data['behind_by'][feature] == 25
+            assert data['contributors'][feature] == 1
+            assert job['result']['forked_outside_window'] == []
+    finally:
+        analysis.shutdown()
+
+
+def test_fork_point_out_of_reach(tmp_path, monkeypatch):
+    monkeypatch.setattr(repo_analysis, 'ANALYSIS_MAX_COMMITS', 10)
+    monkeypatch.setattr(repo_analysis, 'ANALYSIS_MAX_BASE_COMMITS', 20)
+    github = FakeGitHub()
+    github.page_size = 10
+    for i in range(1, 41):
+        github.commit(f'b{i}', f'b{i - 1}' if i > 1 else None, day=1, branch='main')
+    github.commit('f1', 'b5', day=2, branch='feature')
+
+    analysis = RepoAnalysis(github, CommitStore(str(tmp_path / 'store.db')), graphql=None)
+    try:
+        job = wait(analysis, analysis.start('o', 'r'))
+        assert job['result']['forked_outside_window'] == ['feature']
+        data = job['result']['data']
+        feature = data['branch'].index('feature')
+        assert data['ahead_by'][feature] is None
+        assert data['behind_by'][feature] is None
+        assert data['ahead_by'][data['branch'].index('main')] == 0
+    finally:
+        analysis.shutdown()